@@ -0,0 +1,291 @@
+#!/usr/bin/python3 -Es
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+An end-to-end throughput benchmark of smashd.
+
+A SignAndComposeDaemon is driven through a number of work cycles against
+the fake `koji` and `sigul` executables of bench/bin.  Before each cycle,
+M new builds are tagged into each of N tags.  For every cycle, this
+reports how long the work took, how many Koji and Sigul calls were made,
+the peak memory of the daemon's process and the median and maximum latency
+from the builds being tagged to each tag's repository being composed.
+"""
+import argparse
+import logging
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, BENCH_DIR)
+
+from world import (  # noqa: E402
+    KOJI_FAILURE_RATE, KOJI_LATENCY, KOJI_PADDING, SIGUL_FAILURE_RATE,
+    SIGUL_LATENCY, SIGUL_PER_RPM, TASK_DURATION, TASK_FAILURE_RATE, WORLD,
+    World,
+)
+
+# Seconds between polls of the daemon, in lieu of its own check-interval.
+POLL_INTERVAL = 0.02
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tags', type=int, default=4,
+                        help='number of tags (N) with a repository each')
+    parser.add_argument('--builds', type=int, default=25,
+                        help='builds (M) tagged into each tag per cycle')
+    parser.add_argument('--big-builds', type=int,
+                        help='builds tagged into the first tag per cycle, '
+                             'if unlike the others')
+    parser.add_argument('--retag', action='store_true',
+                        help='after the first cycle, untag and retag the '
+                             'same builds rather than tagging new ones')
+    parser.add_argument('--trickle', type=float,
+                        help='seconds between further builds tagged into '
+                             'the first tag while each cycle is worked, '
+                             'e.g., to keep it from quiescing')
+    parser.add_argument('--rpms', type=int, default=3,
+                        help='binary RPMs per build (plus one source RPM)')
+    parser.add_argument('--cycles', type=int, default=5,
+                        help='number of work cycles to drive')
+    parser.add_argument('--koji-latency', default='0.02',
+                        help='seconds per koji call, optionally as '
+                             'COMMAND:SECONDS overrides')
+    parser.add_argument('--koji-failure-rate', default='0',
+                        help='probability of any koji call failing')
+    parser.add_argument('--koji-padding', default='0',
+                        help='bytes of extra output per koji call')
+    parser.add_argument('--sigul-latency', default='0.05',
+                        help='seconds per sigul call')
+    parser.add_argument('--sigul-per-rpm', default='0.001',
+                        help='additional seconds per RPM signed')
+    parser.add_argument('--sigul-failure-rate', default='0',
+                        help='probability of any sigul call failing')
+    parser.add_argument('--task-duration', default='0',
+                        help='seconds each Koji task remains open')
+    parser.add_argument('--task-failure-rate', default='0',
+                        help='probability of any Koji task failing')
+    parser.add_argument('--pause', type=float, default=0,
+                        help='seconds to pause before tagging each cycle, '
+                             'e.g., so that smashd is caught resting')
+    parser.add_argument('--run', action='store_true',
+                        help="drive smashd by its own loop, resting per its "
+                             "check-interval, rather than polling it every "
+                             f"{POLL_INTERVAL} seconds")
+    parser.add_argument('--wakeup', action='store_true',
+                        help='with --run, wake smashd through a Unix socket '
+                             'whenever builds are tagged')
+    parser.add_argument('--config', action='append', default=[],
+                        metavar='SECTION.OPTION=VALUE',
+                        help='override a smashd configuration option, e.g., '
+                             'koji.max_concurrency=16')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the working directory for inspection')
+    parser.add_argument('--verbose', '-v', action='count', default=0,
+                        help='log smashd activity (twice for DEBUG)')
+    return parser.parse_args()
+
+
+def write_config(filename: str, workdir: str, tags: list, overrides: list):
+    sections = {
+        'gojira': {},
+        'koji': {},
+        'klean': {'koji_dir': workdir},
+        'smashd': {
+            'exclude_tags': '',
+            'notifications_from': 'smashd@localhost',
+            'notifications_to': 'nobody@localhost',
+            'min_interval': '0.05',
+            'max_interval': '0.05',
+        },
+    }
+    for n, tag in enumerate(tags):
+        # The fake sigul records signatures by key name, so each key is
+        # named for its ID.
+        key = f'{0xdeadbeef + n:08x}'
+        sections[f'repository {tag}'] = {
+            'gpg_key_id': key,
+            'sigul_key_name': key,
+            'sigul_key_pass': 'secret',
+        }
+    for override in overrides:
+        name, _, value = override.partition('=')
+        section, _, option = name.rpartition('.')
+        sections.setdefault(section, {})[option] = value
+    with open(filename, 'w') as f:
+        for section, options in sections.items():
+            f.write(f'[{section}]\n')
+            for option, value in options.items():
+                f.write(f'{option} = {value}\n')
+            f.write('\n')
+
+
+class Notifications(object):
+    """
+    Stands in for smashd's Notifier, which would otherwise send mail, and
+    notes when each tag's repository was composed.
+    """
+    composed = {}
+
+    def __init__(self, changes, config):
+        for tag in changes:
+            Notifications.composed[tag] = time.time()
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][
+            min(args.verbose, 2)
+        ],
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+    workdir = tempfile.mkdtemp(prefix='smashd-bench-')
+    os.environ.update({
+        WORLD: os.path.join(workdir, 'world.sqlite'),
+        KOJI_LATENCY: args.koji_latency,
+        KOJI_FAILURE_RATE: args.koji_failure_rate,
+        KOJI_PADDING: args.koji_padding,
+        SIGUL_LATENCY: args.sigul_latency,
+        SIGUL_PER_RPM: args.sigul_per_rpm,
+        SIGUL_FAILURE_RATE: args.sigul_failure_rate,
+        TASK_DURATION: args.task_duration,
+        TASK_FAILURE_RATE: args.task_failure_rate,
+        # These must be set before koji_helpers is imported.
+        'KOJI_HELPERS_KOJI': os.path.join(BENCH_DIR, 'bin', 'koji'),
+        'KOJI_HELPERS_SIGUL': os.path.join(BENCH_DIR, 'bin', 'sigul'),
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'lib'))
+    from koji_helpers.smashd import daemon, pipeline
+    from koji_helpers.wakeup import trigger
+
+    world = World()
+    tags = [f'bench-{n}' for n in range(args.tags)]
+    config = os.path.join(workdir, 'config')
+    wakeup = f'unix:{os.path.join(workdir, "wakeup.sock")}'
+    write_config(config, workdir, tags,
+                 ([f'smashd.wakeup={wakeup}'] if args.wakeup else [])
+                 + args.config)
+
+    def tagged(tag: str):
+        if args.wakeup:
+            trigger(wakeup, tag)
+
+    # Keep the daemon's state and cache within the working directory and
+    # its notifications from going anywhere.
+    daemon.SMASHD_STATE = os.path.join(workdir, 'state')
+    daemon.BUILD_CACHE = os.path.join(workdir, 'build-cache.sqlite')
+    daemon.SIGNED_INDEX = os.path.join(workdir, 'signed-index.sqlite')
+    daemon.WORK_JOURNAL = os.path.join(workdir, 'journal.sqlite')
+    pipeline.Notifier = Notifications
+
+    smashd = daemon.SignAndComposeDaemon(config)
+    smashd.last_event  # noqa -- establishes the start of the tag history
+    if args.run:
+        threading.Thread(target=smashd.run, daemon=True).start()
+    print(f'{args.tags} tags x {args.builds} builds/cycle x '
+          f'{args.rpms + 1} RPMs/build; workdir {workdir}')
+    print(f'{"cycle":>5} {"work s":>8} {"koji":>6} {"sigul":>6} '
+          f'{"RSS MiB":>8} {"tag-to-repo s":>14} {"max s":>8}')
+    results = []
+    try:
+        for cycle in range(args.cycles):
+            time.sleep(args.pause)
+            tagged_at = time.time()
+            for i, tag in enumerate(tags):
+                builds = args.builds
+                if i == 0 and args.big_builds is not None:
+                    builds = args.big_builds
+                release = 0 if args.retag else cycle
+                nvrs = [
+                    f'{tag}-pkg{n}-1.0-{release}.bench'
+                    for n in range(builds)
+                ]
+                if cycle == release:
+                    world.add_builds(nvrs, args.rpms)
+                else:
+                    world.tag(nvrs, tag, tagged=False, ts=tagged_at)
+                world.tag(nvrs, tag, ts=tagged_at)
+                tagged(tag)
+            calls = world.call_counts()
+            Notifications.composed.clear()
+            start = trickled = time.monotonic()
+            trickles = 0
+            while True:
+                # When smashd runs itself, its conclusion is not awaited.
+                concluded = args.run or smashd.poll()
+                if concluded and set(tags) <= set(Notifications.composed):
+                    break
+                if (args.trickle is not None
+                        and time.monotonic() - trickled >= args.trickle):
+                    nvrs = [f'{tags[0]}-trickle{trickles}-1.0-{cycle}.bench']
+                    world.add_builds(nvrs, args.rpms)
+                    world.tag(nvrs, tags[0])
+                    tagged(tags[0])
+                    trickled = time.monotonic()
+                    trickles += 1
+                time.sleep(POLL_INTERVAL)
+            work = time.monotonic() - start
+            after = world.call_counts()
+            koji = sum(n - calls.get(k, 0) for k, n in after.items()
+                       if k[0] == 'koji')
+            sigul = sum(n - calls.get(k, 0) for k, n in after.items()
+                        if k[0] == 'sigul')
+            latencies = [
+                Notifications.composed[tag] - tagged_at for tag in tags
+            ]
+            latency = statistics.median(latencies)
+            results.append((work, koji, sigul, latency, max(latencies)))
+            print(f'{cycle:>5} {work:>8.2f} {koji:>6} {sigul:>6} '
+                  f'{peak_rss_mib():>8.1f} {latency:>14.2f} '
+                  f'{max(latencies):>8.2f}')
+    finally:
+        if args.keep:
+            print(f'kept {workdir}')
+        else:
+            shutil.rmtree(workdir)
+    if results:
+        works, kojis, siguls, latencies, maxima = zip(*results)
+        print(f'{"mean":>5} {statistics.mean(works):>8.2f} '
+              f'{statistics.mean(kojis):>6.1f} '
+              f'{statistics.mean(siguls):>6.1f} '
+              f'{peak_rss_mib():>8.1f} '
+              f'{statistics.mean(latencies):>14.2f} '
+              f'{statistics.mean(maxima):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/python3 -Es
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+A microbenchmark of smashd's tag history parser.
+
+A synthetic `koji list-history` output of many events (1M by default),
+interspersed with lines that report other kinds of history, is parsed both
+by the regex-and-groupdict approach smashd formerly used and by
+koji_helpers.smashd.tag_history.  This reports the throughput of each when
+summarizing the changed tags, plus the memory held by a list of the parsed
+event records.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from logging import getLogger
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    'lib'),
+)
+
+from koji_helpers.smashd.tag_history import (  # noqa: E402
+    BUILD, TAG_IN, TAG_OUT, USER, parse_history, tally_changes,
+)
+
+# The parser smashd formerly used, for comparison.
+LEGACY_RE = re.compile(
+    r'^(?P<time>.*\d{4}) (?P<build>\S+) (?P<direction>'
+    r'tagged into|untagged from) (?P<tag>\S+) by (?P<user>\S+).*$'
+)
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def legacy_parse(lines: list) -> iter:
+    for line in lines:
+        m = LEGACY_RE.match(line)
+        if m:
+            m = m.groupdict()
+            _log.debug(
+                f'tag {m["tag"]!r} affected by build {m["build"]!r} '
+                f'by {m["direction"]!r} request of {m["user"]!r} '
+                f'at {m["time"]!r}'
+            )
+            yield m
+
+
+def legacy_tally(lines: list) -> dict:
+    # The former summary reported every build ever tagged in or out; it is
+    # given the net-effect rule of tally_changes() so that the two compare.
+    triggers = {}
+    for change in legacy_parse(lines):
+        tag = change['tag']
+        if tag not in triggers:
+            triggers[tag] = {
+                TAG_IN: {BUILD: set(), USER: set()},
+                TAG_OUT: {BUILD: set(), USER: set()},
+            }
+        if 'into' in change['direction']:
+            direction, opposite = TAG_IN, TAG_OUT
+        else:
+            direction, opposite = TAG_OUT, TAG_IN
+        triggers[tag][opposite][BUILD].discard(change['build'])
+        triggers[tag][direction][BUILD].add(change['build'])
+        triggers[tag][direction][USER].add(change['user'])
+    return triggers
+
+
+def synthesize(events: int, noise: float, tags: int, builds: int,
+               users: int) -> list:
+    rng = random.Random(42)
+    start = time.time() - events
+    lines = []
+    for n in range(events):
+        stamp = time.asctime(time.localtime(start + n))
+        if rng.random() < noise:
+            lines.append(f'{stamp} package pkg{rng.randrange(builds)} in tag '
+                         f'f{rng.randrange(tags)}-updates: owner changed by '
+                         f'user{rng.randrange(users)}\n')
+            continue
+        b = rng.randrange(builds)
+        direction = 'tagged into' if rng.random() < 0.8 else 'untagged from'
+        lines.append(f'{stamp} pkg{b}-1.{b % 7}-{b % 3}.fc35 {direction} '
+                     f'f{rng.randrange(tags)}-updates by '
+                     f'user{rng.randrange(users)} [still active]\n')
+    return lines
+
+
+def measure(label: str, work, lines: list, events: int):
+    start = time.perf_counter()
+    result = work(lines)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed:>8.2f} s {len(lines) / elapsed:>12,.0f} '
+          f'lines/s')
+    return result
+
+
+def retained(label: str, parse, lines: list):
+    tracemalloc.start()
+    records = list(parse(lines))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<28} {current / 2 ** 20:>8.1f} MiB for '
+          f'{len(records):,d} records')
+    del records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--events', type=int, default=1000000,
+                        help='number of history lines to synthesize')
+    parser.add_argument('--noise', type=float, default=0.1,
+                        help='fraction of lines that report other history')
+    parser.add_argument('--tags', type=int, default=50)
+    parser.add_argument('--builds', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=25)
+    args = parser.parse_args()
+
+    lines = synthesize(args.events, args.noise, args.tags, args.builds,
+                       args.users)
+    print(f'{len(lines):,d} history lines synthesized')
+    legacy = measure('legacy regex changed_tags', legacy_tally, lines,
+                     args.events)
+    current = measure('tally_changes', tally_changes, lines, args.events)
+    assert legacy == current, 'parsers disagree'
+    retained('legacy groupdict records', legacy_parse, lines)
+    retained('TagEvent records', parse_history, lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/python3 -Es
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+An offline comparison of smashd's tuning strategies.
+
+A timeline of tag events, either read from `koji list-history` output or
+synthesized as bursts, is replayed through a model of smashd for each
+strategy of koji_helpers.tuning, on a simulated clock.  As smashd does, the
+model polls every check-interval, tracks each tag's quiescence separately
+and runs one work cycle at a time, whose duration grows with the number of
+events in it.  This reports, per strategy, the number of composes, how many
+of those were redundant because they split a burst of events that a later
+compose had to finish, the number of polls and the latency from each event
+to its tag's repository being composed.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    'lib'),
+)
+
+from koji_helpers.smashd.tag_history import parse_history  # noqa: E402
+from koji_helpers.tuning import STRATEGIES, make_tuner  # noqa: E402
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def read_history(filename: str) -> list:
+    """
+    :return:
+        A sorted list of (seconds, tag) for each tag event within the
+        `koji list-history` output in *filename*.
+    """
+    with open(filename) as f:
+        return sorted(
+            (time.mktime(time.strptime(' '.join(event.time.split()),
+                                       '%a %b %d %H:%M:%S %Y')), event.tag)
+            for event in parse_history(f)
+        )
+
+
+def synthesize(tags: int, bursts: int, burst_events: float, burst_gap: float,
+               idle: float, seed: int) -> list:
+    """
+    :return:
+        A sorted list of (seconds, tag) for each of the bursts of tag events
+        synthesized for *tags* tags.  Within each burst, events are spaced
+        *burst_gap* seconds apart on average; bursts are *idle* seconds
+        apart on average.
+    """
+    rng = random.Random(seed)
+    events = []
+    for n in range(tags):
+        now = 0.0
+        for _ in range(bursts):
+            now += rng.expovariate(1 / idle)
+            for _ in range(max(1, round(rng.expovariate(1 / burst_events)))):
+                now += rng.expovariate(1 / burst_gap)
+                events.append((now, f'tag{n}'))
+    return sorted(events)
+
+
+def label_bursts(events: list, split: float) -> list:
+    """
+    :return:
+        A list of (seconds, tag, burst) for each of *events*, where *burst*
+        numbers the bursts of each tag, which are separated by more than
+        *split* seconds without an event.
+    """
+    last, burst, labelled = {}, {}, []
+    for seconds, tag in events:
+        if tag not in last or seconds - last[tag] > split:
+            burst[tag] = burst.get(tag, -1) + 1
+        last[tag] = seconds
+        labelled.append((seconds, tag, burst[tag]))
+    return labelled
+
+
+def simulate(strategy: str, events: list, args) -> dict:
+    """
+    Replay *events*, as given by :func:`label_bursts`, through a model of
+    smashd tuned by *strategy*.
+
+    :return:
+        A dict of the measures reported for the strategy.
+    """
+    tuner = make_tuner(strategy, args.min_interval, args.max_interval,
+                       hub_load_target=args.hub_load_target)
+    pending, first_seen, last_seen = {}, {}, {}
+    composes, latencies = [], []
+    polls, i = 0, 0
+    running = None
+    now = events[0][0] if events else 0
+    while i < len(events) or pending or running:
+        if running is not None and running[0] <= now:
+            finished, started, batch = running
+            for tag, tag_events in batch.items():
+                composes.append((tag, {burst for _, burst in tag_events}))
+                latencies.extend(
+                    finished - seconds for seconds, _ in tag_events
+                )
+            tuner.observe_cycle(finished - started)
+            running = None
+        polls += 1
+        tuner.observe_poll(
+            args.poll_latency + (args.busy_latency if running else 0)
+        )
+        arrived = False
+        while i < len(events) and events[i][0] <= now:
+            seconds, tag, burst = events[i]
+            if tag not in pending:
+                pending[tag], first_seen[tag] = [], now
+            pending[tag].append((seconds, burst))
+            last_seen[tag] = now
+            arrived, i = True, i + 1
+        if arrived:
+            tuner.observe_change(now)
+        tuner.adjust()
+        if running is None:
+            ready = [
+                tag for tag in pending
+                if now - last_seen[tag] >= tuner.period
+                or 0 < args.max_wait <= now - first_seen[tag]
+            ]
+            if ready:
+                batch = {tag: pending.pop(tag) for tag in ready}
+                size = sum(len(tag_events) for tag_events in batch.values())
+                running = (now + args.cycle_base + args.per_event * size, now,
+                           batch)
+        wake = now + tuner.check_interval
+        if running is not None:
+            # smashd wakes early to conclude a work cycle.
+            wake = min(wake, running[0])
+        elif not pending and i < len(events) and events[i][0] > wake:
+            # Skip ahead through idle polls, which change nothing.
+            idle = int((events[i][0] - now) // tuner.check_interval)
+            polls += idle - 1
+            wake = now + idle * tuner.check_interval
+        now = wake
+    redundant = 0
+    following = {}
+    for tag, bursts in reversed(composes):
+        # A compose is redundant if the next one of its tag finishes a burst
+        # that it had begun.
+        if max(bursts) in following.get(tag, ()):
+            redundant += 1
+        following[tag] = bursts
+    latencies.sort()
+    return {
+        'composes': len(composes),
+        'redundant': redundant,
+        'polls': polls,
+        'median': statistics.median(latencies) if latencies else 0,
+        'p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0,
+        'max': latencies[-1] if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--history',
+                        help='file of `koji list-history` output to replay '
+                             'instead of synthesizing bursts')
+    parser.add_argument('--tags', type=int, default=10)
+    parser.add_argument('--bursts', type=int, default=50,
+                        help='bursts of events synthesized per tag')
+    parser.add_argument('--burst-events', type=float, default=8,
+                        help='mean events per synthesized burst')
+    parser.add_argument('--burst-gap', type=float, default=20,
+                        help='mean seconds between events within a burst')
+    parser.add_argument('--idle', type=float, default=3600,
+                        help='mean seconds between bursts')
+    parser.add_argument('--burst-split', type=float, default=300,
+                        help='seconds without an event that end a burst')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--strategies', nargs='+', default=sorted(STRATEGIES),
+                        choices=sorted(STRATEGIES))
+    parser.add_argument('--min-interval', type=float, default=5)
+    parser.add_argument('--max-interval', type=float, default=300)
+    parser.add_argument('--max-wait', type=float, default=1800)
+    parser.add_argument('--hub-load-target', type=float, default=0)
+    parser.add_argument('--cycle-base', type=float, default=60,
+                        help='seconds taken by a work cycle of any size')
+    parser.add_argument('--per-event', type=float, default=2,
+                        help='further seconds per event in a work cycle')
+    parser.add_argument('--poll-latency', type=float, default=0.5,
+                        help='seconds taken by each poll')
+    parser.add_argument('--busy-latency', type=float, default=2,
+                        help='further seconds per poll during a work cycle')
+    args = parser.parse_args()
+
+    if args.history:
+        events = read_history(args.history)
+    else:
+        events = synthesize(args.tags, args.bursts, args.burst_events,
+                            args.burst_gap, args.idle, args.seed)
+    events = label_bursts(events, args.burst_split)
+    tags = len({tag for _, tag, _ in events})
+    bursts = len({(tag, burst) for _, tag, burst in events})
+    print(f'{len(events):,d} events in {bursts:,d} bursts across '
+          f'{tags:,d} tags')
+    print(f'{"strategy":<12} {"composes":>9} {"redundant":>10} '
+          f'{"polls":>8} {"median s":>9} {"p95 s":>9} {"max s":>9}')
+    for strategy in args.strategies:
+        result = simulate(strategy, events, args)
+        print(f'{strategy:<12} {result["composes"]:>9,d} '
+              f'{result["redundant"]:>10,d} {result["polls"]:>8,d} '
+              f'{result["median"]:>9.1f} {result["p95"]:>9.1f} '
+              f'{result["max"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+The simulated Koji deployment shared by the benchmark harness and the fake
+`koji` and `sigul` executables.
+
+All state lives in one SQLite database named by the `FAKE_KOJI_WORLD`
+environment variable so that the fakes, being separate processes, may
+share it safely.
+"""
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# environment variables governing the fakes
+WORLD = 'FAKE_KOJI_WORLD'
+KOJI_LATENCY = 'FAKE_KOJI_LATENCY'
+KOJI_FAILURE_RATE = 'FAKE_KOJI_FAILURE_RATE'
+KOJI_PADDING = 'FAKE_KOJI_PADDING'
+SIGUL_LATENCY = 'FAKE_SIGUL_LATENCY'
+SIGUL_PER_RPM = 'FAKE_SIGUL_PER_RPM'
+SIGUL_FAILURE_RATE = 'FAKE_SIGUL_FAILURE_RATE'
+TASK_DURATION = 'FAKE_KOJI_TASK_DURATION'
+TASK_FAILURE_RATE = 'FAKE_KOJI_TASK_FAILURE_RATE'
+
+# the architectures of the binary RPMs built for each simulated build
+ARCHES = ('noarch', 'x86_64')
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    nvr TEXT UNIQUE NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rpms (
+    build_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    arch TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rpms_build ON rpms (build_id);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    nvr TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    tagged INTEGER NOT NULL,
+    user TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_ts ON history (ts);
+CREATE TABLE IF NOT EXISTS signed (
+    filename TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (filename, key)
+);
+CREATE TABLE IF NOT EXISTS calls (
+    tool TEXT NOT NULL,
+    command TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    method TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    finishes REAL NOT NULL,
+    outcome TEXT NOT NULL
+);
+"""
+
+
+def command_values(value: str, command: str, default: float = 0.0) -> float:
+    """
+    :param value:
+        A space-separated list of either bare VALUEs, which apply to every
+        command, or `COMMAND:VALUE` pairs, which override it for one.
+
+    :return:
+        The value that applies to *command*.
+    """
+    result = default
+    for token in (value or '').split():
+        name, _, setting = token.rpartition(':')
+        if not name:
+            result = float(setting)
+        elif name == command:
+            return float(setting)
+    return result
+
+
+class World(object):
+    """
+    A simulated Koji deployment:  builds and their RPMs, the tag history,
+    the RPM signatures and a log of every call made to the fakes.
+    """
+
+    def __init__(self, filename: str = None):
+        """
+        Initialize the World object.
+
+        :param filename:
+            The name of the SQLite database.  Defaults to that named by the
+            `FAKE_KOJI_WORLD` environment variable.
+        """
+        self.filename = filename or os.environ[WORLD]
+        self.db = sqlite3.connect(self.filename, timeout=60)
+        self.db.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'filename={self.filename!r}, '
+                f')')
+
+    def add_builds(self, nvrs: list, rpms_per_build: int):
+        """
+        Add completed builds, each with one source RPM plus binary RPMs for
+        *rpms_per_build* subpackages.
+        """
+        with self.db:
+            for nvr in nvrs:
+                cursor = self.db.execute(
+                    'INSERT INTO builds (nvr, state) VALUES (?, ?)',
+                    (nvr, 'COMPLETE'),
+                )
+                name, version, release = nvr.rsplit('-', 2)
+                rows = [(cursor.lastrowid, f'{nvr}.src.rpm', 'src')]
+                for i in range(rpms_per_build):
+                    arch = ARCHES[i % len(ARCHES)]
+                    sub = name if i == 0 else f'{name}-sub{i}'
+                    rows.append((
+                        cursor.lastrowid,
+                        f'{sub}-{version}-{release}.{arch}.rpm',
+                        arch,
+                    ))
+                self.db.executemany(
+                    'INSERT INTO rpms (build_id, filename, arch) '
+                    'VALUES (?, ?, ?)',
+                    rows,
+                )
+
+    def tag(self, nvrs: list, tag: str, tagged: bool = True,
+            user: str = 'kojiadmin', ts: float = None):
+        """
+        Record that *nvrs* were tagged into (or untagged from) *tag*.
+        """
+        ts = time.time() if ts is None else ts
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO history (ts, nvr, tag, tagged, user) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(ts, nvr, tag, int(tagged), user) for nvr in nvrs],
+            )
+
+    def history(self, after: float = None, before: float = None,
+                after_event: int = None, before_event: int = None,
+                tag: str = None) -> list:
+        """
+        :return:
+            A list of (ts, nvr, tag, tagged, user) for each tag history
+            event within the bounds given.  Event IDs are the row IDs.
+        """
+        return self.db.execute(
+            'SELECT ts, nvr, tag, tagged, user FROM history '
+            'WHERE ts > ? AND ts < ? AND id > ? AND id < ? '
+            'AND (? IS NULL OR tag = ?) ORDER BY id',
+            (
+                float('-inf') if after is None else after,
+                float('inf') if before is None else before,
+                -1 if after_event is None else after_event,
+                2 ** 62 if before_event is None else before_event,
+                tag,
+                tag,
+            ),
+        ).fetchall()
+
+    def last_event(self) -> int:
+        return self.db.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM history'
+        ).fetchone()[0]
+
+    def build(self, nvr: str):
+        return self.db.execute(
+            'SELECT id, state FROM builds WHERE nvr = ?', (nvr,)
+        ).fetchone()
+
+    def build_rpms(self, build_id: int) -> list:
+        return self.db.execute(
+            'SELECT filename, arch FROM rpms WHERE build_id = ?', (build_id,)
+        ).fetchall()
+
+    def signed_in_tag(self, tag: str) -> list:
+        """
+        :return:
+            A list of (filename, arch, key) for each signed RPM of the
+            builds presently in *tag*.
+        """
+        return self.db.execute(
+            'SELECT r.filename, r.arch, s.key FROM rpms r'
+            ' JOIN builds b ON b.id = r.build_id'
+            ' JOIN signed s ON s.filename = r.filename'
+            ' WHERE b.nvr IN ('
+            '  SELECT nvr FROM history h WHERE tag = ? AND id = ('
+            '   SELECT MAX(id) FROM history WHERE tag = h.tag AND nvr = h.nvr'
+            '  ) AND tagged'
+            ' )',
+            (tag,),
+        ).fetchall()
+
+    def sign(self, filenames: list, key: str):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO signed (filename, key) VALUES (?, ?)',
+                [(filename, key) for filename in filenames],
+            )
+
+    def new_task(self, method: str, tag: str) -> int:
+        """
+        Create a task that remains open for the duration, and then either
+        fails or closes at the rate, given by the environment for *method*.
+        """
+        duration = command_values(os.environ.get(TASK_DURATION), method)
+        failure_rate = command_values(
+            os.environ.get(TASK_FAILURE_RATE), method
+        )
+        outcome = 'failed' if random.random() < failure_rate else 'closed'
+        with self.db:
+            return self.db.execute(
+                'INSERT INTO tasks (method, tag, finishes, outcome) '
+                'VALUES (?, ?, ?, ?)',
+                (method, tag, time.time() + duration, outcome),
+            ).lastrowid
+
+    def task_state(self, task_id: int) -> str:
+        row = self.db.execute(
+            'SELECT finishes, outcome FROM tasks WHERE id = ?', (task_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f'No such task: {task_id}')
+        finishes, outcome = row
+        return outcome if time.time() >= finishes else 'open'
+
+    def record_call(self, tool: str, command: str, status: int,
+                    seconds: float):
+        with self.db:
+            self.db.execute(
+                'INSERT INTO calls (tool, command, status, seconds) '
+                'VALUES (?, ?, ?, ?)',
+                (tool, command, status, seconds),
+            )
+
+    def call_counts(self) -> dict:
+        """
+        :return:
+            A dict whose keys are (tool, command) and whose values are the
+            number of calls made so far.
+        """
+        return {
+            (tool, command): count
+            for tool, command, count in self.db.execute(
+                'SELECT tool, command, COUNT(*) FROM calls '
+                'GROUP BY tool, command'
+            )
+        }
+
+
+def simulate(tool: str, command: str, latency: float, failure_rate: float,
+             run):
+    """
+    Run one invocation of a fake:  sleep for *latency* seconds, then either
+    fail at random per *failure_rate* or call *run* and exit.  Either way,
+    the call is recorded in the world.
+    """
+    start = time.monotonic()
+    world = World()
+    time.sleep(latency)
+    status = 0
+    if random.random() < failure_rate:
+        print(f'{tool}: simulated failure of {command}', file=sys.stderr)
+        status = 1
+    else:
+        try:
+            run(world)
+        except Exception as e:
+            print(f'{tool}: {e}', file=sys.stderr)
+            status = 1
+    sys.stdout.flush()
+    world.record_call(tool, command, status, time.monotonic() - start)
+    sys.exit(status)
@@ -17,6 +17,7 @@
 #
 # You should have received a copy of the GNU General Public License along with
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import os
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
@@ -30,6 +31,7 @@ LOGGING_CONFIG = '/etc/koji-helpers/logging.yaml'
 # user that runs gojira and smashd, signs builds, etc.
 USER = 'repomgr'
 
-# external executables
-KOJI = '/usr/bin/koji'
-SIGUL = '/usr/bin/sigul'
+# external executables, which may be overridden (e.g., by stand-ins for
+# benchmarking) via the environment
+KOJI = os.environ.get('KOJI_HELPERS_KOJI', '/usr/bin/koji')
+SIGUL = os.environ.get('KOJI_HELPERS_SIGUL', '/usr/bin/sigul')
@@ -26,19 +26,57 @@ from koji_helpers import CONFIG
 BUILDROOT_PREFIX = 'buildroot '
 GOJIRA = 'gojira'
 KLEAN = 'klean'
+KOJI = 'koji'
+METRICS = 'metrics'
 REPOSITORY_PREFIX = 'repository '
 SMASHD = 'smashd'
 
 # option names
+ADDRESS = 'address'
+BACKEND = 'backend'
+BACKOFF = 'backoff'
+BACKOFF_MAX = 'backoff_max'
+BUILD_CACHE_SIZE = 'build_cache_size'
+BUILDINFO_BATCH_SIZE = 'buildinfo_batch_size'
+CATCHUP_CHUNK_SIZE = 'catchup_chunk_size'
+CERT = 'cert'
+COALESCE_WINDOW = 'coalesce_window'
+COMMAND_CONCURRENCY = 'command_concurrency'
+COMMAND_TIMEOUTS = 'command_timeouts'
 EXCLUDE_TAGS = 'exclude_tags'
 GPG_KEY_ID = 'gpg_key_id'
+HEDGE_PERCENTILE = 'hedge_percentile'
+HUB_LOAD_TARGET = 'hub_load_target'
+INTERVAL = 'interval'
 KOJI_DIR = 'koji_dir'
+LEASE_TTL = 'lease_ttl'
+MAX_CONCURRENCY = 'max_concurrency'
 MAX_INTERVAL = 'max_interval'
+MAX_WAIT = 'max_wait'
 MIN_INTERVAL = 'min_interval'
 NOTIFICATIONS_FROM = 'notifications_from'
 NOTIFICATIONS_TO = 'notifications_to'
+PORT = 'port'
+RETRIES = 'retries'
+SERVER = 'server'
+SERVERCA = 'serverca'
+SHARD_DIR = 'shard_dir'
+SHARD_NODE = 'shard_node'
+SIGNATURE_CHECK_WORKERS = 'signature_check_workers'
+SIGNED_INDEX_INTERVAL = 'signed_index_interval'
+SIGNING_CHUNK_MAX = 'signing_chunk_max'
+SIGNING_CHUNK_SECONDS = 'signing_chunk_seconds'
+SIGNING_CONCURRENCY = 'signing_concurrency'
+SIGNING_KEY_CONCURRENCY = 'signing_key_concurrency'
+SIGNING_RETRIES = 'signing_retries'
 SIGUL_KEY_NAME = 'sigul_key_name'
 SIGUL_KEY_PASS = 'sigul_key_pass'
+SKIP_UNCHANGED = 'skip_unchanged'
+TEXTFILE = 'textfile'
+TIMEOUT = 'timeout'
+TUNING = 'tuning'
+WAKEUP = 'wakeup'
+WAKEUP_INTERVAL = 'wakeup_interval'
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
@@ -50,6 +88,33 @@ class ConfigurationError(Exception):
     pass
 
 
+def _parse_command_values(value: str, convert=float) -> dict:
+    """
+    :param value:
+        A space-separated list of `COMMAND:VALUE` pairs, e.g.,
+        `dist-repo:2 write-signed-rpm:1`.
+
+    :param convert:
+        A callable that converts each VALUE from str.
+
+    :return:
+        A dict whose keys are the COMMANDs and whose values are the
+        converted VALUEs.
+    """
+    result = {}
+    for pair in (value or '').split():
+        try:
+            command, setting = pair.rsplit(':', 1)
+            result[command] = convert(setting)
+        except ValueError:
+            raise ConfigurationError(
+                'bad configuration: malformed COMMAND:VALUE pair {!r}'.format(
+                    pair,
+                )
+            ) from None
+    return result
+
+
 class Configuration(object):
     """
     Configuration for the koji-helpers tools.
@@ -78,6 +143,39 @@ class Configuration(object):
         config = configparser.ConfigParser()
         try:
             config.read(self.filename)
+            # The koji section is optional.
+            koji = config[KOJI if config.has_section(KOJI)
+                          else config.default_section]
+            self.koji_backend = koji.get(BACKEND, 'cli')
+            self.koji_server = koji.get(SERVER)
+            self.koji_cert = koji.get(CERT)
+            self.koji_serverca = koji.get(SERVERCA)
+            self.koji_max_concurrency = koji.getint(MAX_CONCURRENCY, 8)
+            self.koji_command_concurrency = _parse_command_values(
+                koji.get(COMMAND_CONCURRENCY), int
+            )
+            self.koji_timeout = koji.getfloat(TIMEOUT, 600)
+            self.koji_command_timeouts = _parse_command_values(
+                koji.get(COMMAND_TIMEOUTS)
+            )
+            self.koji_retries = koji.getint(RETRIES, 3)
+            self.koji_backoff = koji.getfloat(BACKOFF, 2)
+            self.koji_backoff_max = koji.getfloat(BACKOFF_MAX, 60)
+            self.koji_hedge_percentile = koji.getfloat(HEDGE_PERCENTILE, 0)
+            self.koji_coalesce_window = koji.getfloat(COALESCE_WINDOW, 0)
+            # The metrics section is optional too.
+            metrics = config[METRICS if config.has_section(METRICS)
+                             else config.default_section]
+            self.metrics_textfile = metrics.get(TEXTFILE)
+            self.metrics_interval = metrics.getfloat(INTERVAL, 15)
+            self.metrics_address = metrics.get(ADDRESS, '127.0.0.1')
+            self.metrics_port = metrics.getint(PORT, 0)
+            # The gojira section is optional too.
+            gojira = config[GOJIRA if config.has_section(GOJIRA)
+                            else config.default_section]
+            self.gojira_tuning = gojira.get(TUNING, 'half-cycle')
+            self.gojira_wakeup = gojira.get(WAKEUP)
+            self.gojira_wakeup_interval = gojira.getfloat(WAKEUP_INTERVAL, 3600)
             klean = config[KLEAN]
             self.klean_koji_dir = klean.get(KOJI_DIR)
             smashd = config[SMASHD]
@@ -86,6 +184,45 @@ class Configuration(object):
             self.smashd_notifications_to = smashd.get( NOTIFICATIONS_TO).split()
             self.smashd_min_interval = smashd.getfloat(MIN_INTERVAL, 5)
             self.smashd_max_interval = smashd.getfloat(MAX_INTERVAL, 300)
+            self.smashd_max_wait = smashd.getfloat(MAX_WAIT, 1800)
+            self.smashd_tuning = smashd.get(TUNING, 'half-cycle')
+            self.smashd_hub_load_target = smashd.getfloat(HUB_LOAD_TARGET, 0)
+            self.smashd_wakeup = smashd.get(WAKEUP)
+            self.smashd_wakeup_interval = smashd.getfloat(WAKEUP_INTERVAL, 300)
+            self.smashd_shard_dir = smashd.get(SHARD_DIR)
+            self.smashd_shard_node = smashd.get(SHARD_NODE)
+            self.smashd_lease_ttl = smashd.getfloat(LEASE_TTL, 900)
+            self.smashd_buildinfo_batch_size = smashd.getint(
+                BUILDINFO_BATCH_SIZE, 100
+            )
+            self.smashd_build_cache_size = smashd.getint(
+                BUILD_CACHE_SIZE, 100000
+            )
+            self.smashd_catchup_chunk_size = smashd.getint(
+                CATCHUP_CHUNK_SIZE, 5000
+            )
+            self.smashd_signing_concurrency = smashd.getint(
+                SIGNING_CONCURRENCY, 4
+            )
+            self.smashd_signing_key_concurrency = smashd.getint(
+                SIGNING_KEY_CONCURRENCY, 1
+            )
+            self.smashd_signing_chunk_max = smashd.getint(
+                SIGNING_CHUNK_MAX, 1000
+            )
+            self.smashd_signing_chunk_seconds = smashd.getfloat(
+                SIGNING_CHUNK_SECONDS, 60
+            )
+            self.smashd_signing_retries = smashd.getint(SIGNING_RETRIES, 2)
+            self.smashd_signed_index_interval = smashd.getfloat(
+                SIGNED_INDEX_INTERVAL, 3600
+            )
+            self.smashd_signature_check_workers = smashd.getint(
+                SIGNATURE_CHECK_WORKERS, 8
+            )
+            self.smashd_skip_unchanged = smashd.getboolean(
+                SKIP_UNCHANGED, True
+            )
             self.__buildroots = {}
             self.__repos = {}
             for section in config.sections():
@@ -99,6 +236,26 @@ class Configuration(object):
             raise ConfigurationError(
                 'bad configuration: {}'.format(e)
             ) from None
+        if self.koji_backend not in ('cli', 'hub'):
+            raise ConfigurationError(
+                'bad configuration: unsupported koji/backend {!r}'.format(
+                    self.koji_backend,
+                )
+            )
+        if self.koji_backend == 'hub' and not self.koji_server:
+            raise ConfigurationError(
+                'bad configuration: koji/server is required for the hub backend'
+            )
+        if self.smashd_shard_dir:
+            # A lease must outlast any Koji command that may hold up its
+            # work, lest another smashd take the tag over meanwhile.
+            timeouts = [self.koji_timeout]
+            timeouts += self.koji_command_timeouts.values()
+            if 0 in timeouts or self.smashd_lease_ttl <= max(timeouts):
+                raise ConfigurationError(
+                    'bad configuration: smashd/lease_ttl must exceed every '
+                    'koji/timeout and koji/command_timeouts'
+                )
 
         _log.debug(
             '{} configured {:,d} repos and {:,d} buildroots'.format(
@@ -0,0 +1,198 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from threading import Thread
+
+from koji_helpers.config import Configuration
+from koji_helpers.koji import KojiCommand
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+_default_engine = None
+
+
+class KojiEngine(object):
+    """
+    An asyncio-based engine that executes many :class:`KojiCommand` objects
+    concurrently while bounding how many may run at once, both overall and
+    per command type.
+
+    Commands handed to the engine should be constructed with *defer* True so
+    that they don't run (and block) upon construction.  Coroutines running
+    on the engine's event loop may await :meth:`run` directly.  Threaded
+    code may instead use :meth:`submit` to obtain a future, or
+    :meth:`gather` and :meth:`execute` to simply block until the results
+    are ready.
+
+    The event loop runs in a daemon thread of its own while the commands
+    themselves run in a pool of worker threads, since the Koji backends are
+    inherently blocking.
+    """
+
+    def __init__(self, max_concurrency: int = 8, limits: dict = None):
+        """
+        Initialize the KojiEngine object.
+
+        :param max_concurrency:
+            The maximum number of commands that may run at once.
+
+        :param limits:
+            A dict whose keys are Koji command types (e.g., 'dist-repo') and
+            whose values are the maximum number of that type of command
+            that may run at once.  Command types not named here are bound
+            only by *max_concurrency*.
+        """
+        self.max_concurrency = max_concurrency
+        self.limits = limits or {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='KojiEngine',
+        )
+        self._loop = asyncio.new_event_loop()
+        self._semaphores = None
+        self._thread = Thread(
+            target=self.__run_loop, name='KojiEngine', daemon=True,
+        )
+        self._thread.start()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'max_concurrency={self.max_concurrency!r}, '
+                f'limits={self.limits!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'KojiEngine'
+
+    @classmethod
+    def from_config(cls, config: Configuration):
+        """
+        :return:
+            A new KojiEngine bound as directed by the `[koji]` section of
+            *config*.
+        """
+        return cls(config.koji_max_concurrency, config.koji_command_concurrency)
+
+    def __run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def __semaphores(self, command_type: str) -> tuple:
+        # Semaphores must be created on the loop's own thread.
+        if self._semaphores is None:
+            self._semaphores = {None: asyncio.Semaphore(self.max_concurrency)}
+        if command_type not in self._semaphores:
+            limit = self.limits.get(command_type)
+            self._semaphores[command_type] = (
+                asyncio.Semaphore(limit) if limit else None
+            )
+        return self._semaphores[None], self._semaphores[command_type]
+
+    async def run(self, command: KojiCommand) -> KojiCommand:
+        """
+        Run the deferred *command* once the concurrency limits allow.
+
+        This coroutine must run on the engine's event loop.
+
+        :return:
+            The *command*, for convenience.
+        """
+        overall, per_type = self.__semaphores(command.command_type)
+        async with overall:
+            if per_type is None:
+                await self._loop.run_in_executor(self._executor, command.run)
+            else:
+                async with per_type:
+                    await self._loop.run_in_executor(
+                        self._executor, command.run
+                    )
+        return command
+
+    def submit(self, command: KojiCommand) -> Future:
+        """
+        Schedule the deferred *command* to be run by the engine.
+
+        This may be called from any thread other than the engine's own.
+
+        :return:
+            A :class:`concurrent.futures.Future` whose result will be the
+            *command* once it has been run.
+        """
+        return asyncio.run_coroutine_threadsafe(self.run(command), self._loop)
+
+    def gather(self, commands: iter) -> list:
+        """
+        Run all of the deferred *commands* concurrently and await their
+        completion.
+
+        :return:
+            A list of the *commands*, in the order given.
+        """
+        futures = [self.submit(command) for command in commands]
+        return [future.result() for future in futures]
+
+    def execute(self, command: KojiCommand) -> KojiCommand:
+        """
+        Run the deferred *command* and await its completion.
+
+        Even a lone command benefits from the engine in that it is bound by
+        the same concurrency limits as all others sharing the engine.
+
+        :return:
+            The *command*, for convenience.
+        """
+        return self.submit(command).result()
+
+    def shutdown(self):
+        """
+        Stop the engine once all running commands have completed.
+        """
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown()
+
+
+def configure_engine(config: Configuration):
+    """
+    Establish the engine to be shared by all who fan out Koji commands
+    according to the `[koji]` section of *config*.
+    """
+    global _default_engine
+    if _default_engine is not None:
+        _default_engine.shutdown()
+    _default_engine = KojiEngine.from_config(config)
+    _log.info(f'Koji commands will be bound by {_default_engine!r}')
+
+
+def default_engine() -> KojiEngine:
+    """
+    :return:
+        The engine shared by all who fan out Koji commands.  If none was
+        configured, one with default limits is created.
+    """
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = KojiEngine()
+    return _default_engine
@@ -22,7 +22,11 @@ from logging import getLogger
 
 from koji_helpers import CONFIG
 from koji_helpers.config import Configuration
+from koji_helpers.engine import configure_engine
 from koji_helpers.gojira.monitor import BuildRootDependenciesMonitor
+from koji_helpers.koji import configure_backend
+from koji_helpers.metrics import configure_metrics
+from koji_helpers.wakeup import make_waker
 
 GOJIRA_STATE = '/var/lib/koji-helpers/gojira/state'
 
@@ -55,6 +59,10 @@ class GojiraDaemon(object):
             behavior.
         """
         self.config = Configuration(config_name)
+        configure_backend(self.config)
+        configure_engine(self.config)
+        configure_metrics(self.config)
+        self.waker = make_waker(self.config.gojira_wakeup)
         self.__monitors = []
 
     def __repr__(self) -> str:
@@ -72,8 +80,12 @@ class GojiraDaemon(object):
 
     def run(self):
         _log.info('starting an external repo monitor for each buildroot')
+        # One wakeup source serves all, waking every monitor at once.
+        self.waker.start()
         for buildroot in self.config.buildroots:
-            deps_monitor = BuildRootDependenciesMonitor(buildroot, self.config)
+            deps_monitor = BuildRootDependenciesMonitor(
+                buildroot, self.config, self.waker,
+            )
             self.__monitors.append(deps_monitor)
             deps_monitor.start()
         for monitor in self.__monitors:
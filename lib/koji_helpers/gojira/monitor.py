@@ -22,16 +22,20 @@ import json
 import os
 from datetime import datetime
 from logging import getLogger
-from subprocess import CalledProcessError
 from threading import Thread
-from time import sleep
+from time import monotonic, sleep
 
 import requests
 from doubledog.quiescence import QuiescenceMonitor
 
 from koji_helpers.config import Configuration
-from koji_helpers.koji import KojiRegenRepo, KojiTaskInfo, KojiWaitRepo
+from koji_helpers.engine import default_engine
+from koji_helpers.koji import (
+    KojiCommandError, KojiRegenRepo, KojiTaskInfo, KojiWaitRepo,
+)
 from koji_helpers.logging import KojiHelperLoggerAdapter
+from koji_helpers.tuning import make_tuner
+from koji_helpers.wakeup import DEADLINE_SLACK, Waker
 
 # This serves as minimum for both the check-interval and quiescence-period.
 # Anything less than this gains little and is abusive.
@@ -53,7 +57,8 @@ class BuildRootDependenciesMonitor(Thread):
     for that buildroot to prevent it from becoming stale.
     """
 
-    def __init__(self, buildroot: str, config: Configuration):
+    def __init__(self, buildroot: str, config: Configuration,
+                 waker: Waker = None):
         """
         Initialize the BuildRootDependenciesMonitor object.
 
@@ -63,12 +68,21 @@ class BuildRootDependenciesMonitor(Thread):
         :param config:
             The :class:`Configuration` instance that governs this monitors's
             behavior.
+
+        :param waker:
+            The :class:`koji_helpers.wakeup.Waker` that, when woken, has the
+            monitor check for changes at once.  If it is event-driven, the
+            monitor otherwise checks only when quiescence is due or every
+            *wakeup_interval* seconds.
         """
         super().__init__()
         self.buildroot = buildroot
         self.config = config
         self.name = str(self)
-        self._check_interval = MIN_INTERVAL
+        self.tuner = make_tuner(config.gojira_tuning, MIN_INTERVAL)
+        self.waker = waker or Waker()
+        self.__woken = self.waker.generation
+        self.__changed = None
         self._monitor = None
         self._log = KojiHelperLoggerAdapter(
             getLogger(__name__),
@@ -152,33 +166,26 @@ class BuildRootDependenciesMonitor(Thread):
                 url = url.replace('$basearch', arch)
                 yield url
 
-    def __adjust_periods(self, elapsed_time):
+    def __adjust_periods(self, elapsed_time=None):
         """
-        Adjust the quiescent-period to half the length of the last work cycle.
-
-        Statistically, that leaves the probability of delaying this or the
-        next cycle equal.  Without any quiescence period, a straggling event
-        would have to wait unduly long for present events to be processed.
-        A quiescence period that is the full length of the last work cycle
-        could mean that present events wait unduly long for a straggler that
-        may not be coming.
-
-        The check-interval is adjusted to be one quarter of the
-        quiescent-period provided the constraint is not violated.
+        Adjust the quiescent-period and check-interval as directed by the
+        configured tuning strategy; see :mod:`koji_helpers.tuning`.
 
         Both are constrained to be no less than MIN_INTERVAL seconds.
 
         :param elapsed_time:
-            timedelta of the last work cycle.
+            timedelta of the work cycle just concluded, if any.
         """
-        last = elapsed_time.total_seconds()
-        self._monitor.period = max(MIN_INTERVAL, last / 2)
-        self._check_interval = max(MIN_INTERVAL, self._monitor.period / 4)
+        if elapsed_time is not None:
+            self.tuner.observe_cycle(elapsed_time.total_seconds())
+        if not self.tuner.adjust():
+            return
+        self._monitor.period = self.tuner.period
         self._log.info(
             'check-interval/quiescent-period adjusted to '
             '{:0,.1f}/{:0,.1f} seconds'.format(
-                self._check_interval,
-                self._monitor.period,
+                self.tuner.check_interval,
+                self.tuner.period,
             ),
         )
 
@@ -263,16 +270,38 @@ class BuildRootDependenciesMonitor(Thread):
         return changes
 
     def __regen_repo(self):
+        # All monitors share one engine so that their combined load upon the
+        # Koji Hub remains bounded, however many buildroots are monitored.
+        engine = default_engine()
         # This won't wait for completion as it would when run from a tty.
-        task_id = KojiRegenRepo(self.buildroot).task_id
+        task_id = engine.execute(
+            KojiRegenRepo(self.buildroot, defer=True)
+        ).task_id
         self._log.info('newRepo task {!r} started'.format(task_id))
+        # Awaiting the new repo may take hours, so it is done in this
+        # monitor's own thread rather than holding one of the engine's slots,
+        # which would starve the other monitors.
         KojiWaitRepo(self.buildroot)
-        state = KojiTaskInfo(task_id).state
+        state = engine.execute(KojiTaskInfo(task_id, defer=True)).state
         self._log.info('newRepo task {!r} ended as {!r}'.format(task_id, state))
 
-    def __rest(self):
-        self._log.debug('sleeping {} seconds'.format(self._check_interval))
-        sleep(self._check_interval)
+    def __rest(self, pending: bool):
+        interval = self.tuner.check_interval
+        if self.waker.event_driven:
+            # Changes will wake the monitor, so it need only check when the
+            # quiescence of those already seen is due.
+            interval = self.config.gojira_wakeup_interval
+            if pending:
+                due = self.__changed + self.tuner.period - monotonic()
+                interval = min(interval, (
+                    due + DEADLINE_SLACK if due > 0
+                    else self.tuner.check_interval
+                ))
+        self._log.debug('sleeping {:0,.1f} seconds'.format(interval))
+        woken = self.waker.wait(self.__woken, interval)
+        if woken != self.__woken:
+            self._log.debug('woken early')
+            self.__woken = woken
 
     def run(self):
         """
@@ -287,13 +316,17 @@ class BuildRootDependenciesMonitor(Thread):
         # noinspection PyBroadException
         try:
             changes = {}
-            self._monitor = QuiescenceMonitor(MIN_INTERVAL, changes)
+            self._monitor = QuiescenceMonitor(self.tuner.period, changes)
             while True:
                 self._log.debug('checking for changes in external repos')
                 self.__mark = self.__get_present_metadata()
-                changes = self.__get_changes()
+                previous, changes = changes, self.__get_changes()
                 self._log.debug('present changes are {!r}'.format(changes))
                 self._monitor.update(changes)
+                if changes and changes != previous:
+                    self.__changed = monotonic()
+                    self.tuner.observe_change(self.__changed)
+                    self.__adjust_periods()
                 if changes:
                     self._log.debug(
                         'external repos changed; awaiting quiescence'
@@ -306,17 +339,12 @@ class BuildRootDependenciesMonitor(Thread):
                         try:
                             start_time = datetime.now()
                             self.__regen_repo()
-                        except CalledProcessError as e:
-                            self._log.error(
-                                'regen failed: {}; output was:\n{}'.format(
-                                    e,
-                                    e.output.decode()
-                                )
-                            )
+                        except KojiCommandError as e:
+                            self._log.error('regen failed: {}'.format(e))
                         else:
                             self.last_metadata = self.__mark
                             elapsed_time = datetime.now() - start_time
                             self.__adjust_periods(elapsed_time)
-                self.__rest()
+                self.__rest(bool(changes))
         except Exception:
             self._log.exception('died due to unhandled exception')
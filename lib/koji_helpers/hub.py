@@ -0,0 +1,371 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import ssl
+import xmlrpc.client
+from logging import getLogger
+from threading import Condition
+from urllib.parse import urlencode, urlsplit
+
+from koji_helpers.policy import Attempt
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+# Koji's XML-RPC convention for passing keyword arguments:  they ride along
+# as a trailing struct bearing this marker.
+STARSTAR = '__starstar'
+
+# Koji's task states, indexed by their numeric value.
+TASK_STATES = ['FREE', 'OPEN', 'CLOSED', 'CANCELED', 'ASSIGNED', 'FAILED']
+
+# Koji's build states, indexed by their numeric value.
+BUILD_STATES = ['BUILDING', 'COMPLETE', 'DELETED', 'FAILED', 'CANCELED']
+
+_log = getLogger(__name__)
+
+
+class KojiHubError(Exception):
+    """
+    Raised when the Koji Hub faults or cannot be reached.
+    """
+    pass
+
+
+class _KeepAliveTransport(xmlrpc.client.SafeTransport):
+    """
+    An XML-RPC transport that holds one HTTP/1.1 connection open across
+    requests and which honors a socket timeout.
+
+    The standard library transports already reuse their connection, but
+    provide no means of bounding how long a request may take.  Here the
+    *timeout* may be changed between requests and applies to the next one
+    even when the connection is reused.
+    """
+
+    def __init__(self, timeout: float = None, context=None, secure=True):
+        super().__init__(use_builtin_types=True, context=context)
+        self.timeout = timeout
+        self.secure = secure
+
+    def make_connection(self, host):
+        if self.secure:
+            connection = super().make_connection(host)
+        else:
+            connection = xmlrpc.client.Transport.make_connection(self, host)
+        connection.timeout = self.timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(self.timeout)
+        return connection
+
+
+class _Channel(object):
+    """
+    One keep-alive connection to the Koji Hub, with a session of its own
+    once authenticated.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.transport = _KeepAliveTransport(
+            timeout=hub.timeout, context=hub._context,
+            secure=hub._context is not None,
+        )
+        self.session = None
+        self.callnum = 0
+
+    def request(self, method: str, params: tuple, timeout: float = None):
+        handler = self.hub._handler
+        if self.session:
+            self.callnum += 1
+            handler += '?' + urlencode(
+                dict(self.session, callnum=self.callnum)
+            )
+        body = xmlrpc.client.dumps(params, method, allow_none=True).encode(
+            'utf-8', 'xmlcharrefreplace'
+        )
+        self.transport.timeout = timeout
+        try:
+            response = self.transport.request(self.hub._host, handler, body)
+        except xmlrpc.client.Fault as e:
+            raise KojiHubError(
+                f'{method} faulted: {e.faultString}'
+            ) from None
+        except (OSError, xmlrpc.client.ProtocolError) as e:
+            # Drop the connection so the next request starts afresh.
+            self.transport.close()
+            raise KojiHubError(f'{method} failed: {e}') from None
+        return response[0] if len(response) == 1 else response
+
+    def login(self, timeout: float = None):
+        if self.session or not self.hub.cert:
+            return
+        _log.debug(f'{self.hub} logging in via SSL')
+        info = self.request('sslLogin', (), timeout)
+        self.session = {
+            'session-id': info['session-id'],
+            'session-key': info['session-key'],
+        }
+        self.callnum = 0
+        _log.info(f'{self.hub} logged in')
+
+    def call(self, method: str, params: tuple, timeout: float = None):
+        self.login(timeout)
+        try:
+            return self.request(method, params, timeout)
+        except KojiHubError as e:
+            if 'AuthExpired' not in str(e) or not self.session:
+                raise
+            self.session = None
+            self.login(timeout)
+            return self.request(method, params, timeout)
+
+    def logout(self):
+        if self.session:
+            try:
+                self.request('logout', (), self.hub.timeout)
+            except KojiHubError as e:
+                _log.warning(f'{self.hub} logout failed: {e}')
+            self.session = None
+        self.transport.close()
+
+
+class _Calls(object):
+    """
+    The calls that may be made of the Koji Hub's API, all by way of
+    :meth:`call`.
+    """
+
+    def call(self, method: str, *args, **kwargs):
+        raise NotImplementedError
+
+    def multicall(self, calls: list) -> list:
+        """
+        Call many methods of the Koji Hub's API in one round trip.
+
+        :param calls:
+            A list of (method, args, kwargs) tuples.
+
+        :return:
+            A list of results corresponding to *calls*.  Each is either the
+            structured result of the call or a :class:`KojiHubError` instance
+            if that particular call faulted.
+        """
+        if not calls:
+            return []
+        batch = [
+            {'methodName': method,
+             'params': KojiHubSession.encode_args(args, kwargs)}
+            for method, args, kwargs in calls
+        ]
+        results = []
+        for item in self.call('multiCall', batch):
+            if isinstance(item, dict) and 'faultCode' in item:
+                results.append(KojiHubError(item.get('faultString')))
+            else:
+                results.append(item[0])
+        return results
+
+
+class KojiHubSession(_Calls):
+    """
+    A persistent session with a Koji Hub that speaks its native XML-RPC
+    interface rather than forking the Koji CLI for each operation.
+
+    Up to *connections* keep-alive connections are opened as needed and
+    held open for the life of the session, so that as many calls may be
+    made at once.  When a client certificate is configured, each connection
+    is authenticated via Koji's `sslLogin` upon its first call.  Calls over
+    any one connection are serialized since Koji requires the call numbers
+    of an authenticated session to arrive in sequence.
+    """
+
+    def __init__(
+            self,
+            server: str,
+            cert: str = None,
+            serverca: str = None,
+            timeout: float = None,
+            connections: int = 1,
+    ):
+        """
+        Initialize the KojiHubSession object.
+
+        :param server:
+            The URL of the Koji Hub's XML-RPC endpoint, e.g.,
+            `https://koji.example.com/kojihub`.
+
+        :param cert:
+            The name of a PEM file holding the client certificate and key
+            with which to authenticate.  If None, the session remains
+            anonymous and only read operations are possible.
+
+        :param serverca:
+            The name of a PEM file holding the CA certificate(s) by which the
+            Hub's certificate is to be verified.  If None, the system's
+            default trust store is used.
+
+        :param timeout:
+            The maximum number of seconds to wait on any socket operation.
+
+        :param connections:
+            The maximum number of connections to hold open, and thus of
+            calls that may be made at once.
+        """
+        self.server = server
+        self.cert = cert
+        self.serverca = serverca
+        self.timeout = timeout
+        self.connections = connections
+        parts = urlsplit(server)
+        self._host = parts.netloc
+        self._handler = parts.path or '/'
+        self._context = (
+            self.__ssl_context() if parts.scheme == 'https' else None
+        )
+        self._available = Condition()
+        self._idle = []
+        self._opened = 0
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'server={self.server!r}, '
+                f'cert={self.cert!r}, '
+                f'serverca={self.serverca!r}, '
+                f'timeout={self.timeout!r}, '
+                f'connections={self.connections!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'<KojiHubSession {self.server!r}>'
+
+    def __ssl_context(self):
+        context = ssl.create_default_context(cafile=self.serverca)
+        if self.cert:
+            context.load_cert_chain(self.cert)
+        return context
+
+    @staticmethod
+    def encode_args(args, kwargs) -> tuple:
+        """
+        :return:
+            A tuple of the XML-RPC params for a Koji call having positional
+            *args* and keyword *kwargs*.
+        """
+        if kwargs:
+            return tuple(args) + (dict(kwargs, **{STARSTAR: True}),)
+        return tuple(args)
+
+    def __acquire(self, method: str, timeout: float) -> _Channel:
+        with self._available:
+            if not self._available.wait_for(
+                lambda: self._idle or self._opened < self.connections,
+                timeout,
+            ):
+                raise KojiHubError(f'{method} found no connection free')
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        return _Channel(self)
+
+    def __release(self, channel: _Channel):
+        with self._available:
+            self._idle.append(channel)
+            self._available.notify()
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Call one method of the Koji Hub's API.
+
+        :return:
+            The structured result of the call.
+
+        :raise KojiHubError:
+            If the call faulted or the Hub could not be reached.
+        """
+        return self.request(method, self.encode_args(args, kwargs))
+
+    def request(self, method: str, params: tuple, timeout: float = None):
+        """
+        Call one method of the Koji Hub's API with the XML-RPC *params*
+        given, waiting no longer than *timeout* seconds, if not None, on any
+        socket operation nor on a connection becoming free.  The session's
+        own *timeout* still applies should it be shorter.
+
+        :return:
+            The structured result of the call.
+
+        :raise KojiHubError:
+            If the call faulted or the Hub could not be reached.
+        """
+        if timeout is None or (self.timeout is not None
+                               and self.timeout < timeout):
+            timeout = self.timeout
+        channel = self.__acquire(method, timeout)
+        try:
+            return channel.call(method, params, timeout)
+        finally:
+            self.__release(channel)
+
+    def bounded(self, attempt: Attempt):
+        """
+        :return:
+            A view of this session whose every call is bounded by the
+            deadline of *attempt* and which makes no more calls once
+            *attempt* is no longer active.
+        """
+        return _BoundedSession(self, attempt)
+
+    def logout(self):
+        """
+        Terminate the authenticated sessions, if any, and close the
+        connections to the Hub.
+
+        This awaits any calls in progress.
+        """
+        with self._available:
+            self._available.wait_for(
+                lambda: len(self._idle) == self._opened
+            )
+            for channel in self._idle:
+                channel.logout()
+            self._idle.clear()
+            self._opened = 0
+
+
+class _BoundedSession(_Calls):
+    """
+    A view of a :class:`KojiHubSession` whose calls are bounded by the
+    deadline of an :class:`Attempt`.
+    """
+
+    def __init__(self, session: KojiHubSession, attempt: Attempt):
+        self.session = session
+        self.attempt = attempt
+
+    def __str__(self) -> str:
+        return str(self.session)
+
+    def call(self, method: str, *args, **kwargs):
+        if not self.attempt.active:
+            raise KojiHubError(f'{method} abandoned')
+        return self.session.request(
+            method, self.session.encode_args(args, kwargs),
+            self.attempt.remaining,
+        )
@@ -17,13 +17,28 @@
 #
 # You should have received a copy of the GNU General Public License along with
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import io
+import os
 import re
-from logging import getLogger
+import signal
+import time
+from datetime import datetime
+from logging import DEBUG, getLogger
 from os.path import basename
-from subprocess import CalledProcessError, STDOUT, check_output
+from queue import Empty, Queue
+from subprocess import PIPE, Popen, STDOUT
+from tempfile import NamedTemporaryFile
+from threading import Thread
 
 from koji_helpers import KOJI
+from koji_helpers.config import Configuration
+from koji_helpers.hub import (
+    BUILD_STATES, KojiHubError, KojiHubSession, TASK_STATES,
+)
 from koji_helpers.logging import KojiHelperLoggerAdapter
+from koji_helpers.metrics import METRICS
+from koji_helpers.policy import Attempt, CommandPolicy, SingleFlight
+from koji_helpers.rpmhdr import koji_rpm_paths
 
 # The directory name where output of `koji dist-repo` lands.
 REPOS_DIST = 'repos-dist'
@@ -36,11 +51,317 @@ SCRATCH = 'scratch'
 
 CREATED_TASK_PATTERN = re.compile(r'Created task: *(\d+)', re.MULTILINE)
 STATE_PATTERN = re.compile(r'State: *(\S+)', re.MULTILINE)
+EVENT_ID_PATTERN = re.compile(r'''['"]id['"]: *(\d+)''')
+SIGNED_NVRA_PATTERN = re.compile(r'([0-9a-fA-F]{8}) +(\S+)$')
+
+# Names of the supported KojiCommand backends.
+CLI_BACKEND = 'cli'
+HUB_BACKEND = 'hub'
+
+# Bytes of command output held in memory before spooling to a temporary file.
+SPOOL_THRESHOLD = 1024 * 1024
+
+# Bytes of command output beyond which it is no longer logged in full.
+LOG_THRESHOLD = 64 * 1024
+
+# Seconds between polls when the hub backend must await some Koji activity.
+# This matches the Koji CLI's default poll_interval.
+POLL_INTERVAL = 6
+
+_log = getLogger(__name__)
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2017-2019 John Florian"""
 
 
+class KojiCommandError(Exception):
+    """
+    Raised by a KojiCommand backend when the command fails.
+
+    .. attribute:: status
+
+        How the command ended:  the Koji CLI's exit status if known,
+        otherwise 'error' or 'cancelled'.
+    """
+
+    def __init__(self, message: str, status: str = 'error'):
+        super().__init__(message)
+        self.status = status
+
+
+class KojiCommandTimeout(KojiCommandError):
+    """
+    Raised by a KojiCommand backend when the command outlives its deadline.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(message, 'timeout')
+
+
+def _interruption(attempt: Attempt) -> KojiCommandError:
+    """
+    :return:
+        The exception that explains why *attempt* is no longer active.
+    """
+    if attempt.cancelled:
+        return KojiCommandError('cancelled', 'cancelled')
+    return KojiCommandTimeout(f'timed out after {attempt.timeout} seconds')
+
+
+class KojiOutput(object):
+    """
+    A write-once, read-many holder of a command's output.
+
+    Output is held in memory until it exceeds *threshold* bytes, after which
+    all of it is spooled to a temporary file.  Thus the memory consumed
+    remains bounded no matter how much output a command produces.  Every
+    call to :meth:`lines` iterates the output anew and independently of any
+    other, so many readers may share one instance.
+    """
+
+    def __init__(self, threshold: int = SPOOL_THRESHOLD):
+        """
+        Initialize the KojiOutput object.
+
+        :param threshold:
+            The number of bytes to hold in memory before spooling to a
+            temporary file.
+        """
+        self.threshold = threshold
+        self.size = 0
+        self._buffer = bytearray()
+        self._file = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'threshold={self.threshold!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return ''.join(self.lines())
+
+    @property
+    def spooled(self) -> bool:
+        """
+        :return:
+            True if the output has been spooled to a temporary file.
+        """
+        return self._file is not None
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self._file is None:
+            self._buffer += data
+            if len(self._buffer) > self.threshold:
+                self._file = NamedTemporaryFile(prefix='koji-helpers-')
+                self._file.write(self._buffer)
+                self._buffer = bytearray()
+        else:
+            self._file.write(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def lines(self) -> iter:
+        """
+        :return:
+            An iter of str, each being one decoded line of the output,
+            complete with its line terminator.
+        """
+        if self._file is None:
+            yield from io.TextIOWrapper(
+                io.BytesIO(self._buffer), errors='replace'
+            )
+        else:
+            with open(self._file.name, errors='replace') as f:
+                yield from f
+
+
+class KojiCLIBackend(object):
+    """
+    A KojiCommand backend that forks the Koji Client CLI for each command.
+    """
+
+    # The Koji CLI can make only one query per invocation.
+    multicall = False
+
+    def __repr__(self) -> str:
+        return f'{self.__module__}.{self.__class__.__name__}()'
+
+    def __str__(self) -> str:
+        return 'KojiCLIBackend'
+
+    @staticmethod
+    def __kill(process: Popen):
+        # The child leads its own process group so that any descendants
+        # holding its output open are killed too.
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def __watch(self, process: Popen, attempt: Attempt):
+        # Kill the child should the attempt be cancelled or outlive its
+        # deadline before finishing.
+        if not attempt.wait() and process.poll() is None:
+            self.__kill(process)
+
+    def execute(self, command, attempt: Attempt) -> iter:
+        """
+        Execute *command* via the Koji CLI.
+
+        :param attempt:
+            The attempt being made, which bounds how long the Koji CLI may
+            run.
+
+        :return:
+            An iter of bytes, each being one line of stdout and stderr
+            (merged) as soon as the Koji CLI produces it.
+
+        :raise KojiCommandError:
+            If the Koji CLI terminated abnormally.
+
+        :raise KojiCommandTimeout:
+            If the Koji CLI outlived the attempt's deadline.
+        """
+        process_args = [KOJI] + command.args
+        command._log.debug(f'process_args={process_args!r}')
+        with Popen(process_args, stdout=PIPE, stderr=STDOUT,
+                   start_new_session=True) as process:
+            Thread(
+                target=self.__watch, args=(process, attempt), daemon=True,
+            ).start()
+            try:
+                yield from process.stdout
+                process.wait()
+            except GeneratorExit:
+                # The consumer lost interest; don't leave the child behind.
+                self.__kill(process)
+                raise
+            finally:
+                attempt.finish()
+        if not attempt.active:
+            raise _interruption(attempt)
+        if process.returncode:
+            raise KojiCommandError(
+                f'{KOJI} exited with status {process.returncode}',
+                str(process.returncode),
+            )
+
+
+class KojiHubBackend(object):
+    """
+    A KojiCommand backend that speaks XML-RPC directly to the Koji Hub over
+    one persistent :class:`KojiHubSession`, whose connections are shared by
+    all commands.
+
+    Any command that has no native implementation falls back to the
+    :class:`KojiCLIBackend`.
+
+    Many queries may be made in a single round trip, such as by
+    :class:`KojiListHistories`, hence `multicall` is True.
+    """
+
+    multicall = True
+
+    def __init__(self, session: KojiHubSession, koji_dir: str = None):
+        """
+        Initialize the KojiHubBackend object.
+
+        :param session:
+            The Koji Hub session shared by all commands.
+
+        :param koji_dir:
+            The directory where the Koji volume is mounted, for commands
+            that, like their CLI counterparts, must examine the files there.
+            If None, such commands fall back to the CLI.
+        """
+        self.session = session
+        self.koji_dir = koji_dir
+        self.fallback = KojiCLIBackend()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'session={self.session!r}, '
+                f'koji_dir={self.koji_dir!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'KojiHubBackend via {self.session}'
+
+    def execute(self, command, attempt: Attempt) -> iter:
+        """
+        Execute *command* natively against the Koji Hub.
+
+        :param attempt:
+            The attempt being made, which bounds how long the command may
+            run and which receives the command's structured result.
+
+        :return:
+            An iter of bytes, each being one line of a textual rendering of
+            the command's structured result.
+
+        :raise KojiCommandError:
+            If the Koji Hub faulted or could not be reached.
+
+        :raise KojiCommandTimeout:
+            If the command outlived the attempt's deadline.
+        """
+        # Each call is bounded by what remains of the attempt's deadline and
+        # made over a connection of its own, so that a hedged duplicate
+        # truly runs alongside the original.
+        try:
+            attempt.result, output = command.hub_execute(
+                self.session.bounded(attempt), attempt
+            )
+        except NotImplementedError:
+            command._log.debug('no native implementation; using the CLI')
+            yield from self.fallback.execute(command, attempt)
+        except KojiHubError as e:
+            if not attempt.active:
+                raise _interruption(attempt) from None
+            raise KojiCommandError(str(e)) from None
+        else:
+            if not attempt.active:
+                raise _interruption(attempt)
+            for line in output.splitlines(keepends=True):
+                yield line.encode()
+
+
+def configure_backend(config: Configuration):
+    """
+    Establish the backend to be used by every KojiCommand according to the
+    `[koji]` section of *config*.
+    """
+    if config.koji_backend == HUB_BACKEND:
+        KojiCommand.backend = KojiHubBackend(
+            KojiHubSession(
+                config.koji_server,
+                cert=config.koji_cert,
+                serverca=config.koji_serverca,
+                timeout=config.koji_timeout or None,
+                # Leave room for a hedged duplicate of every command the
+                # engine may run at once.
+                connections=config.koji_max_concurrency * (
+                    2 if config.koji_hedge_percentile else 1
+                ),
+            ),
+            koji_dir=config.klean_koji_dir,
+        )
+    else:
+        KojiCommand.backend = KojiCLIBackend()
+    KojiCommand.policy = CommandPolicy.from_config(config)
+    KojiCommand.flights = SingleFlight(config.koji_coalesce_window)
+    METRICS.register(
+        'koji_coalesced_total', 'counter',
+        'Koji commands satisfied by an identical command in flight.',
+        lambda: KojiCommand.flights.shared,
+    )
+    _log.info(f'Koji commands will use {KojiCommand.backend}')
+    _log.info(f'Koji commands will follow {KojiCommand.policy!r}')
+
+
 class KojiCommand(object):
     """
     A wrapper around the Koji Client CLI.
@@ -50,10 +371,43 @@ class KojiCommand(object):
     API abstraction which may be beneficial given its deep ties to Koji while
     remaining an external, unassociated project.
 
+    The command is carried out by the class-wide `backend`, which forks the
+    Koji CLI by default.  See :func:`configure_backend` for using the Koji
+    Hub's XML-RPC interface instead.  Subclasses that can be executed
+    natively against the hub override :meth:`hub_execute`.
+
+    Each attempt at running the command is bounded by a deadline per the
+    class-wide `policy`.  Subclasses that are safe to repeat set
+    `idempotent` True, which allows the policy to retry them upon failure
+    and to hedge them when they run unusually long.  Once no attempts
+    remain, the :class:`KojiCommandError` that ended the last one is raised,
+    by the constructor unless running was deferred, else by :meth:`run` or
+    :meth:`lines`.  Subclasses whose failures may still yield useful output
+    override :meth:`_tolerable`.
+
+    Subclasses whose concurrent executions would be indistinguishable set
+    `coalescible` True.  Then, when :meth:`run` is called while an identical
+    command is already running in another thread, the two share that one
+    execution and its outcome per the class-wide `flights`.  Those whose
+    outcome is stale as soon as it is had, such as awaiting something new,
+    also set `lingering` False so that an execution that already finished
+    is never shared.
+
     Note that while many of Koji's commands may sport a `--no-wait` option,
     Koji will effectively be asynchronous implicitly when run without an
     attached tty.
 
+    Output is spooled to a temporary file once it grows beyond
+    `SPOOL_THRESHOLD` bytes.  Consumers of potentially large output should
+    iterate :meth:`lines` rather than use `output`.  When constructed with
+    *stream* True, the command is not run until :meth:`lines` is first
+    iterated, which then yields each line as soon as Koji produces it.
+
+    When constructed with *defer* True, the command is not run until
+    :meth:`run` is called, which allows commands to be prepared now and
+    executed later, e.g., concurrently by a
+    :class:`koji_helpers.engine.KojiEngine`.
+
     .. attribute:: args
 
         The Koji CLI command, options and arguments as passed to the
@@ -63,19 +417,42 @@ class KojiCommand(object):
     .. attribute:: output
 
         The captured and decoded output of stdout and stderr (merged).
+
+
+    .. attribute:: result
+
+        The structured result of the command when it was executed natively
+        by the hub backend, otherwise None.
     """
 
-    def __init__(self, args):
+    backend = KojiCLIBackend()
+    coalescible = False
+    flights = SingleFlight()
+    idempotent = False
+    lingering = True
+    policy = CommandPolicy()
+
+    def __init__(self, args, stream: bool = False, defer: bool = False):
         """
         Initialize the KojiCommand object.
+
+        :param stream:
+            If True, defer running the command until :meth:`lines` is
+            iterated.
+
+        :param defer:
+            If True, defer running the command until :meth:`run` is called.
         """
         self.args = args if isinstance(args, list) else [args]
         self._log = KojiHelperLoggerAdapter(
             getLogger(__name__),
             {'name': str(self)},
         )
-        self.output = None
-        self.run()
+        self.result = None
+        self._error = None
+        self._output = None
+        if not (stream or defer):
+            self.run()
 
     def __repr__(self) -> str:
         return ('{}.{}('
@@ -90,27 +467,269 @@ class KojiCommand(object):
             self.args,
         )
 
-    def run(self):
-        self._log.debug('starting')
-        process_args = [KOJI] + self.args
-        self._log.debug(f'process_args={process_args!r}')
+    @property
+    def command_type(self) -> str:
+        """
+        :return:
+            The Koji CLI command being wrapped, e.g., 'buildinfo'.
+        """
+        return self.args[0]
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        """
+        Execute this command natively against the Koji Hub.
+
+        Every call made via *session* is bounded by the deadline of
+        *attempt*.  Implementations that must await Koji activity should do
+        so by way of `attempt.wait()` so as to honor it likewise.  They must
+        not alter this object since hedged attempts may run concurrently.
+
+        :return:
+            A (result, output) tuple where result is the structured result
+            of the command and output is a textual rendering of it that
+            resembles what the Koji CLI would have output.
+
+        :raise NotImplementedError:
+            If this command has no native implementation.
+        """
+        raise NotImplementedError
+
+    @property
+    def output(self) -> str:
+        """
+        :return:
+            The captured and decoded output of stdout and stderr (merged).
+        """
+        return ''.join(self.lines())
+
+    def lines(self) -> iter:
+        """
+        :return:
+            An iter of str, each being one decoded line of stdout and stderr
+            (merged), complete with its line terminator.
+
+        :raise KojiCommandError:
+            If the command failed, even when it did so before this call, so
+            that what output it produced is never mistaken for complete.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._output is None:
+            for line in self.__execute(stream=True):
+                yield line.decode(errors='replace')
+        else:
+            yield from self._output.lines()
+
+    def __describe_output(self) -> str:
+        if self._output.size == 0:
+            return 'silently'
+        if self._output.size > LOG_THRESHOLD:
+            return f'and output {self._output.size:,d} bytes'
+        return 'and output:\n{}'.format(self._output)
+
+    def __complete(self, attempt: Attempt) -> tuple:
+        """
+        Carry out *attempt* to completion.
+
+        :return:
+            An (output, error) tuple where output is the KojiOutput of the
+            attempt and error is the KojiCommandError that ended it or None
+            if it succeeded.
+        """
+        output = KojiOutput()
         try:
-            self.output = check_output(process_args, stderr=STDOUT).decode()
-        except CalledProcessError as e:
-            self.output = e.output.decode()
-            self._log.error(
-                'terminated abnormally {}'.format(
-                    ('and silently' if self.output.strip() == ''
-                     else 'and output:\n{}'.format(self.output))
-                )
-            )
+            for line in self.backend.execute(self, attempt):
+                output.write(line)
+        except KojiCommandError as e:
+            return output, e
+        finally:
+            output.flush()
+        return output, None
+
+    def __hedge(self, timeout: float, delay: float) -> tuple:
+        """
+        Carry out one attempt and, should it not complete within *delay*
+        seconds, a duplicate of it too.  The first to succeed wins and the
+        other is cancelled.
+
+        :return:
+            An (attempt, output, error) tuple for the winning attempt, or
+            for the last to fail if neither succeeded.
+        """
+        outcomes = Queue()
+
+        def work(a: Attempt):
+            outcomes.put((a,) + self.__complete(a))
+
+        attempts = [Attempt(timeout)]
+        Thread(target=work, args=(attempts[0],), daemon=True).start()
+        try:
+            outcome = outcomes.get(timeout=delay)
+        except Empty:
+            self._log.info(f'hedging after {delay:0,.1f} seconds')
+            attempts.append(Attempt(timeout))
+            Thread(target=work, args=(attempts[1],), daemon=True).start()
+            outcome = outcomes.get()
+            if outcome[2] is not None:
+                outcome = outcomes.get()
+        for attempt in attempts:
+            if attempt is not outcome[0]:
+                attempt.cancel()
+        return outcome
+
+    def __attempt(self):
+        timeout = self.policy.timeout_for(self.command_type)
+        delay = (self.policy.hedge_delay(self.command_type)
+                 if self.idempotent else None)
+        if delay is None:
+            attempt = Attempt(timeout)
+            output, error = self.__complete(attempt)
         else:
-            self._log.debug(
-                'completed {}'.format(
-                    ('silently' if self.output.strip() == ''
-                     else 'and output:\n{}'.format(self.output))
+            attempt, output, error = self.__hedge(timeout, delay)
+        self._output = output
+        if error is not None:
+            raise error
+        self.result = attempt.result
+
+    def __stream_attempt(self) -> iter:
+        attempt = Attempt(self.policy.timeout_for(self.command_type))
+        self._output = KojiOutput()
+        try:
+            for line in self.backend.execute(self, attempt):
+                self._output.write(line)
+                yield line
+        finally:
+            self._output.flush()
+        self.result = attempt.result
+
+    def __observe(self, start: float, status: str) -> float:
+        """
+        Record the metrics of an attempt begun at *start* that ended with
+        *status*.
+
+        :return:
+            The number of seconds the attempt took.
+        """
+        seconds = time.monotonic() - start
+        METRICS.observe_command(
+            'koji', self.command_type, seconds, status,
+            self._output.size if self._output is not None else None,
+        )
+        return seconds
+
+    def _tolerable(self, error: KojiCommandError) -> bool:
+        """
+        :return:
+            True if the command's output remains useful despite its having
+            ended with *error*, in which case it is neither retried nor
+            raised.
+        """
+        return False
+
+    def __execute(self, stream: bool = False) -> iter:
+        self._log.debug('starting')
+        self._error = None
+        retries = self.policy.retries if self.idempotent else 0
+        for retry in range(retries + 1):
+            if retry:
+                delay = self.policy.backoff_for(retry)
+                self._log.warning(
+                    f'retry {retry}/{retries} in {delay:0,.1f} seconds'
                 )
-            )
+                time.sleep(delay)
+            streamed = False
+            start = time.monotonic()
+            try:
+                if stream:
+                    for line in self.__stream_attempt():
+                        streamed = True
+                        yield line
+                else:
+                    self.__attempt()
+            except KojiCommandError as e:
+                self.__observe(start, e.status)
+                if self._tolerable(e):
+                    self._log.warning(
+                        f'terminated abnormally ({e}) but usefully '
+                        f'{self.__describe_output()}'
+                    )
+                    break
+                self._log.error(
+                    f'terminated abnormally ({e}) {self.__describe_output()}'
+                )
+                # What's been streamed cannot be retracted.
+                if streamed or retry == retries:
+                    self._error = e
+                    raise
+            else:
+                self.policy.record(
+                    self.command_type, self.__observe(start, '0')
+                )
+                if self._log.isEnabledFor(DEBUG):
+                    self._log.debug(f'completed {self.__describe_output()}')
+                break
+
+    def __run(self):
+        for _ in self.__execute():
+            pass
+        return self
+
+    def run(self):
+        if not self.coalescible:
+            self.__run()
+            return
+        key = (self.__class__, tuple(self.args))
+        leader, shared = self.flights.do(key, self.__run, self.lingering)
+        if shared:
+            self._log.debug('coalesced with an identical command in flight')
+            self._output = leader._output
+            self.result = leader.result
+
+
+def _epoch(timestamp: str) -> float:
+    """
+    :param timestamp:
+        A local time expressed per RFC 3339 format, as smashd tracks them.
+
+    :return:
+        The equivalent seconds since the epoch, as the Koji CLI would
+        compute it.
+    """
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(timestamp, fmt).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f'unsupported timestamp {timestamp!r}')
+
+
+def _get_build_rpms(session: KojiHubSession, nvrs: list) -> dict:
+    """
+    :return:
+        A dict whose keys are the NVRs given and whose values are a tuple of
+        (build, rpms) where build is Koji's build info and rpms is a list of
+        Koji's RPM info for that build.  Builds unknown to Koji are omitted.
+    """
+    builds = session.multicall([('getBuild', (nvr,), {}) for nvr in nvrs])
+    found = [
+        (nvr, build) for nvr, build in zip(nvrs, builds)
+        if build and not isinstance(build, Exception)
+    ]
+    rpms = session.multicall([
+        ('listRPMs', (), {'buildID': build['id']}) for nvr, build in found
+    ])
+    return {
+        nvr: (build, [] if isinstance(rpm_list, Exception) else rpm_list)
+        for (nvr, build), rpm_list in zip(found, rpms)
+    }
+
+
+def _rpm_filename(rpm: dict) -> str:
+    """
+    :return:
+        The file name of the RPM described by Koji's RPM info *rpm*.
+    """
+    return '{name}-{version}-{release}.{arch}.rpm'.format(**rpm)
 
 
 class KojiBuildInfo(KojiCommand):
@@ -118,20 +737,46 @@ class KojiBuildInfo(KojiCommand):
     A wrapper around the `koji buildinfo` command.
     """
 
-    def __init__(self, nvr):
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, nvr, **kwargs):
         """
         :param nvr:
             A str or list or str with each being one Name-Version-Release value
             to be queried.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.nvr = nvr if isinstance(nvr, list) else [nvr]
-        super().__init__(['buildinfo'] + self.nvr)
+        super().__init__(['buildinfo'] + self.nvr, **kwargs)
 
     def __str__(self) -> str:
         return '<Koji BuildInfo {!r}>'.format(
             self.nvr,
         )
 
+    def _tolerable(self, error: KojiCommandError) -> bool:
+        # The CLI fails if any build is unknown, yet reports all the others.
+        return any(line.startswith('No such build:') for line in self.lines())
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        result = _get_build_rpms(session, self.nvr)
+        lines = []
+        for nvr in self.nvr:
+            if nvr not in result:
+                lines.append(f'No such build: {nvr}')
+                continue
+            build, rpms = result[nvr]
+            lines += [
+                f'BUILD: {nvr} [{build["id"]}]',
+                f'State: {BUILD_STATES[build["state"]]}',
+                'RPMs:',
+            ]
+            lines += [_rpm_filename(rpm) for rpm in rpms]
+        return result, '\n'.join(lines) + '\n'
+
     @property
     def rpms(self) -> set:
         """
@@ -140,21 +785,118 @@ class KojiBuildInfo(KojiCommand):
             Remember that each Koji build for NEVR results in one NEVR.src.rpm
             and one or more NEVR.ARCH.rpm.
         """
-        rpms, ready = set(), False
-        for line in self.output.splitlines():
-            if ready:
-                rpms.add(basename(line.strip()))
-            else:
-                ready |= line.strip() == 'RPMs:'
+        rpms = set()
+        for build_rpms in self.rpms_by_build.values():
+            rpms.update(build_rpms)
         return rpms
 
+    @property
+    def rpms_by_build(self) -> dict:
+        """
+        :return:
+            A dict whose keys are the NVR of each build found and whose
+            values are a set of str, each being one RPM of that build.
+        """
+        if self.result is not None:
+            return {
+                nvr: {_rpm_filename(rpm) for rpm in rpms}
+                for nvr, (build, rpms) in self.result.items()
+            }
+        builds, nvr, ready = {}, None, False
+        for line in self.lines():
+            line = line.strip()
+            if line.startswith('BUILD:'):
+                nvr, ready = line.split()[1], False
+                builds[nvr] = set()
+            elif ready and line.endswith('.rpm'):
+                builds[nvr].add(basename(line))
+            else:
+                ready |= nvr is not None and line == 'RPMs:'
+        return builds
+
+    @property
+    def states(self) -> dict:
+        """
+        :return:
+            A dict whose keys are the NVR of each build found and whose
+            values are the state of that build, e.g., 'COMPLETE'.
+        """
+        if self.result is not None:
+            return {
+                nvr: BUILD_STATES[build['state']]
+                for nvr, (build, rpms) in self.result.items()
+            }
+        states, nvr = {}, None
+        for line in self.lines():
+            if line.startswith('BUILD:'):
+                nvr = line.split()[1]
+            elif nvr is not None and line.startswith('State:'):
+                states[nvr] = line.split()[1]
+        return states
+
+
+def query_build_rpms(
+        nvrs: iter,
+        batch_size: int = 100,
+        cache=None,
+        engine=None,
+) -> dict:
+    """
+    Resolve the RPMs for many builds using as few Koji round trips as
+    possible.
+
+    The builds are queried in batches of *batch_size* per
+    :class:`KojiBuildInfo`, which costs one fork of the CLI or two hub
+    multicalls per batch regardless of how many builds each holds.
+
+    :param nvrs:
+        An iter of str, each being one Name-Version-Release value to be
+        queried.
+
+    :param batch_size:
+        The maximum number of builds to be queried per round trip.
+
+    :param cache:
+        An optional :class:`koji_helpers.smashd.build_cache.BuildCache`.
+        Builds found there are not queried at all and completed builds
+        that had to be queried are added to it.
+
+    :param engine:
+        An optional :class:`koji_helpers.engine.KojiEngine` by which the
+        batches are queried concurrently rather than one after another.
+
+    :return:
+        A dict whose keys are the NVR of each build found and whose values
+        are a set of str, each being one RPM of that build.
+    """
+    nvrs = sorted(set(nvrs))
+    builds = cache.get_many(nvrs) if cache is not None else {}
+    nvrs = [nvr for nvr in nvrs if nvr not in builds]
+    batches = [
+        KojiBuildInfo(nvrs[i:i + batch_size], defer=engine is not None)
+        for i in range(0, len(nvrs), batch_size)
+    ]
+    if engine is not None:
+        engine.gather(batches)
+    for info in batches:
+        rpms_by_build = info.rpms_by_build
+        builds.update(rpms_by_build)
+        if cache is not None:
+            # Only a completed build's RPMs are certain never to change.
+            cache.put_many({
+                nvr: rpms_by_build[nvr]
+                for nvr, state in info.states.items()
+                if state == 'COMPLETE' and nvr in rpms_by_build
+            })
+    return builds
+
 
 class KojiDistRepo(KojiCommand):
     """
     A wrapper around the `koji dist-repo` command.
     """
 
-    def __init__(self, tag: str, key_id: str):
+    def __init__(self, tag: str, key_id: str, **kwargs):
         """
         :param tag:
             Tag for which the distribution repo is to be built.
@@ -162,45 +904,151 @@ class KojiDistRepo(KojiCommand):
         :param key_id:
             GPG signing key ID with which RPMs must be signed if they are to
             be included in the repo.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.tag = tag
         self.key_id = key_id
-        super().__init__(['dist-repo', '--with-src', self.tag, self.key_id])
+        super().__init__(
+            ['dist-repo', '--with-src', self.tag, self.key_id], **kwargs
+        )
 
     def __str__(self) -> str:
         return f'<Koji DistRepo tag={self.tag!r} key_id={self.key_id}>'
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        # Mimic the CLI's defaults:  all of the tag's arches plus the
+        # sources, only the latest builds and with inheritance.
+        arches = session.call('getBuildConfig', self.tag)['arches'] or ''
+        result = session.call(
+            'distRepo', self.tag, [self.key_id],
+            arch=sorted(set(arches.split()) | {'src'}),
+            comp=None,
+            delta=[],
+            event=None,
+            inherit=True,
+            latest=True,
+            multilib=False,
+            split_debuginfo=False,
+            skip_missing_signatures=False,
+            allow_missing_signatures=False,
+        )
+        return result, (f'Creating dist repo for tag {self.tag}\n'
+                        f'Created task: {result}\n')
+
+    @property
+    def task_id(self):
+        """
+        :return:
+            The ID of the distRepo task that was created or None if it
+            could not be determined.
+        """
+        if self.result is not None:
+            return str(self.result)
+        match = CREATED_TASK_PATTERN.search(self.output)
+        return match.group(1) if match else None
+
 
 class KojiTaskInfo(KojiCommand):
     """
     A wrapper around the `koji taskinfo` command.
     """
 
-    def __init__(self, task_id: str):
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, task_id: str, **kwargs):
         """
         :param task_id:
             The ID of the task to be queried.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.task_id = task_id
-        super().__init__(['taskinfo', self.task_id])
+        super().__init__(['taskinfo', self.task_id], **kwargs)
 
     def __str__(self) -> str:
         return '<Koji TaskInfo {!r}>'.format(
             self.task_id,
         )
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        result = session.call('getTaskInfo', int(self.task_id))
+        if result is None:
+            raise KojiHubError(f'No such task: {self.task_id}')
+        return result, (f'Task: {result["id"]}\n'
+                        f'Type: {result["method"]}\n'
+                        f'State: {TASK_STATES[result["state"]].lower()}\n')
+
     @property
     def state(self) -> str:
-        match = STATE_PATTERN.search(self.output)
-        return match.group(1) if match else 'unknown'
+        if self.result is not None:
+            return TASK_STATES[self.result['state']].lower()
+        for line in self.lines():
+            match = STATE_PATTERN.search(line)
+            if match:
+                return match.group(1)
+        return 'unknown'
+
+
+class KojiLastEvent(KojiCommand):
+    """
+    A wrapper around the `koji call getLastEvent` command.
+    """
+
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, **kwargs):
+        """
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
+        """
+        super().__init__(['call', 'getLastEvent'], **kwargs)
+
+    def __str__(self) -> str:
+        return '<Koji LastEvent>'
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        result = session.call('getLastEvent')
+        return result, f'{result!r}\n'
+
+    @property
+    def event_id(self):
+        """
+        :return:
+            The ID of the most recent event known to the Koji Hub as an int
+            or None if it could not be determined.
+        """
+        if self.result is not None:
+            return self.result['id']
+        match = EVENT_ID_PATTERN.search(self.output)
+        return int(match.group(1)) if match else None
 
 
 class KojiListHistory(KojiCommand):
     """
     A wrapper around the `koji list-history` command.
+
+    The history may be bounded by timestamps, by Koji event IDs or by a mix
+    of both.  Event IDs are preferable since they increase monotonically
+    across the Koji Hub regardless of any clock.
     """
 
-    def __init__(self, after: str, before: str):
+    coalescible = True
+    idempotent = True
+
+    def __init__(
+            self,
+            after: str = None,
+            before: str = None,
+            after_event: int = None,
+            before_event: int = None,
+            tag: str = None,
+            **kwargs
+    ):
         """
         :param after:
             Include only tag history events occurring after this timestamp,
@@ -209,20 +1057,167 @@ class KojiListHistory(KojiCommand):
         :param before:
             Include only tag history events occurring before this timestamp,
             expressed per RFC 3339 format.
+
+        :param after_event:
+            Include only tag history events after this Koji event ID.
+
+        :param before_event:
+            Include only tag history events before this Koji event ID.
+
+        :param tag:
+            Include only history events involving this tag.  If None, the
+            history of every tag is included.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.before = before
         self.after = after
-        super().__init__([
-            'list-history',
-            '--after={}'.format(self.after),
-            '--before={}'.format(self.before),
-        ])
+        self.after_event = after_event
+        self.before_event = before_event
+        self.tag = tag
+        args = ['list-history']
+        if after is not None:
+            args.append(f'--after={after}')
+        if before is not None:
+            args.append(f'--before={before}')
+        if after_event is not None:
+            args.append(f'--after-event={after_event}')
+        if before_event is not None:
+            args.append(f'--before-event={before_event}')
+        if tag is not None:
+            args.append(f'--tag={tag}')
+        super().__init__(args, **kwargs)
+
+    def __str__(self) -> str:
+        if self.after_event is not None or self.before_event is not None:
+            window = 'events {!r}-{!r}'.format(
+                self.after_event,
+                self.before_event,
+            )
+        else:
+            window = '{!r}-{!r}'.format(
+                self.after,
+                self.before,
+            )
+        if self.tag is not None:
+            return f'<Koji ListHistory tag={self.tag!r} {window}>'
+        return f'<Koji ListHistory {window}>'
+
+    def __within(self, event_id: int, ts: float) -> bool:
+        return not (
+            (self.after is not None and ts <= _epoch(self.after))
+            or (self.before is not None and ts >= _epoch(self.before))
+            or (self.after_event is not None and event_id <= self.after_event)
+            or (self.before_event is not None
+                and event_id >= self.before_event)
+        )
+
+    def _hub_call(self) -> tuple:
+        """
+        :return:
+            A (method, args, kwargs) tuple for the Koji Hub call that
+            queries this history.
+        """
+        bounds = {}
+        if self.after is not None:
+            bounds['after'] = _epoch(self.after)
+        if self.before is not None:
+            bounds['before'] = _epoch(self.before)
+        if self.after_event is not None:
+            bounds['afterEvent'] = self.after_event
+        if self.before_event is not None:
+            bounds['beforeEvent'] = self.before_event
+        if self.tag is not None:
+            bounds['tag'] = self.tag
+        return 'queryHistory', (), dict(bounds, tables=['tag_listing'])
+
+    def _hub_result(self, history: dict) -> tuple:
+        """
+        :return:
+            A (result, output) tuple, as for :meth:`hub_execute`, from the
+            *history* returned by the call of :meth:`_hub_call`.
+        """
+        # Like the CLI, each listing may yield both a tagging and an
+        # untagging event, but only those within the bounds are reported.
+        timeline = []
+        for entry in history['tag_listing']:
+            for created, event, ts, user in [
+                (True, 'create_event', 'create_ts', 'creator_name'),
+                (False, 'revoke_event', 'revoke_ts', 'revoker_name'),
+            ]:
+                if (entry[event] is not None
+                        and self.__within(entry[event], entry[ts])):
+                    timeline.append((
+                        entry[event],
+                        entry[ts],
+                        '{name}-{version}-{release}'.format(**entry),
+                        created,
+                        entry['tag.name'],
+                        entry[user],
+                    ))
+        timeline.sort()
+        return timeline, ''.join(
+            '{} {} {} {} by {}\n'.format(
+                time.asctime(time.localtime(ts)),
+                build,
+                'tagged into' if created else 'untagged from',
+                tag,
+                user,
+            )
+            for event_id, ts, build, created, tag, user in timeline
+        )
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        method, args, kwargs = self._hub_call()
+        return self._hub_result(session.call(method, *args, **kwargs))
+
+
+class KojiListHistories(KojiCommand):
+    """
+    Many :class:`KojiListHistory` queries, e.g., one per tag, made in a
+    single round trip to the Koji Hub.
+
+    The Koji CLI offers no equivalent, so this must only be run by a
+    backend whose `multicall` is True.
+    """
+
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, queries: list, **kwargs):
+        """
+        :param queries:
+            A list of :class:`KojiListHistory`, each constructed with
+            *defer* True and left unrun.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
+        """
+        self.queries = queries
+        super().__init__(
+            ['list-history'] + [
+                arg for query in queries for arg in query.args[1:]
+            ],
+            **kwargs
+        )
 
     def __str__(self) -> str:
-        return '<Koji ListHistory {!r}-{!r}>'.format(
-            self.after,
-            self.before,
+        return f'<Koji ListHistories of {len(self.queries)} queries>'
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        histories = session.multicall(
+            [query._hub_call() for query in self.queries]
         )
+        results = []
+        for history, query in zip(histories, self.queries):
+            if isinstance(history, Exception):
+                raise history
+            results.append(query._hub_result(history))
+        # The output of each query follows that of the one before, as
+        # though each had been run in turn.
+        return ([result for result, _ in results],
+                ''.join(output for _, output in results))
 
 
 class KojiListSigned(KojiCommand):
@@ -230,32 +1225,160 @@ class KojiListSigned(KojiCommand):
     A wrapper around the `koji list-signed` command.
     """
 
-    def __init__(self, tag: str):
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, tag: str, **kwargs):
         """
         :param tag:
             Only list RPMs within this tag.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.tag = tag
         super().__init__([
             'list-signed',
             '--tag={}'.format(self.tag),
-        ])
+        ], **kwargs)
 
     def __str__(self) -> str:
         return '<Koji ListSigned tag={!r}'.format(
             self.tag,
         )
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        # Like the CLI, report only the signed copies actually written to
+        # the Koji volume, not every signature Koji has merely cached.
+        koji_dir = self.backend.koji_dir
+        if koji_dir is None:
+            raise NotImplementedError
+        rpms, builds = session.call('listTaggedRPMS', self.tag)
+        nvrs = {build['build_id']: build['nvr'] for build in builds}
+        sigs = session.multicall([
+            ('queryRPMSigs', (), {'rpm_id': rpm['id']}) for rpm in rpms
+        ])
+        result, paths = [], []
+        for rpm, rpm_sigs in zip(rpms, sigs):
+            if isinstance(rpm_sigs, Exception):
+                raise rpm_sigs
+            sigkeys = []
+            for sig in rpm_sigs:
+                _, signed_copy, _ = koji_rpm_paths(
+                    koji_dir, nvrs[rpm['build_id']], _rpm_filename(rpm),
+                    sig['sigkey'],
+                )
+                if os.path.exists(signed_copy):
+                    sigkeys.append(sig['sigkey'])
+                    paths.append(signed_copy)
+            if sigkeys:
+                result.append(dict(rpm, sigkeys=sigkeys))
+        return result, ''.join(path + '\n' for path in paths)
+
     @property
     def rpms(self) -> set:
         """
         :return:
             A set of str, each being one signed RPM within the tag.
         """
+        if self.result is not None:
+            return {_rpm_filename(rpm) for rpm in self.result}
         rpms = set()
-        for line in self.output.splitlines():
+        for line in self.lines():
+            line = line.strip()
             if line.endswith('.rpm'):
-                rpms.add(basename(line.strip()))
+                rpms.add(basename(line))
+        return rpms
+
+    @property
+    def rpms_by_key(self) -> dict:
+        """
+        :return:
+            A dict whose keys are the ID of each signing key, in lowercase,
+            and whose values are a set of str, each being one RPM within
+            the tag that is signed with that key.
+        """
+        rpms = {}
+        if self.result is not None:
+            for rpm in self.result:
+                for key in rpm['sigkeys']:
+                    rpms.setdefault(key.lower(), set()).add(_rpm_filename(rpm))
+            return rpms
+        for line in self.lines():
+            # e.g., /mnt/koji/packages/N/V/R/data/signed/KEY/ARCH/NVRA.rpm
+            parts = line.strip().rsplit('/', 4)
+            if (len(parts) == 5 and parts[1] == 'signed'
+                    and parts[4].endswith('.rpm')):
+                rpms.setdefault(parts[2].lower(), set()).add(parts[4])
+        return rpms
+
+
+class KojiListTagged(KojiCommand):
+    """
+    A wrapper around the `koji list-tagged --inherit --latest --rpms --sigs`
+    command.
+
+    Like a dist-repo, the listing includes the builds inherited from the
+    tag's parents.
+    """
+
+    coalescible = True
+    idempotent = True
+
+    def __init__(self, tag: str, **kwargs):
+        """
+        :param tag:
+            List the RPMs of the latest builds within this tag, including
+            those it inherits.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
+        """
+        self.tag = tag
+        super().__init__([
+            'list-tagged', '--inherit', '--latest', '--rpms', '--sigs',
+            '--quiet', self.tag,
+        ], **kwargs)
+
+    def __str__(self) -> str:
+        return '<Koji ListTagged tag={!r}>'.format(
+            self.tag,
+        )
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        rpms, builds = session.call(
+            'listTaggedRPMS', self.tag, inherit=True, latest=True,
+            rpmsigs=True,
+        )
+        return rpms, ''.join(
+            '{} {name}-{version}-{release}.{arch}\n'.format(
+                rpm['sigkey'] or '', **rpm
+            )
+            for rpm in rpms
+        )
+
+    @property
+    def signed_rpms_by_key(self) -> dict:
+        """
+        :return:
+            A dict whose keys are the ID of each signing key, in lowercase,
+            and whose values are a set of str, each being the NVRA of one
+            RPM of the tag's latest builds that is signed with that key.
+        """
+        rpms = {}
+        if self.result is not None:
+            for rpm in self.result:
+                if rpm['sigkey']:
+                    rpms.setdefault(rpm['sigkey'].lower(), set()).add(
+                        '{name}-{version}-{release}.{arch}'.format(**rpm)
+                    )
+            return rpms
+        for line in self.lines():
+            match = SIGNED_NVRA_PATTERN.match(line)
+            if match:
+                rpms.setdefault(match.group(1).lower(), set()).add(
+                    match.group(2)
+                )
         return rpms
 
 
@@ -264,21 +1387,31 @@ class KojiRegenRepo(KojiCommand):
     A wrapper around the `koji regen-repo` command.
     """
 
-    def __init__(self, tag: str):
+    def __init__(self, tag: str, **kwargs):
         """
         :param tag:
             The build tag for which regeneration is to occur.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.tag = tag
-        super().__init__(['regen-repo', self.tag])
+        super().__init__(['regen-repo', self.tag], **kwargs)
 
     def __str__(self) -> str:
         return '<Koji RegenRepo {!r}>'.format(
             self.tag,
         )
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        result = session.call('newRepo', self.tag)
+        return result, (f'Regenerating repo for tag: {self.tag}\n'
+                        f'Created task: {result}\n')
+
     @property
     def task_id(self) -> str:
+        if self.result is not None:
+            return str(self.result)
         match = CREATED_TASK_PATTERN.search(self.output)
         return match.group(1) if match else 'unknown'
 
@@ -288,32 +1421,60 @@ class KojiWaitRepo(KojiCommand):
     A wrapper around the `koji wait-repo` command.
     """
 
-    def __init__(self, tag: str):
+    # Every waiter is satisfied by the same new repo, but only while it is
+    # new to all of them.
+    coalescible = True
+    lingering = False
+
+    def __init__(self, tag: str, **kwargs):
         """
         :param tag:
             The build tag for which regeneration is to be awaited.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.tag = tag
-        super().__init__(['wait-repo', self.tag])
+        super().__init__(['wait-repo', self.tag], **kwargs)
 
     def __str__(self) -> str:
         return '<Koji WaitRepo {!r}>'.format(
             self.tag,
         )
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        # Like the CLI, this awaits any repo newer than the present one.
+        start = time.monotonic()
+        last = session.call('getRepo', self.tag)
+        while attempt.wait(POLL_INTERVAL):
+            result = session.call('getRepo', self.tag)
+            if result != last:
+                return result, (f'Successfully waited '
+                                f'{time.monotonic() - start:.0f} seconds '
+                                f'for a new {self.tag} repo\n')
+        raise _interruption(attempt)
+
 
 class KojiWatchTasks(KojiCommand):
     """
     A wrapper around the `koji watch-tasks` command.
     """
 
-    def __init__(self, channel: str = None, user: str = None):
+    def __init__(
+            self,
+            channel: str = None,
+            user: str = None,
+            **kwargs
+    ):
         """
         :param channel:
             Only tasks in this channel.
 
         :param user:
             Only tasks for this user.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.channel = channel
         self.user = user
@@ -322,7 +1483,7 @@ class KojiWatchTasks(KojiCommand):
             args += ['--channel', channel]
         if user:
             args += ['--user', user]
-        super().__init__(args)
+        super().__init__(args, **kwargs)
 
     def __str__(self) -> str:
         return (f'<Koji WatchTasks '
@@ -330,13 +1491,47 @@ class KojiWatchTasks(KojiCommand):
                 f'for user {self.user!r} '
                 f'>')
 
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        opts = {
+            'parent': None,
+            'state': [
+                TASK_STATES.index(state)
+                for state in ('FREE', 'OPEN', 'ASSIGNED')
+            ],
+        }
+        if self.channel:
+            opts['channel_id'] = session.call('getChannel', self.channel)['id']
+        if self.user:
+            opts['owner'] = session.call('getUser', self.user)['id']
+        pending = [task['id'] for task in session.call('listTasks', opts)]
+        done = {TASK_STATES.index(state)
+                for state in ('CLOSED', 'CANCELED', 'FAILED')}
+        result = {}
+        while pending:
+            if not attempt.wait(POLL_INTERVAL):
+                raise _interruption(attempt)
+            infos = session.multicall([
+                ('getTaskInfo', (task_id,), {}) for task_id in pending
+            ])
+            for task_id, info in zip(list(pending), infos):
+                if isinstance(info, Exception):
+                    raise info
+                if info['state'] in done:
+                    result[task_id] = info
+                    pending.remove(task_id)
+        return result, ''.join(
+            f'{task_id} {info["method"]}: '
+            f'{TASK_STATES[info["state"]].lower()}\n'
+            for task_id, info in sorted(result.items())
+        )
+
 
 class KojiWriteSignedRpm(KojiCommand):
     """
     A wrapper around the `koji write-signed-rpm` command.
     """
 
-    def __init__(self, signature_key: str, nvr):
+    def __init__(self, signature_key: str, nvr, **kwargs):
         """
         :param signature_key:
             The ID of the key that was used for signing.
@@ -344,13 +1539,49 @@ class KojiWriteSignedRpm(KojiCommand):
         :param nvr:
             A str or list or str with each being one Name-Version-Release value
             to be written.
+
+        :param kwargs:
+            Options for :class:`KojiCommand`, e.g., *stream* or *defer*.
         """
         self.signature_key = signature_key
         self.nvr = nvr if isinstance(nvr, list) else [nvr]
-        super().__init__(['write-signed-rpm', self.signature_key] + self.nvr)
+        super().__init__(
+            ['write-signed-rpm', self.signature_key] + self.nvr, **kwargs
+        )
 
     def __str__(self) -> str:
         return '<Koji WriteSignedRPM {!r} :: {!r}>'.format(
             self.signature_key,
             self.nvr,
         )
+
+    def hub_execute(self, session: KojiHubSession, attempt: Attempt) -> tuple:
+        # Like the CLI, accept the NVRs of builds as well as the NVRAs of
+        # individual RPMs.
+        builds = _get_build_rpms(session, self.nvr)
+        rpms = [rpm for build, rpm_list in builds.values() for rpm in rpm_list]
+        others = [
+            nvra[:-len('.rpm')] if nvra.endswith('.rpm') else nvra
+            for nvra in self.nvr if nvra not in builds
+        ]
+        for nvra, rpm in zip(others, session.multicall([
+            ('getRPM', (nvra,), {}) for nvra in others
+        ])):
+            if not rpm or isinstance(rpm, Exception):
+                raise KojiHubError(f'No such build or rpm: {nvra}')
+            rpms.append(rpm)
+        results = session.multicall([
+            ('writeSignedRPM', (rpm['id'], self.signature_key), {})
+            for rpm in rpms
+        ])
+        result = dict(zip(map(_rpm_filename, rpms), results))
+        failures = [
+            f'{rpm}: {outcome}' for rpm, outcome in result.items()
+            if isinstance(outcome, Exception)
+        ]
+        if failures:
+            raise KojiHubError('\n'.join(failures))
+        return result, ''.join(
+            f'Writing signed copy of {rpm} ({self.signature_key})\n'
+            for rpm in result
+        )
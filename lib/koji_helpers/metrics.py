@@ -0,0 +1,364 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from logging import getLogger
+from socketserver import ThreadingMixIn
+from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
+
+from koji_helpers.config import Configuration
+
+# Prefix of every metric name exported.
+NAMESPACE = 'koji_helpers'
+
+# Upper bounds of the command latency histogram buckets, in seconds.
+DURATION_BUCKETS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600,
+)
+
+# Upper bounds of the command output size histogram buckets, in bytes.
+SIZE_BUCKETS = tuple(256 * 4 ** n for n in range(10))
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+_exporter = None
+
+
+def _escape(value: str) -> str:
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(names: tuple, values: tuple, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram(object):
+    """
+    The cumulative observations of one labelled histogram series.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> iter:
+        # Bucket counts are cumulative in the exposition format.
+        cumulative = 0
+        prefix = labels[:-1] + ',' if labels else '{'
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{prefix}le="{_number(bound)}"}} {cumulative}'
+        yield f'{name}_sum{labels} {_number(self.sum)}'
+        yield f'{name}_count{labels} {self.count}'
+
+
+class Metrics(object):
+    """
+    A registry of the metrics gathered by koji-helpers, rendered in the
+    Prometheus text exposition format.
+
+    Every invocation of an external tool (`koji` and `sigul`) is observed
+    by :meth:`observe_command`, which tracks its latency per command type
+    and exit status along with the size of its output.  Other components
+    may expose their own counters and gauges via :meth:`register`.
+    """
+
+    def __init__(self):
+        """
+        Initialize the Metrics object.
+        """
+        self._lock = Lock()
+        self._durations = {}
+        self._sizes = {}
+        self._collectors = {}
+
+    def __repr__(self) -> str:
+        return f'{self.__module__}.{self.__class__.__name__}()'
+
+    def __str__(self) -> str:
+        return 'Metrics'
+
+    def observe_command(
+            self,
+            tool: str,
+            command: str,
+            seconds: float,
+            status: str,
+            size: int = None,
+    ):
+        """
+        Note that one invocation of an external tool has finished.
+
+        :param tool:
+            The name of the tool, e.g., 'koji' or 'sigul'.
+
+        :param command:
+            The tool's command that was invoked, e.g., 'buildinfo'.
+
+        :param seconds:
+            How long the invocation took.
+
+        :param status:
+            How the invocation ended: '0' if it succeeded, otherwise the
+            tool's exit status or one of 'error', 'timeout' or 'cancelled'.
+
+        :param size:
+            The number of bytes of output produced, if known.
+        """
+        with self._lock:
+            key = (tool, command, str(status))
+            if key not in self._durations:
+                self._durations[key] = _Histogram(DURATION_BUCKETS)
+            self._durations[key].observe(seconds)
+            if size is not None:
+                key = (tool, command)
+                if key not in self._sizes:
+                    self._sizes[key] = _Histogram(SIZE_BUCKETS)
+                self._sizes[key].observe(size)
+
+    def register(self, name: str, metric_type: str, help_text: str, getter):
+        """
+        Expose one counter or gauge whose value is obtained upon rendering.
+
+        :param name:
+            The metric name, sans the `koji_helpers_` prefix.
+
+        :param metric_type:
+            Either 'counter' or 'gauge'.
+
+        :param getter:
+            A callable taking no arguments that returns the present value.
+        """
+        with self._lock:
+            self._collectors[name] = (metric_type, help_text, getter)
+
+    def render(self) -> str:
+        """
+        :return:
+            All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            families = (
+                ('command_duration_seconds',
+                 'Time taken by invocations of external tools.',
+                 ('tool', 'command', 'status'), self._durations),
+                ('command_output_bytes',
+                 'Output produced by invocations of external tools.',
+                 ('tool', 'command'), self._sizes),
+            )
+            for name, help_text, label_names, series in families:
+                name = f'{NAMESPACE}_{name}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for key in sorted(series):
+                    lines.extend(
+                        series[key].render(name, _labels(label_names, key))
+                    )
+            collectors = sorted(self._collectors.items())
+        for name, (metric_type, help_text, getter) in collectors:
+            try:
+                value = getter()
+            except Exception as e:
+                _log.warning(f'cannot collect metric {name!r}: {e}')
+                continue
+            name = f'{NAMESPACE}_{name}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, filename: str):
+        """
+        Atomically write all metrics to *filename* for collection by the
+        Prometheus node exporter's textfile collector.
+        """
+        directory = os.path.dirname(filename) or '.'
+        with NamedTemporaryFile(
+                'w', dir=directory, prefix='.metrics-', delete=False,
+        ) as f:
+            f.write(self.render())
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, filename)
+
+
+# The registry shared throughout the process.
+METRICS = Metrics()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        _log.debug(f'{self.address_string()} {fmt % args}')
+
+
+class MetricsExporter(object):
+    """
+    Exports :data:`METRICS` periodically to a textfile, via a small HTTP
+    endpoint, or both.
+    """
+
+    def __init__(
+            self,
+            textfile: str = None,
+            interval: float = 15,
+            address: str = '127.0.0.1',
+            port: int = 0,
+    ):
+        """
+        Initialize the MetricsExporter object.
+
+        :param textfile:
+            The name of the file to be (re)written every *interval* seconds
+            or None to not write a file.
+
+        :param address:
+            The address on which the HTTP endpoint listens.
+
+        :param port:
+            The port on which the HTTP endpoint listens or 0 to not serve
+            metrics over HTTP.
+        """
+        self.textfile = textfile
+        self.interval = interval
+        self.address = address
+        self.port = port
+        self._stopped = Event()
+        self._server = None
+        if textfile:
+            Thread(
+                target=self.__write_periodically, name='MetricsExporter',
+                daemon=True,
+            ).start()
+        if port:
+            self._server = _ThreadingHTTPServer(
+                (address, port), _MetricsHandler
+            )
+            Thread(
+                target=self._server.serve_forever, name='MetricsServer',
+                daemon=True,
+            ).start()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'textfile={self.textfile!r}, '
+                f'interval={self.interval!r}, '
+                f'address={self.address!r}, '
+                f'port={self.port!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return 'MetricsExporter'
+
+    @classmethod
+    def from_config(cls, config: Configuration):
+        """
+        :return:
+            A new MetricsExporter as directed by the `[metrics]` section of
+            *config*.
+        """
+        return cls(
+            textfile=config.metrics_textfile,
+            interval=config.metrics_interval,
+            address=config.metrics_address,
+            port=config.metrics_port,
+        )
+
+    def export(self):
+        """
+        Write the textfile now, if one is configured.
+        """
+        if not self.textfile:
+            return
+        try:
+            METRICS.write_textfile(self.textfile)
+        except OSError as e:
+            _log.warning(f'cannot write metrics to {self.textfile!r}: {e}')
+
+    def __write_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.export()
+
+    def shutdown(self):
+        """
+        Write the textfile one last time and stop exporting.
+        """
+        self._stopped.set()
+        self.export()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def configure_metrics(config: Configuration):
+    """
+    Begin exporting metrics according to the `[metrics]` section of
+    *config*.
+    """
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    _exporter = MetricsExporter.from_config(config)
+    _log.info(f'metrics will be exported by {_exporter!r}')
+
+
+def export_metrics():
+    """
+    Write the metrics textfile now, e.g., at the end of a work cycle, rather
+    than awaiting the next periodic export.
+    """
+    if _exporter is not None:
+        _exporter.export()
@@ -0,0 +1,359 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import random
+from collections import deque
+from threading import Event, Lock
+from time import monotonic
+
+from koji_helpers.config import Configuration
+
+# Commands that legitimately await lengthy Koji activity get more time than
+# the general timeout unless configured otherwise.  This matches the Koji
+# CLI's own default for `wait-repo`.
+DEFAULT_COMMAND_TIMEOUTS = {
+    'wait-repo': 120 * 60,
+    'watch-tasks': 120 * 60,
+}
+
+# The number of recent latencies retained per command type for estimating
+# when a request should be hedged.
+LATENCY_SAMPLES = 200
+
+# The fewest latencies that must be known before hedging is attempted.
+MIN_HEDGE_SAMPLES = 20
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+class Attempt(object):
+    """
+    One attempt at running a Koji command, bounded by a deadline and subject
+    to cancellation.
+
+    .. attribute:: result
+
+        The structured result of the attempt, if its backend produces one.
+
+
+    .. attribute:: timed_out
+
+        True if the attempt was abandoned due to its deadline passing.
+    """
+
+    def __init__(self, timeout: float = None):
+        """
+        Initialize the Attempt object.
+
+        :param timeout:
+            The maximum number of seconds the attempt may take or None if
+            unbounded.
+        """
+        self.timeout = timeout
+        self.deadline = None if timeout is None else monotonic() + timeout
+        self.result = None
+        self.timed_out = False
+        self.cancelled = False
+        self._wakeup = Event()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'timeout={self.timeout!r}, '
+                f')')
+
+    @property
+    def remaining(self):
+        """
+        :return:
+            The number of seconds remaining until the deadline or None if
+            unbounded.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - monotonic())
+
+    @property
+    def active(self) -> bool:
+        """
+        :return:
+            True if the attempt has been neither cancelled nor has it
+            outlived its deadline.
+        """
+        if self.cancelled:
+            return False
+        if self.remaining == 0:
+            self.timed_out = True
+        return not self.timed_out
+
+    def cancel(self):
+        """
+        Abandon the attempt, e.g., because a hedged peer already succeeded.
+        """
+        self.cancelled = True
+        self._wakeup.set()
+
+    def finish(self):
+        """
+        Note that the attempt has run to completion.
+        """
+        self._wakeup.set()
+
+    def wait(self, seconds: float = None) -> bool:
+        """
+        Sleep for up to *seconds*, but no further than the deadline, and
+        wake early should the attempt be cancelled or finished.
+
+        :return:
+            True if the attempt remains active.
+        """
+        remaining = self.remaining
+        if seconds is None or (remaining is not None and remaining < seconds):
+            seconds = remaining
+        self._wakeup.wait(seconds)
+        return self.active
+
+
+class _Flight(object):
+    """
+    One execution shared by all who asked for it while it was in flight.
+    """
+
+    def __init__(self):
+        self.done = Event()
+        self.finished = None
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent requests for the same work into one execution.
+
+    The first caller to :meth:`do` for some key carries out the work while
+    any others asking for the same key in the meantime simply await its
+    outcome.  When *window* is non-zero, the outcome of a successful
+    execution continues to be shared for that many seconds after it
+    finishes, unless it was done without lingering.
+
+    .. attribute:: shared
+
+        The number of requests that were satisfied by another's execution.
+    """
+
+    def __init__(self, window: float = 0):
+        """
+        Initialize the SingleFlight object.
+
+        :param window:
+            The number of seconds a finished execution's outcome remains
+            shared.
+        """
+        self.window = window
+        self.shared = 0
+        self._flights = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'window={self.window!r}, '
+                f')')
+
+    def __current(self, key):
+        flight = self._flights.get(key)
+        if flight is not None and flight.finished is not None:
+            if flight.error is not None or (
+                    monotonic() - flight.finished >= self.window):
+                del self._flights[key]
+                return None
+        return flight
+
+    def do(self, key, work, linger: bool = True) -> tuple:
+        """
+        Carry out *work* unless another execution for *key* is in flight.
+
+        :param key:
+            A hashable value identifying the work.
+
+        :param work:
+            A callable taking no arguments.
+
+        :param linger:
+            If False, the outcome of this execution is not shared once it
+            finishes, regardless of the *window*.
+
+        :return:
+            A (value, shared) tuple where value is what *work* returned and
+            shared is True if it came from another caller's execution.
+
+        :raise:
+            Whatever *work* raised, for every caller sharing it.
+        """
+        with self._lock:
+            flight = self.__current(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+        try:
+            flight.value = work()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                flight.finished = monotonic()
+                if not (self.window and linger) or flight.error is not None:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            flight.done.set()
+        return flight.value, False
+
+
+class CommandPolicy(object):
+    """
+    The policy that governs how long Koji commands may run and how they
+    recover from failure.
+
+    Every attempt is bounded by a deadline.  Idempotent commands that fail
+    or time out are retried a bounded number of times after sleeping for an
+    exponentially increasing, fully jittered interval.  Optionally, an
+    idempotent command whose latency runs past a percentile of its recent
+    history is hedged by a duplicate attempt and whichever succeeds first
+    wins.
+    """
+
+    def __init__(
+            self,
+            timeout: float = 600,
+            timeouts: dict = None,
+            retries: int = 3,
+            backoff: float = 2.0,
+            backoff_max: float = 60.0,
+            hedge_percentile: float = 0,
+    ):
+        """
+        Initialize the CommandPolicy object.
+
+        :param timeout:
+            The maximum number of seconds any one attempt may take.  Zero
+            or None means unbounded.
+
+        :param timeouts:
+            A dict whose keys are Koji command types and whose values
+            override *timeout* for that type.
+
+        :param retries:
+            The maximum number of times an idempotent command is retried.
+
+        :param backoff:
+            The base number of seconds for the exponential backoff between
+            retries.
+
+        :param backoff_max:
+            The maximum number of seconds to back off between retries.
+
+        :param hedge_percentile:
+            The percentile (e.g., 95) of recent latencies beyond which an
+            idempotent command is hedged.  Zero disables hedging.
+        """
+        self.timeout = timeout
+        self.timeouts = dict(DEFAULT_COMMAND_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self._latencies = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'timeout={self.timeout!r}, '
+                f'timeouts={self.timeouts!r}, '
+                f'retries={self.retries!r}, '
+                f'backoff={self.backoff!r}, '
+                f'backoff_max={self.backoff_max!r}, '
+                f'hedge_percentile={self.hedge_percentile!r}, '
+                f')')
+
+    @classmethod
+    def from_config(cls, config: Configuration):
+        """
+        :return:
+            A new CommandPolicy as directed by the `[koji]` section of
+            *config*.
+        """
+        return cls(
+            timeout=config.koji_timeout,
+            timeouts=config.koji_command_timeouts,
+            retries=config.koji_retries,
+            backoff=config.koji_backoff,
+            backoff_max=config.koji_backoff_max,
+            hedge_percentile=config.koji_hedge_percentile,
+        )
+
+    def timeout_for(self, command_type: str):
+        """
+        :return:
+            The maximum number of seconds one attempt of *command_type* may
+            take or None if unbounded.
+        """
+        return self.timeouts.get(command_type, self.timeout) or None
+
+    def backoff_for(self, retry: int) -> float:
+        """
+        :param retry:
+            The number of the retry about to be made, starting with 1.
+
+        :return:
+            The number of seconds to sleep before that retry.
+        """
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * 2 ** (retry - 1))
+        )
+
+    def record(self, command_type: str, seconds: float):
+        """
+        Note that one successful attempt of *command_type* took *seconds*.
+        """
+        with self._lock:
+            if command_type not in self._latencies:
+                self._latencies[command_type] = deque(maxlen=LATENCY_SAMPLES)
+            self._latencies[command_type].append(seconds)
+
+    def hedge_delay(self, command_type: str):
+        """
+        :return:
+            The number of seconds after which an attempt of *command_type*
+            should be hedged or None if it should not be.
+        """
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(command_type, ()))
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        index = int(len(samples) * self.hedge_percentile / 100)
+        return samples[min(index, len(samples) - 1)]
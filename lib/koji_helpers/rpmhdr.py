@@ -0,0 +1,237 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+A reader of the signatures within RPM files, as found on a Koji volume.
+
+Only the lead and signature header of each RPM are examined.  The file is
+memory mapped and parsed in place, so nothing beyond the few pages holding
+those is read and no copy is made except of the signatures themselves.
+"""
+import mmap
+import os
+import struct
+from logging import getLogger
+
+# The RPM lead, which precedes the signature header of an RPM file.
+LEAD_MAGIC = b'\xed\xab\xee\xdb'
+LEAD_SIZE = 96
+
+# Every header begins with this magic and version, then 4 reserved bytes.
+HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+HEADER_INTRO = struct.Struct('>4s4xII')
+HEADER_ENTRY = struct.Struct('>IIII')
+
+# The signature header tags holding OpenPGP signatures.
+SIGTAG_DSA = 267
+SIGTAG_RSA = 268
+SIGTAG_PGP = 1002
+SIGTAG_GPG = 1005
+SIGNATURE_TAGS = (SIGTAG_DSA, SIGTAG_RSA, SIGTAG_PGP, SIGTAG_GPG)
+
+# The header data type of the above.
+TYPE_BIN = 7
+
+# OpenPGP signature subpackets that identify the signing key.
+SUBPACKET_ISSUER = 16
+SUBPACKET_ISSUER_FINGERPRINT = 33
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+class RpmHeaderError(Exception):
+    """
+    Raised when an RPM's lead or signature header is malformed.
+    """
+    pass
+
+
+def _packet_body(data: memoryview) -> memoryview:
+    """
+    :return:
+        The body of the OpenPGP packet at the start of *data*.
+    """
+    if not data or not data[0] & 0x80:
+        raise RpmHeaderError('not an OpenPGP packet')
+    if data[0] & 0x40:
+        # new format
+        first = data[1]
+        if first < 192:
+            return data[2:2 + first]
+        if first < 224:
+            return data[3:3 + ((first - 192) << 8) + data[2] + 192]
+        if first == 255:
+            return data[6:6 + struct.unpack_from('>I', data, 2)[0]]
+        raise RpmHeaderError('partial OpenPGP packet lengths are unsupported')
+    # old format
+    length_type = data[0] & 0x03
+    if length_type == 3:
+        return data[1:]
+    size = 1 << length_type
+    length = int.from_bytes(data[1:1 + size], 'big')
+    return data[1 + size:1 + size + length]
+
+
+def _subpacket_key_id(data: memoryview):
+    """
+    :return:
+        The signing key ID cited by the OpenPGP signature subpackets *data*
+        or None if none is cited.
+    """
+    i = 0
+    while i < len(data):
+        first = data[i]
+        if first < 192:
+            length, i = first, i + 1
+        elif first < 255:
+            length, i = ((first - 192) << 8) + data[i + 1] + 192, i + 2
+        else:
+            length, i = struct.unpack_from('>I', data, i + 1)[0], i + 5
+        kind = data[i] & 0x7f
+        if kind == SUBPACKET_ISSUER:
+            return bytes(data[i + 1:i + 9]).hex()
+        if kind == SUBPACKET_ISSUER_FINGERPRINT:
+            return bytes(data[i + 2:i + length][-8:]).hex()
+        i += length
+    return None
+
+
+def pgp_key_id(signature) -> str:
+    """
+    :param signature:
+        A bytes-like object holding one OpenPGP signature packet.
+
+    :return:
+        The short (32-bit) ID of the key that made *signature*, in
+        lowercase hex, as Koji names its signing keys.
+    """
+    body = _packet_body(memoryview(signature))
+    version = body[0]
+    if version == 3:
+        key_id = bytes(body[7:15]).hex()
+    elif version == 4:
+        hashed = struct.unpack_from('>H', body, 4)[0]
+        key_id = _subpacket_key_id(body[6:6 + hashed])
+        if key_id is None:
+            unhashed = struct.unpack_from('>H', body, 6 + hashed)[0]
+            key_id = _subpacket_key_id(
+                body[8 + hashed:8 + hashed + unhashed]
+            )
+        if key_id is None:
+            raise RpmHeaderError('OpenPGP signature cites no issuer')
+    else:
+        raise RpmHeaderError(f'OpenPGP signature version {version} unknown')
+    return key_id[-8:]
+
+
+def _signatures(data: memoryview, offset: int) -> list:
+    """
+    :return:
+        A list of bytes, each being one OpenPGP signature within the
+        header at *offset* of *data*.
+    """
+    try:
+        magic, count, size = HEADER_INTRO.unpack_from(data, offset)
+    except struct.error:
+        raise RpmHeaderError('truncated header')
+    if magic != HEADER_MAGIC:
+        raise RpmHeaderError('bad header magic')
+    store = offset + HEADER_INTRO.size + count * HEADER_ENTRY.size
+    if store + size > len(data):
+        raise RpmHeaderError('truncated header')
+    signatures = []
+    for i in range(count):
+        tag, kind, start, length = HEADER_ENTRY.unpack_from(
+            data, offset + HEADER_INTRO.size + i * HEADER_ENTRY.size
+        )
+        if tag in SIGNATURE_TAGS and kind == TYPE_BIN:
+            if start + length > size:
+                raise RpmHeaderError(f'signature tag {tag} overruns header')
+            signatures.append(bytes(data[store + start:store + start + length]))
+    return signatures
+
+
+def signature_key_ids(filename: str) -> set:
+    """
+    :param filename:
+        The name of either an RPM file or a detached signature header such
+        as Koji keeps in its sigcache.
+
+    :return:
+        A set of str, each being the short ID of a key that signed the
+        RPM, in lowercase hex.
+
+    :raise FileNotFoundError:
+        If *filename* does not exist.
+
+    :raise RpmHeaderError:
+        If the RPM's lead or signature header is malformed.
+    """
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_INTRO.size:
+            raise RpmHeaderError(f'{filename!r} is too small')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            data = memoryview(m)
+            try:
+                if data[:len(LEAD_MAGIC)] == LEAD_MAGIC:
+                    offset = LEAD_SIZE
+                elif data[:len(HEADER_MAGIC)] == HEADER_MAGIC:
+                    offset = 0
+                else:
+                    raise RpmHeaderError(f'{filename!r} is not an RPM')
+                signatures = _signatures(data, offset)
+            finally:
+                data.release()
+    key_ids = set()
+    for signature in signatures:
+        try:
+            key_ids.add(pgp_key_id(signature))
+        except (RpmHeaderError, IndexError, struct.error) as e:
+            _log.debug(f'ignoring unreadable signature in {filename!r}: {e}')
+    return key_ids
+
+
+def koji_rpm_paths(koji_dir: str, nvr: str, rpm: str, key: str) -> tuple:
+    """
+    :param nvr:
+        The Name-Version-Release of the build that produced *rpm*.
+
+    :param rpm:
+        The file name of the RPM.
+
+    :param key:
+        The ID of a signing key, in lowercase hex.
+
+    :return:
+        A tuple of the names of the original RPM, its copy signed with
+        *key* and its signature header for *key*, as Koji stores them
+        within *koji_dir*.
+    """
+    name, version, release = nvr.rsplit('-', 2)
+    arch = rpm[:-len('.rpm')].rsplit('.', 1)[-1]
+    build_dir = os.path.join(koji_dir, 'packages', name, version, release)
+    return (
+        os.path.join(build_dir, arch, rpm),
+        os.path.join(build_dir, 'data', 'signed', key, arch, rpm),
+        os.path.join(build_dir, 'data', 'sigcache', key, arch, rpm + '.sig'),
+    )
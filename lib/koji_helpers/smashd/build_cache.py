@@ -0,0 +1,185 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import sqlite3
+import zlib
+from logging import getLogger
+from threading import Lock
+
+BUILD_CACHE = '/var/lib/koji-helpers/smashd/build-cache.sqlite'
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def _pack(nvr: str, rpms: set) -> bytes:
+    """
+    :return:
+        The RPM file names of build *nvr* compactly encoded.  Since nearly
+        every RPM of a build shares its version and release, that portion
+        of each name is stored as a single NUL.
+    """
+    name, version, release = nvr.rsplit('-', 2)
+    infix = f'-{version}-{release}.'
+    return zlib.compress(
+        '\n'.join(
+            rpm.replace(infix, '\0', 1) for rpm in sorted(rpms)
+        ).encode()
+    )
+
+
+def _unpack(nvr: str, data: bytes) -> set:
+    """
+    :return:
+        The RPM file names of build *nvr* decoded from the result of
+        :func:`_pack`.
+    """
+    name, version, release = nvr.rsplit('-', 2)
+    infix = f'-{version}-{release}.'
+    text = zlib.decompress(data).decode()
+    return {rpm.replace('\0', infix, 1) for rpm in text.split('\n') if rpm}
+
+
+class BuildCache(object):
+    """
+    A persistent cache of the RPMs that resulted from each Koji build.
+
+    A completed build's RPMs never change, so there is no need to ask the
+    Koji Hub about them a second time, be it when the build is retagged or
+    when it must be signed for another tag.  The cache survives restarts in
+    an SQLite database and holds no more than *max_size* builds, evicting
+    those least recently used.
+
+    .. attribute:: hits
+
+        The number of builds that were found in the cache.
+
+
+    .. attribute:: misses
+
+        The number of builds that were sought but not found in the cache.
+    """
+
+    def __init__(self, filename: str = BUILD_CACHE, max_size: int = 100000):
+        """
+        Initialize the BuildCache object.
+
+        :param filename:
+            The name of the SQLite database file backing the cache.
+
+        :param max_size:
+            The maximum number of builds to be retained.
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS builds ('
+                ' nvr TEXT PRIMARY KEY,'
+                ' rpms BLOB NOT NULL,'
+                ' used INTEGER NOT NULL'
+                ')'
+            )
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS builds_used ON builds (used)'
+            )
+        self._clock = self._db.execute(
+            'SELECT COALESCE(MAX(used), 0) FROM builds'
+        ).fetchone()[0]
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'filename={self.filename!r}, '
+                f'max_size={self.max_size!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'BuildCache with {self.hits:,d} hits '
+                f'and {self.misses:,d} misses')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM builds').fetchone()[0]
+
+    def get_many(self, nvrs: list) -> dict:
+        """
+        :param nvrs:
+            A list of str, each being one Name-Version-Release value sought.
+
+        :return:
+            A dict whose keys are the NVR of each build found in the cache
+            and whose values are a set of str, each being one RPM of that
+            build.
+        """
+        found = {}
+        with self._lock:
+            for nvr in nvrs:
+                row = self._db.execute(
+                    'SELECT rpms FROM builds WHERE nvr = ?', (nvr,)
+                ).fetchone()
+                if row:
+                    found[nvr] = _unpack(nvr, row[0])
+            if found:
+                self._clock += 1
+                with self._db:
+                    self._db.executemany(
+                        'UPDATE builds SET used = ? WHERE nvr = ?',
+                        [(self._clock, nvr) for nvr in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(nvrs) - len(found)
+        _log.debug(f'{len(found):,d} of {len(nvrs):,d} builds cached; {self}')
+        return found
+
+    def put_many(self, builds: dict):
+        """
+        :param builds:
+            A dict whose keys are the NVR of each build to be cached and
+            whose values are a set of str, each being one RPM of that build.
+        """
+        if not builds:
+            return
+        with self._lock:
+            self._clock += 1
+            with self._db:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO builds (nvr, rpms, used) '
+                    'VALUES (?, ?, ?)',
+                    [
+                        (nvr, _pack(nvr, rpms), self._clock)
+                        for nvr, rpms in builds.items()
+                    ],
+                )
+                excess = self._db.execute(
+                    'SELECT COUNT(*) FROM builds'
+                ).fetchone()[0] - self.max_size
+                if excess > 0:
+                    _log.debug(f'evicting {excess:,d} least recent builds')
+                    self._db.execute(
+                        'DELETE FROM builds WHERE nvr IN ('
+                        ' SELECT nvr FROM builds ORDER BY used LIMIT ?'
+                        ')',
+                        (excess,),
+                    )
@@ -19,40 +19,92 @@
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
-from datetime import datetime
-from logging import getLogger
-from time import sleep
+import os
+from logging import DEBUG, INFO, getLogger
+from socket import gethostname
+from time import monotonic
 
 from doubledog.quiescence import QuiescenceMonitor
 
 from koji_helpers import CONFIG
 from koji_helpers.config import Configuration
-from koji_helpers.smashd.distrepo import DistRepoMaker
-from koji_helpers.smashd.notifier import Notifier
-from koji_helpers.smashd.signer import Signer
+from koji_helpers.engine import configure_engine
+from koji_helpers.koji import (
+    KojiCommandError, KojiLastEvent, configure_backend,
+)
+from koji_helpers.metrics import METRICS, configure_metrics, export_metrics
+from koji_helpers.smashd.build_cache import BUILD_CACHE, BuildCache
+from koji_helpers.smashd.journal import WORK_JOURNAL, WorkJournal
+from koji_helpers.smashd.pipeline import Pipeline
+from koji_helpers.smashd.sharding import Shard
+from koji_helpers.smashd.signed_index import SIGNED_INDEX, SignedIndex
+from koji_helpers.smashd.signer import ChunkSizer, SigningSlots
 from koji_helpers.smashd.tag_history import KojiTagHistory
+from koji_helpers.tuning import make_tuner
+from koji_helpers.wakeup import DEADLINE_SLACK, make_waker
 
 SMASHD_STATE = '/var/lib/koji-helpers/smashd/state'
 
+# keys of the persisted state
+EVENT = 'event'
+FINGERPRINTS = 'fingerprints'
+TAG_EVENTS = 'tag_events'
+
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
 
 _log = getLogger(__name__)
 
 
+def _later(mark, other):
+    """
+    :return:
+        The later of two marks, where an event ID supersedes the timestamp
+        str of a mark saved before migrating to tracking Koji events.
+    """
+    if isinstance(mark, str):
+        return other
+    if isinstance(other, str):
+        return mark
+    return max(mark, other)
+
+
 class SignAndComposeDaemon(object):
     """
     A pseudo-daemon that monitors a Koji Hub for events that involve tag
     operations.  When such events are detected, the daemon waits for the
-    activity to quiesce for a specified period.  Once quiescence is achieved,
-    the daemon will:
+    activity to quiesce for a specified period.  Each tag's quiescence is
+    tracked separately, so that activity on one tag never delays another,
+    and a tag that fails to quiesce within *max_wait* seconds is processed
+    regardless.  Once quiescence is achieved, the daemon will, for each
+    affected tag:
         1. sign RPMs for the affected builds
-        2. generate new package repositories for the affected tags
+        2. generate a new package repository
+        3. send a notification of the changes
+
+    Each tag proceeds through these steps as soon as it can, independently
+    of the others, while the daemon continues to monitor for tag events.
+    Tags that quiesce while others are being processed are processed at
+    once in a work cycle of their own, unless they are among those being
+    processed, whose new events await that work cycle's end.
+
+    With a *wakeup* source configured, e.g., one triggered by a Koji Hub
+    plugin upon tagging, the daemon checks for tag events as soon as it is
+    woken and otherwise only when some tag's quiescence is due or, as a
+    safety net, every *wakeup_interval* seconds.
+
+    Each tag's progress through these steps is kept in a
+    :class:`WorkJournal`, so that the work cycles cut short by a crash or
+    restart are resumed where they left off rather than begun anew.
+
+    With a *shard_dir* configured, several such daemons split the tags
+    among themselves, each processing only those whose leases it holds;
+    see :mod:`koji_helpers.smashd.sharding`.
 
     This daemon does not fork, exit, etc. in the classic sense, but does run
-    indefinitely performing the task described above.  This operates entirely as
-    a single thread and the time intervals mentioned herein should be understood
-    to represent a minimum amount of time rather than some precise interval.
+    indefinitely performing the task described above.  The time intervals
+    mentioned herein should be understood to represent a minimum amount of
+    time rather than some precise interval.
     """
 
     def __init__(self, config_name: str = CONFIG):
@@ -64,10 +116,67 @@ class SignAndComposeDaemon(object):
             behavior.
         """
         self.config = Configuration(config_name)
-        self._check_interval = self.config.smashd_min_interval
-        self._monitor = None
-        self.__last_run = None
+        configure_backend(self.config)
+        configure_engine(self.config)
+        configure_metrics(self.config)
+        self.build_cache = (
+            BuildCache(BUILD_CACHE, self.config.smashd_build_cache_size)
+            if self.config.smashd_build_cache_size > 0 else None
+        )
+        if self.build_cache is not None:
+            METRICS.register(
+                'build_cache_hits_total', 'counter',
+                'Builds whose RPMs were found in the build cache.',
+                lambda: self.build_cache.hits,
+            )
+            METRICS.register(
+                'build_cache_misses_total', 'counter',
+                'Builds whose RPMs were sought but not in the build cache.',
+                lambda: self.build_cache.misses,
+            )
+        self.chunk_sizer = ChunkSizer.from_config(self.config)
+        self.signing_slots = SigningSlots.from_config(self.config)
+        self.signed_index = (
+            SignedIndex(SIGNED_INDEX, self.config.smashd_signed_index_interval)
+            if self.config.smashd_signed_index_interval > 0 else None
+        )
+        if self.signed_index is not None:
+            self.signed_index.start()
+        self.tuner = make_tuner(
+            self.config.smashd_tuning,
+            self.config.smashd_min_interval,
+            self.config.smashd_max_interval,
+            hub_load_target=self.config.smashd_hub_load_target,
+        )
+        self._monitors = {}
+        self.waker = make_waker(self.config.smashd_wakeup)
+        self.waker.start()
+        self.__woken = self.waker.generation
+        self.journal = WorkJournal(WORK_JOURNAL)
+        self.shard = (
+            Shard(self.config.repos, self.config.smashd_shard_dir,
+                  self.config.smashd_shard_node or gethostname(),
+                  self.config.smashd_lease_ttl)
+            if self.config.smashd_shard_dir else None
+        )
+        if self.shard is not None:
+            METRICS.register(
+                'shard_tags_owned', 'gauge',
+                'Tags whose leases are held by this instance.',
+                lambda: len(self.shard.owned),
+            )
+        self.__resumed = False
+        self.__last_event = None
+        self.__tag_events = {}
+        self.__fingerprints = {}
         self.__mark = None
+        self.__pipelines = []
+        self.__skipped = 0
+        METRICS.register(
+            'dist_repo_skipped_total', 'counter',
+            'Dist-repos skipped since the signed content was unchanged.',
+            lambda: self.__skipped,
+        )
 
     def __repr__(self) -> str:
         return (f'{self.__module__}.{self.__class__.__name__}('
@@ -77,108 +186,434 @@ class SignAndComposeDaemon(object):
     def __str__(self) -> str:
         return f'SignAndComposeDaemon'
 
+    @staticmethod
+    def __koji_last_event():
+        """
+        :return:
+            The ID of the most recent event known to the Koji Hub or None
+            if it cannot be determined.
+        """
+        try:
+            return KojiLastEvent().event_id
+        except KojiCommandError as e:
+            _log.warning(f'cannot query the last Koji event: {e}')
+            return None
+
     @property
-    def last_run(self):
-        if self.__last_run is None:
+    def last_event(self):
+        """
+        :return:
+            The ID of the last Koji event that was processed, as persisted
+            in `SMASHD_STATE`, or None if it cannot yet be determined.  A
+            timestamp str is returned instead if the state was saved by a
+            version of smashd that tracked time rather than events; it is
+            superseded once the next work cycle completes.
+
+            Every tag has been processed through this event, although some
+            may have been processed further; see :meth:`__tag_marks`.
+        """
+        if self.__last_event is None:
             try:
                 with open(SMASHD_STATE) as f:
-                    self.__last_run = json.load(f)
-                _log.debug(
-                    f'loaded last-run of {self.__last_run!r} '
-                    f'from {SMASHD_STATE!r}'
-                )
+                    state = json.load(f)
             except FileNotFoundError:
-                self.__last_run = self.__now_iso_format
+                self.__last_event = self.__koji_last_event()
                 _log.debug(
-                    f'initialized last-run to {self.__last_run!r} '
+                    f'initialized last-event to {self.__last_event!r} '
                     f'since {SMASHD_STATE!r} is absent'
                 )
-        return self.__last_run
-
-    @last_run.setter
-    def last_run(self, value):
-        self.__last_run = value
-        with open(SMASHD_STATE, 'w') as f:
-            json.dump(self.__last_run, f)
-        _log.debug(f'saved last-run to {self.__last_run!r}')
-
-    @property
-    def __now(self):
-        # TODO - ideally utcnow() would be used instead
-        # Experimentation gives the impression that the koji CLI does not
-        # support UTC.
-        # See:  https://pagure.io/koji/issue/181
-        return datetime.now()
+            else:
+                if isinstance(state, dict):
+                    self.__last_event = state[EVENT]
+                    self.__tag_events = state.get(TAG_EVENTS, {})
+                    self.__fingerprints = state.get(FINGERPRINTS, {})
+                else:
+                    self.__last_event = state
+                    _log.info(
+                        f'migrating from last-run of {state!r} '
+                        f'to tracking Koji events'
+                    )
+                _log.debug(
+                    f'loaded last-event of {self.__last_event!r} '
+                    f'from {SMASHD_STATE!r}'
+                )
+        return self.__last_event
 
-    @property
-    def __now_iso_format(self):
-        return self.__now.isoformat(sep=' ')
+    @last_event.setter
+    def last_event(self, value: int):
+        self.__last_event = value
+        # Replace the state atomically, lest a crash leave it truncated.
+        temp = SMASHD_STATE + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({
+                EVENT: self.__last_event,
+                TAG_EVENTS: self.__tag_events,
+                FINGERPRINTS: self.__fingerprints,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, SMASHD_STATE)
+        _log.debug(f'saved last-event of {self.__last_event!r}')
 
-    def __adjust_periods(self, elapsed_time):
+    def __adjust_periods(self, elapsed_time=None):
         """
-        Adjust the quiescent-period to half the length of the last work cycle.
-
-        Statistically, that leaves the probability of delaying this or the
-        next cycle equal.  Without any quiescence period, a straggling event
-        would have to wait unduly long for present events to be processed.
-        A quiescence period that is the full length of the last work cycle
-        could mean that present events wait unduly long for a straggler that
-        may not be coming.
-
-        The check-interval is adjusted to be one quarter of the
-        quiescent-period provided the constraint is not violated.
+        Adjust the quiescent-period and check-interval as directed by the
+        configured tuning strategy; see :mod:`koji_helpers.tuning`.
 
         Both are constrained to be no less than *min_interval* seconds and no
         more than *max_interval* seconds.
 
         :param elapsed_time:
-            timedelta of the last work cycle.
+            timedelta of the work cycle just concluded, if any.
         """
-        last = elapsed_time.total_seconds()
-        self._monitor.period = min(
-            max(last / 2, self.config.smashd_min_interval),
-            self.config.smashd_max_interval
-        )
-        self._check_interval = min(
-            max(self._monitor.period / 4, self.config.smashd_min_interval),
-            self.config.smashd_max_interval
-        )
-        _log.info(
+        if elapsed_time is not None:
+            self.tuner.observe_cycle(elapsed_time.total_seconds())
+        if not self.tuner.adjust():
+            return
+        for monitor, _, _, _ in self._monitors.values():
+            monitor.period = self.tuner.period
+        _log.log(
+            INFO if elapsed_time is not None else DEBUG,
             f'check-interval/quiescent-period adjusted to '
-            f'{self._check_interval:0,.1f}/{self._monitor.period:0,.1f} seconds'
+            f'{self.tuner.check_interval:0,.1f}/{self.tuner.period:0,.1f} '
+            f'seconds'
         )
 
+    def __tags(self) -> iter:
+        """
+        :return:
+            An iter of str naming the tags of interest, which are those this
+            daemon owns if sharded.
+        """
+        if self.shard is None:
+            return self.config.repos
+        return sorted(self.shard.owned)
+
+    def __saved_marks(self) -> dict:
+        """
+        :return:
+            A dict whose keys are the tags of interest and whose values are
+            the last Koji event processed for each, as persisted, or the
+            `last_event` if none has been processed further.
+        """
+        return {
+            tag: self.__tag_events.get(tag, self.last_event)
+            for tag in self.__tags()
+        }
+
+    def __reshard(self):
+        """
+        Renew, hand off and take tag leases as the live daemons sharing the
+        tags come and go.
+        """
+        if self.shard is None or self.last_event is None:
+            return
+        taken = self.shard.update(self.__saved_marks(), self.__busy())
+        for tag, mark in taken.items():
+            # Carry on from wherever the previous owner left off.
+            self.__tag_events[tag] = self.last_event if mark is None else mark
+
+    def __busy(self) -> set:
+        """
+        :return:
+            A set of str naming the tags in the pipelines.
+        """
+        return {
+            tag for pipeline in self.__pipelines for tag in pipeline.changes
+        }
+
+    def __tag_marks(self) -> dict:
+        """
+        :return:
+            Like :meth:`__saved_marks`, but with the tags in each pipeline
+            regarded as processed through its mark.
+        """
+        marks = self.__saved_marks()
+        for pipeline in self.__pipelines:
+            for tag in pipeline.changes:
+                if tag in marks:
+                    marks[tag] = _later(marks[tag], pipeline.mark)
+        return marks
+
+    def __save_marks(self, marks: dict):
+        """
+        Persist *marks*, as given by :meth:`__saved_marks`, advancing the
+        `last_event` to the least of them.
+        """
+        if any(isinstance(mark, str) for mark in marks.values()):
+            # Some tags are yet to be processed since migrating.
+            floor = self.last_event
+        else:
+            floor = min(marks.values(), default=self.__mark)
+        self.__tag_events = {
+            tag: mark for tag, mark in marks.items() if mark != floor
+        }
+        self.last_event = floor
+
+    def __advance_quiet(self, changes: dict):
+        """
+        Advance the marks of the tags having no *changes* and not in any
+        pipeline through the present mark, since the tag history through it
+        held nothing for them.  Thus the tag history isn't fetched anew from
+        the same old event for as long as they stay quiet.
+        """
+        marks = self.__saved_marks()
+        busy = self.__busy() | set(changes)
+        advanced = {
+            tag: mark if tag in busy else self.__mark
+            for tag, mark in marks.items()
+        }
+        if advanced != marks:
+            self.__save_marks(advanced)
+
     def __get_present_changes(self):
-        hist = KojiTagHistory(self.last_run, self.__mark,
-                              self.config.smashd_exclude_tags)
+        # Events already in the pipeline are not to be seen again.
+        marks = self.__tag_marks()
+        if all(mark == self.__mark for mark in marks.values()):
+            # Nothing has happened at all; there's no history to fetch.
+            return {}
+        hist = KojiTagHistory(None, None, self.config.smashd_exclude_tags,
+                              before_event=self.__mark + 1,
+                              tags=self.__tags(),
+                              chunk_size=self.config.smashd_catchup_chunk_size,
+                              tag_after_events=marks)
         return hist.changed_tags
 
+    def __quiesced(self, changes: dict) -> dict:
+        """
+        Track the quiescence of each tag of *changes* separately.
+
+        :return:
+            The subset of *changes* for the tags that have quiesced or that
+            have awaited quiescence for `max_wait` seconds.
+        """
+        now = monotonic()
+        for tag in set(self._monitors) - set(changes):
+            # The tag's changes have been processed.
+            del self._monitors[tag]
+        quiesced = {}
+        arrived = False
+        for tag, tag_changes in changes.items():
+            if tag not in self._monitors:
+                self._monitors[tag] = (
+                    QuiescenceMonitor(self.tuner.period, {}), now, now, None,
+                )
+            monitor, since, changed, seen = self._monitors[tag]
+            if tag_changes != seen:
+                arrived = True
+                self._monitors[tag] = monitor, since, now, tag_changes
+            monitor.update(tag_changes)
+            if monitor.has_quiesced:
+                quiesced[tag] = tag_changes
+            elif 0 < self.config.smashd_max_wait <= now - since:
+                _log.info(f'tag {tag!r} has not quiesced in '
+                          f'{now - since:0,.1f} seconds; proceeding anyway')
+                quiesced[tag] = tag_changes
+        if arrived:
+            self.tuner.observe_change(now)
+        return quiesced
+
+    def __rest_interval(self) -> float:
+        """
+        :return:
+            The number of seconds to rest before checking for tag events
+            again, lest any be missed.
+        """
+        if not self.waker.event_driven:
+            interval = self.tuner.check_interval
+        else:
+            # New tag events will wake the daemon, so it need only check
+            # when the quiescence of those already seen is due.
+            now = monotonic()
+            interval = self.config.smashd_wakeup_interval
+            for _, since, changed, _ in self._monitors.values():
+                deadlines = [changed + self.tuner.period]
+                if self.config.smashd_max_wait > 0:
+                    deadlines.append(since + self.config.smashd_max_wait)
+                deadline = min(deadlines)
+                if deadline > now:
+                    interval = min(interval, deadline - now + DEADLINE_SLACK)
+        if self.shard is not None:
+            # The tag leases are renewed in the background, but tags are
+            # handed off and taken only here, as the daemons come and go.
+            interval = min(interval, self.config.smashd_lease_ttl / 3)
+        return interval
+
     def __rest(self):
-        _log.debug(f'sleeping {self._check_interval} seconds')
-        sleep(self._check_interval)
+        interval = self.__rest_interval()
+        _log.debug(f'sleeping {interval:0,.1f} seconds')
+        # The pipeline also wakes the daemon, to conclude the work cycle.
+        woken = self.waker.wait(self.__woken, interval)
+        if woken != self.__woken:
+            _log.debug('woken early')
+            self.__woken = woken
+
+    def __reap(self) -> bool:
+        """
+        Conclude the work cycles in the pipelines that have finished.
+
+        :return:
+            True if any work cycle was concluded successfully.
+        """
+        concluded = False
+        finished = [p for p in self.__pipelines if p.done]
+        for pipeline in finished:
+            self.__pipelines.remove(pipeline)
+            # Whatever was composed is known to be so, even if not all was.
+            for tag in pipeline.changes:
+                if tag in pipeline.fingerprints:
+                    self.__fingerprints[tag] = pipeline.fingerprints[tag]
+                else:
+                    self.__fingerprints.pop(tag, None)
+            self.__skipped += len(pipeline.skipped)
+            try:
+                elapsed_time = pipeline.result()
+            except KojiCommandError as e:
+                # The marks stay put, so the tag events are processed again
+                # by a work cycle yet to begin.
+                _log.error(f'{pipeline} failed: {e}; will retry')
+                self.journal.finish(pipeline.cycle)
+                continue
+            except Exception:
+                # Something unforeseen, e.g., a broken journal or a missing
+                # Sigul.  The marks stay put and the work cycle is left
+                # unfinished in the journal, to be resumed by a later poll.
+                _log.exception(f'{pipeline} failed unexpectedly; will retry')
+                self.__resumed = False
+                continue
+            marks = self.__saved_marks()
+            for tag in pipeline.changes:
+                if tag in marks:
+                    marks[tag] = _later(marks[tag], pipeline.mark)
+            self.__save_marks(marks)
+            self.journal.finish(pipeline.cycle)
+            self.__adjust_periods(elapsed_time)
+            concluded = True
+        if finished:
+            export_metrics()
+        return concluded
+
+    def __start(self, changes: dict, mark: int, cycle: int,
+                progress: dict = None):
+        self.__pipelines.append(Pipeline(
+            changes, mark, self.config, self.build_cache,
+            self.chunk_sizer, self.signed_index, self.__fingerprints,
+            self.waker.wake, self.journal, progress, cycle,
+            self.signing_slots,
+            self.shard.holds if self.shard is not None else None,
+        ))
+
+    def __resume(self):
+        """
+        Resume the work cycles left unfinished in the journal, if any,
+        other than those already running.
+        """
+        if self.last_event is None:
+            return
+        self.__resumed = True
+        running = {pipeline.cycle for pipeline in self.__pipelines}
+        for cycle, mark, changes, progress in self.journal.unfinished():
+            if cycle in running:
+                continue
+            if self.shard is not None:
+                # Tags since taken by another daemon are redone by it.
+                owned = self.shard.owned
+                changes = {
+                    tag: tag_changes for tag, tag_changes in changes.items()
+                    if tag in owned
+                }
+                progress = {
+                    tag: steps for tag, steps in progress.items()
+                    if tag in owned
+                }
+                if not changes:
+                    self.journal.finish(cycle)
+                    continue
+            # The journal knows better than the state file, which may
+            # predate the compositions of the unfinished work cycle.
+            for tag, (_, fingerprint) in progress.items():
+                if fingerprint is None:
+                    self.__fingerprints.pop(tag, None)
+                else:
+                    self.__fingerprints[tag] = fingerprint
+            _log.info(
+                f'resuming the work cycle through event {mark!r} for tags '
+                f'{sorted(changes)!r}, of which {len(progress)} had '
+                f'progressed'
+            )
+            self.__start(changes, mark, cycle,
+                         {tag: step for tag, (step, _) in progress.items()})
+
+    def poll(self) -> bool:
+        """
+        Check for tag events once and, should they have quiesced, begin a
+        work cycle to sign and compose for them.
+
+        Only the tags that have quiesced are included in the work cycle;
+        the rest are deferred to a later one.  The work cycle runs in a
+        :class:`Pipeline` while tag events continue to be checked and their
+        quiescence tracked by subsequent polls, which may begin further
+        work cycles alongside it.  However, a tag already in a pipeline
+        isn't included in another until that one has finished.
+
+        :return:
+            True if a work cycle was concluded.
+        """
+        # A work cycle that failed unexpectedly is resumed no sooner than
+        # the next poll, lest it fail over and over without rest.
+        resume = not self.__resumed
+        concluded = self.__reap()
+        self.__reshard()
+        if resume:
+            self.__resume()
+        started = monotonic()
+        self.__mark = self.__koji_last_event()
+        if self.__mark is None or self.last_event is None:
+            _log.warning('cannot determine the last Koji event; will retry')
+            return concluded
+        _log.debug(
+            f'checking for tag events after {self.last_event!r} '
+            f'through {self.__mark!r}'
+        )
+        try:
+            changes = self.__get_present_changes()
+        except KojiCommandError as e:
+            _log.warning(f'cannot query the tag history: {e}; will retry')
+            return concluded
+        self.tuner.observe_poll(monotonic() - started)
+        self.__advance_quiet(changes)
+        quiesced = self.__quiesced(changes)
+        self.__adjust_periods()
+        if not changes:
+            return concluded
+        _log.debug('new tag events detected')
+        if not quiesced:
+            _log.debug('awaiting quiescence')
+            return concluded
+        busy = self.__busy()
+        waiting = sorted(set(quiesced) & busy)
+        if waiting:
+            _log.debug(f'tags {waiting!r} await their pipelines')
+        ready = {
+            tag: tag_changes for tag, tag_changes in quiesced.items()
+            if tag not in busy
+        }
+        if not ready:
+            return concluded
+        _log.debug(f'quiescence achieved for tags {sorted(ready)!r}')
+        deferred = set(changes) - set(quiesced)
+        if deferred:
+            _log.debug(f'deferring tags {sorted(deferred)!r}')
+        cycle = self.journal.begin(self.__mark, ready)
+        self.__start(ready, self.__mark, cycle)
+        return concluded
 
     def run(self):
         _log.info('started; waiting for tag events')
-        changes = {}
-        self._monitor = QuiescenceMonitor(self.config.smashd_min_interval,
-                                          changes)
-        while True:
-            self.__mark = self.__now_iso_format
-            _log.debug(f'checking for tag events since {self.last_run!r}')
-            changes = self.__get_present_changes()
-            self._monitor.update(changes)
-            if changes:
-                _log.debug('new tag events detected')
-                if self._monitor.has_quiesced:
-                    _log.debug('quiescence achieved')
-                    start_time = self.__now
-                    Signer(changes, self.config)
-                    tags = changes.keys()
-                    DistRepoMaker(tags, self.config)
-                    elapsed_time = self.__now - start_time
-                    self.last_run = self.__mark
-                    Notifier(changes, self.config)
-                    self.__adjust_periods(elapsed_time)
-                else:
-                    _log.debug('awaiting quiescence')
-            self.__rest()
+        try:
+            while True:
+                self.poll()
+                self.__rest()
+        finally:
+            if self.shard is not None and self.last_event is not None:
+                self.shard.close(self.__saved_marks())
@@ -17,11 +17,15 @@
 #
 # You should have received a copy of the GNU General Public License along with
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
 from logging import getLogger
 
-from koji_helpers import USER
 from koji_helpers.config import Configuration, GPG_KEY_ID
-from koji_helpers.koji import KojiDistRepo, KojiWatchTasks
+from koji_helpers.engine import default_engine
+from koji_helpers.koji import (
+    KojiCommand, KojiCommandError, KojiDistRepo, KojiListTagged,
+)
+from koji_helpers.tasks import CLOSED, TaskTracker
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
@@ -29,6 +33,30 @@ __copyright__ = """2016-2019 John Florian"""
 _log = getLogger(__name__)
 
 
+def signed_content_fingerprint(tag: str, gpg_key_id: str) -> str:
+    """
+    :param gpg_key_id:
+        The GPG key identifier by which packages must be signed to be
+        allowed into the tag's package repository.
+
+    :return:
+        A digest of the RPMs of the latest builds within *tag*, including
+        those it inherits, that are signed with *gpg_key_id*, which is to
+        say everything that a dist-repo of *tag* would contain.  Thus, if the digest is unchanged
+        since the last dist-repo was composed, so is the repository.
+
+    :raise KojiCommandError:
+        If the tag could not be listed.
+    """
+    listing = default_engine().execute(KojiListTagged(tag, defer=True))
+    rpms = listing.signed_rpms_by_key.get(gpg_key_id.lower(), set())
+    digest = hashlib.sha256()
+    for rpm in sorted(rpms):
+        digest.update(rpm.encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
 class DistRepoMaker(object):
     """
     A wrapper around the Koji's 'dist-repo' feature to compose one consumable
@@ -42,6 +70,14 @@ class DistRepoMaker(object):
 
     From there, it's a trivial endeavor to bind mount or otherwise serve
     these to the consuming public via HTTP or NFS.
+
+    Each tag's dist-repo task is followed by its ID and reported as soon as
+    it finishes.
+
+    .. attribute:: states
+
+        A dict whose keys are the tags and whose values are the final state
+        of each one's dist-repo task, e.g., 'closed' or 'failed'.
     """
 
     def __init__(
@@ -54,7 +90,7 @@ class DistRepoMaker(object):
         """
         self.config = config
         self.tags = tags
-        self._work = None
+        self.states = {}
         self._tag = None
         self.run()
 
@@ -85,25 +121,65 @@ class DistRepoMaker(object):
         """
         return self._tag
 
+    @property
+    def failed(self) -> list:
+        """
+        :return:
+            A sorted list of the tags whose dist-repo task did not succeed.
+        """
+        return sorted(
+            tag for tag, state in self.states.items() if state != CLOSED
+        )
+
     @staticmethod
-    def _log_koji_output(output: str):
-        for line in output.splitlines():
-            _log.info('koji: %s', line)
+    def _log_koji_output(lines: iter):
+        for line in lines:
+            _log.info('koji: %s', line.rstrip())
 
     def run(self):
         """Create/update a package repository for each tag."""
         _log.info('dist-repo creation started')
+        submissions = []
         for self._tag in self.tags:
             _log.info(
                 f'submitting dist-repo task '
                 f'using config {self._repo_config_name!r}'
             )
-            # Task submissions will run async.
-            submission = KojiDistRepo(self._tag, self._gpg_key_id)
-            self._log_koji_output(submission.output)
+            submissions.append(
+                KojiDistRepo(self._tag, self._gpg_key_id, defer=True)
+            )
+        self._tag = None
+        # Task submissions will run async, so submit them all at once.
+        engine = default_engine()
+        futures = list(map(engine.submit, submissions))
+        tracker = TaskTracker(engine)
+        for submission, future in zip(submissions, futures):
+            try:
+                future.result()
+            except KojiCommandError as e:
+                _log.error(f'dist-repo submission for tag '
+                           f'{submission.tag!r} failed: {e}')
+                self.states[submission.tag] = e.status
+                continue
+            self._log_koji_output(submission.lines())
+            if submission.task_id is None:
+                _log.error(f'no dist-repo task ID found for tag '
+                           f'{submission.tag!r}')
+                self.states[submission.tag] = 'unknown'
+            else:
+                tracker.track(submission.task_id, submission.tag)
         # Wait for all to complete so that notifications aren't sent before the
         # repos are ready.
         _log.info('waiting for dist-repo tasks to complete')
-        watch = KojiWatchTasks(channel='createrepo', user=USER)
-        self._log_koji_output(watch.output)
+        for tag, task_id, state in tracker.wait(
+                KojiCommand.policy.timeout_for('watch-tasks')):
+            self.states[tag] = state
+            if state == CLOSED:
+                _log.info(f'dist-repo task {task_id} for tag {tag!r} '
+                          f'completed')
+            else:
+                _log.error(f'dist-repo task {task_id} for tag {tag!r} '
+                           f'ended as {state!r}')
+        if self.failed:
+            _log.error(f'dist-repo creation failed for tags {self.failed!r}')
         _log.info('dist-repo creation completed')
@@ -0,0 +1,182 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import sqlite3
+from logging import getLogger
+from threading import Lock
+from time import time
+
+WORK_JOURNAL = '/var/lib/koji-helpers/smashd/journal.sqlite'
+
+# The steps through which each tag of a work cycle progresses, in order.
+# Writing the signed copies of RPMs to Koji is part of signing them.
+SIGNED = 'signed'
+COMPOSED = 'composed'
+NOTIFIED = 'notified'
+STEPS = (SIGNED, COMPOSED, NOTIFIED)
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def _encode_changes(changes: dict) -> str:
+    # The changes hold sets, which JSON lacks.
+    return json.dumps({
+        tag: {
+            direction: {key: sorted(values) for key, values in kinds.items()}
+            for direction, kinds in directions.items()
+        }
+        for tag, directions in changes.items()
+    })
+
+
+def _decode_changes(text: str) -> dict:
+    return {
+        tag: {
+            direction: {key: set(values) for key, values in kinds.items()}
+            for direction, kinds in directions.items()
+        }
+        for tag, directions in json.loads(text).items()
+    }
+
+
+class WorkJournal(object):
+    """
+    A durable record of smashd's work cycles in progress.
+
+    Each tag's progress through the `STEPS` is recorded as soon as it is
+    made, so that a work cycle cut short by a crash or restart can be
+    resumed by redoing only the steps left unfinished.  The journal is kept
+    in SQLite with a write-ahead log and full synchronization, so that
+    every record is atomic and survives a crash once made.
+
+    Several work cycles may be in progress at once, each identified by the
+    ID given when it began, provided that no tag is in more than one.
+    """
+
+    def __init__(self, filename: str = WORK_JOURNAL):
+        """
+        Initialize the WorkJournal object.
+
+        :param filename:
+            The name of the SQLite database file backing the journal.
+        """
+        self.filename = filename
+        self._lock = Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = FULL')
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS cycles ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' mark INTEGER NOT NULL,'
+                ' changes TEXT NOT NULL,'
+                ' began REAL NOT NULL'
+                ')'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS steps ('
+                ' cycle INTEGER NOT NULL,'
+                ' tag TEXT NOT NULL,'
+                ' step TEXT NOT NULL,'
+                ' fingerprint TEXT,'
+                ' at REAL NOT NULL,'
+                ' PRIMARY KEY (cycle, tag)'
+                ')'
+            )
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'filename={self.filename!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'WorkJournal at {self.filename!r}'
+
+    def begin(self, mark: int, changes: dict) -> int:
+        """
+        Note that a work cycle has begun.
+
+        :param mark:
+            The ID of the last Koji event reflected by *changes*.
+
+        :param changes:
+            The changed tags that the work cycle is to process, as given by
+            the `changed_tags` of
+            :class:`koji_helpers.smashd.tag_history.KojiTagHistory`.  None
+            may be in another work cycle in progress.
+
+        :return:
+            The ID of the work cycle.
+        """
+        with self._lock, self._db:
+            return self._db.execute(
+                'INSERT INTO cycles (mark, changes, began) VALUES (?, ?, ?)',
+                (mark, _encode_changes(changes), time()),
+            ).lastrowid
+
+    def record(self, cycle: int, tag: str, step: str,
+               fingerprint: str = None):
+        """
+        Note that *tag* has finished *step* of the work *cycle*.
+
+        :param fingerprint:
+            The tag's signed content fingerprint as of its last dist-repo,
+            if known.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO steps '
+                '(cycle, tag, step, fingerprint, at) VALUES (?, ?, ?, ?, ?)',
+                (cycle, tag, step, fingerprint, time()),
+            )
+
+    def unfinished(self) -> list:
+        """
+        :return:
+            A list of tuples, one per work cycle in progress in the order
+            they began, each holding its ID, its mark, its changes and a
+            dict whose keys are the tags that finished any step and whose
+            values are a (step, fingerprint) tuple of the last finished.
+        """
+        with self._lock:
+            cycles = self._db.execute(
+                'SELECT id, mark, changes FROM cycles ORDER BY id'
+            ).fetchall()
+            progress = {cycle: {} for cycle, _, _ in cycles}
+            for cycle, tag, step, fingerprint in self._db.execute(
+                    'SELECT cycle, tag, step, fingerprint FROM steps'):
+                if cycle in progress:
+                    progress[cycle][tag] = step, fingerprint
+        return [
+            (cycle, mark, _decode_changes(changes), progress[cycle])
+            for cycle, mark, changes in cycles
+        ]
+
+    def finish(self, cycle: int):
+        """
+        Note that the work *cycle* has been concluded.
+        """
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM steps WHERE cycle = ?', (cycle,))
+            self._db.execute('DELETE FROM cycles WHERE id = ?', (cycle,))
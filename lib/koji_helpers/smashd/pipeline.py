@@ -0,0 +1,335 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from logging import getLogger
+from threading import Lock
+
+from koji_helpers.config import Configuration, GPG_KEY_ID
+from koji_helpers.koji import KojiCommandError
+from koji_helpers.smashd.build_cache import BuildCache
+from koji_helpers.smashd.distrepo import (
+    DistRepoMaker, signed_content_fingerprint,
+)
+from koji_helpers.smashd.journal import (
+    COMPOSED, NOTIFIED, SIGNED, STEPS, WorkJournal,
+)
+from koji_helpers.smashd.notifier import Notifier
+from koji_helpers.smashd.signed_index import SignedIndex
+from koji_helpers.smashd.signer import ChunkSizer, Signer, SigningSlots
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+class Pipeline(object):
+    """
+    One work cycle of smashd, carried from signing through composing to
+    notification tag by tag.
+
+    The tags are signed together, since those sharing a Sigul key share the
+    signing of their RPMs.  However, each tag moves on to its dist-repo as
+    soon as its own signing is done and its notification is sent as soon as
+    its own repository is ready.  Thus a tag with few changes needn't wait
+    upon one with many.
+
+    The pipeline runs in threads of its own so that the caller may carry on
+    meanwhile.  Once :attr:`done`, :meth:`result` tells how long it took or
+    raises whatever went wrong.
+
+    Given a :class:`WorkJournal`, each tag's progress is recorded there as
+    it is made under the ID of its work cycle.  Given the *progress* so
+    recorded by a pipeline that was cut short, only the steps that it left
+    unfinished are run.
+
+    Several pipelines may run at once, provided that their tags are
+    disjoint.
+
+    .. attribute:: mark
+
+        The ID of the last Koji event reflected in the changes.
+
+
+    .. attribute:: cycle
+
+        The ID of the work cycle in the journal, if any.
+
+
+    .. attribute:: composed
+
+        A dict whose keys are the tags composed thus far and whose values
+        are the datetime at which each was.
+
+
+    .. attribute:: fingerprints
+
+        A dict whose keys are tags and whose values are the
+        :func:`signed_content_fingerprint` of each as of its last successful
+        dist-repo.  A tag whose fingerprint is unchanged is not composed
+        anew, since its repository would be no different.
+
+
+    .. attribute:: skipped
+
+        A list of the tags whose dist-repo was skipped for that reason.
+
+
+    .. attribute:: fenced
+
+        A list of the tags left neither composed nor notified since they
+        could no longer be worked upon here; see the *fence*.
+    """
+
+    def __init__(
+            self,
+            changes: dict,
+            mark: int,
+            config: Configuration,
+            build_cache: BuildCache = None,
+            chunk_sizer: ChunkSizer = None,
+            signed_index: SignedIndex = None,
+            fingerprints: dict = None,
+            on_done=None,
+            journal: WorkJournal = None,
+            progress: dict = None,
+            cycle: int = None,
+            signing_slots: SigningSlots = None,
+            fence=None,
+    ):
+        """
+        Initialize the Pipeline object and start it running.
+
+        :param changes:
+            The changed tags, as given by the `changed_tags` of
+            :class:`koji_helpers.smashd.tag_history.KojiTagHistory`.
+
+        :param mark:
+            The ID of the last Koji event reflected by *changes*.
+
+        :param fingerprints:
+            The initial value of :attr:`fingerprints`, which is copied
+            rather than updated.
+
+        :param on_done:
+            A callable, taking no arguments, to be called once the pipeline
+            is :attr:`done`, e.g., to wake its caller.
+
+        :param journal:
+            The :class:`WorkJournal` in which to record each tag's progress
+            or None if it isn't to be recorded.
+
+        :param progress:
+            A dict whose keys are tags and whose values are the last of the
+            `STEPS` that each had already finished, e.g., before a crash.
+
+        :param cycle:
+            The ID of the work cycle under which to record each tag's
+            progress in the *journal*, as given when it began.
+
+        :param fence:
+            A callable, taking a tag, that returns False once the tag may no
+            longer be worked upon here, e.g.,
+            :meth:`koji_helpers.smashd.sharding.Shard.holds`, or None if it
+            always may.
+
+        The remaining parameters are passed on to :class:`Signer`.
+        """
+        self.changes = changes
+        self.mark = mark
+        self.config = config
+        self.build_cache = build_cache
+        self.chunk_sizer = chunk_sizer
+        self.signed_index = signed_index
+        self.started = datetime.now()
+        self.finished = None
+        self.composed = {}
+        self.fingerprints = dict(fingerprints or {})
+        self.skipped = []
+        self.fenced = []
+        self.fence = fence
+        self.journal = journal
+        self.progress = dict(progress or {})
+        self.cycle = cycle
+        self.signing_slots = signing_slots
+        self._compositions = []
+        self._lock = Lock()
+        self._composer = ThreadPoolExecutor(
+            max_workers=max(1, len(changes)), thread_name_prefix='Composer',
+        )
+        driver = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='Pipeline',
+        )
+        self._future = driver.submit(self.__run)
+        if on_done is not None:
+            self._future.add_done_callback(lambda future: on_done())
+        driver.shutdown(wait=False)
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'changes={self.changes!r}, '
+                f'mark={self.mark!r}, '
+                f'config={self.config!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'Pipeline through event {self.mark} with '
+                f'{len(self.composed)} of {len(self.changes)} tags composed')
+
+    @property
+    def done(self) -> bool:
+        """
+        :return:
+            True if the pipeline has finished, successfully or not.
+        """
+        return self._future.done()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Await the pipeline's completion for no more than *timeout* seconds.
+
+        :return:
+            True if the pipeline has finished.
+        """
+        wait([self._future], timeout)
+        return self.done
+
+    def result(self):
+        """
+        Await the pipeline's completion.
+
+        :return:
+            The timedelta that the pipeline took to run.
+        """
+        self._future.result()
+        return self.finished - self.started
+
+    def __reached(self, tag: str, step: str) -> bool:
+        return (tag in self.progress
+                and STEPS.index(self.progress[tag]) >= STEPS.index(step))
+
+    def __record(self, tag: str, step: str):
+        if self.journal is not None and not self.__reached(tag, step):
+            self.journal.record(self.cycle, tag, step,
+                                self.fingerprints.get(tag))
+
+    def __signed(self, tags: list):
+        with self._lock:
+            for tag in tags:
+                self.__record(tag, SIGNED)
+                _log.debug(f'tag {tag!r} signed; composing')
+                self._compositions.append(
+                    self._composer.submit(self.__compose, tag)
+                )
+
+    def __fingerprint(self, tag: str):
+        """
+        :return:
+            The :func:`signed_content_fingerprint` of *tag* or None if it is
+            not wanted or the tag could not be listed, as a failed listing
+            says nothing of the tag's content.
+        """
+        if not self.config.smashd_skip_unchanged:
+            return None
+        try:
+            return signed_content_fingerprint(
+                tag, self.config.get_repo(tag)[GPG_KEY_ID],
+            )
+        except KojiCommandError as e:
+            _log.warning(f'cannot fingerprint tag {tag!r}: {e}')
+            return None
+
+    def __held(self, tag: str) -> bool:
+        if self.fence is None or self.fence(tag):
+            return True
+        _log.warning(f'tag {tag!r} is no longer held here; leaving it to '
+                     f'its new owner')
+        self.fenced.append(tag)
+        return False
+
+    def __compose(self, tag: str):
+        if not self.__held(tag):
+            return
+        if self.__reached(tag, COMPOSED):
+            _log.info(f'tag {tag!r} was composed before restarting')
+        else:
+            self.__make(tag)
+        self.composed[tag] = datetime.now()
+        if self.__reached(tag, NOTIFIED) or not self.__held(tag):
+            return
+        try:
+            Notifier({tag: self.changes[tag]}, self.config)
+        except OSError as e:
+            # The work is done; it mustn't be repeated for want of mail.
+            _log.error(f'cannot send notification for tag {tag!r}: {e}')
+        self.__record(tag, NOTIFIED)
+
+    def __make(self, tag: str):
+        # Fingerprint before composing lest anything signed meanwhile be
+        # mistaken as already in the repository.
+        fingerprint = self.__fingerprint(tag)
+        unchanged = (
+            fingerprint is not None
+            and fingerprint == self.fingerprints.get(tag)
+        )
+        if unchanged:
+            _log.info(f'signed content of tag {tag!r} is unchanged; '
+                      f'skipping its dist-repo')
+            self.skipped.append(tag)
+        else:
+            maker = DistRepoMaker([tag], self.config)
+            if tag in maker.failed:
+                # Abandon the work cycle, so that the tag's mark stays put
+                # and the dist-repo is tried again, and notify no one.
+                raise KojiCommandError(
+                    f'dist-repo of tag {tag!r} failed',
+                    maker.states[tag],
+                )
+            if fingerprint is None:
+                # The repository no longer holds what was last
+                # fingerprinted and what it holds now is unknown.
+                self.fingerprints.pop(tag, None)
+            else:
+                self.fingerprints[tag] = fingerprint
+        self.__record(tag, COMPOSED)
+
+    def __run(self):
+        try:
+            signed = [tag for tag in self.changes
+                      if self.__reached(tag, SIGNED)]
+            if signed:
+                self.__signed(signed)
+            unsigned = {
+                tag: changes for tag, changes in self.changes.items()
+                if tag not in signed
+            }
+            if unsigned:
+                Signer(unsigned, self.config, self.build_cache,
+                       self.chunk_sizer, self.signed_index, self.__signed,
+                       self.signing_slots)
+            # Every tag has been handed to the composer by now.
+            for future in list(self._compositions):
+                future.result()
+        finally:
+            self._composer.shutdown(wait=True)
+            self.finished = datetime.now()
+        _log.info(f'{self} in {self.finished - self.started}')
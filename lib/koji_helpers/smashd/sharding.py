@@ -0,0 +1,422 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Sharding of the repository tags among several smashd instances.
+
+The instances, or nodes, share a directory, e.g., on the Koji volume that
+they all mount, in which each holds a lease upon its own membership and
+upon every tag that it owns.  A lease is a small JSON file naming its
+holder and when it expires; it must be renewed before then or it may be
+taken by another.  Each node assigns the tags to the live members by
+consistent hashing, so that a node joining or leaving moves only about its
+share of the tags, and owns those assigned to it whose leases it holds.  A
+tag's lease also carries the last Koji event processed for it, so that
+whoever takes the tag over carries on from there.
+
+Each node renews its leases from a thread of its own, so that they are kept
+even while it is blocked upon Koji, and fences off the work upon any tag
+whose lease it has lost, which is another's by then.
+
+The clocks of the nodes are presumed to be synchronized, as Koji itself
+requires.
+"""
+import fcntl
+import hashlib
+import json
+import os
+from bisect import bisect
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import time
+
+# The points on the hash ring given to each node, which even out the shares.
+VNODES = 64
+
+# keys of a lease
+EXPIRES = 'expires'
+MARK = 'mark'
+NODE = 'node'
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], 'big')
+
+
+class HashRing(object):
+    """
+    A consistent hash of keys onto nodes.
+    """
+
+    def __init__(self, nodes: iter, vnodes: int = VNODES):
+        """
+        Initialize the HashRing object.
+
+        :param nodes:
+            An iter of str naming the nodes.
+
+        :param vnodes:
+            The number of points on the ring given to each node.
+        """
+        self.nodes = sorted(nodes)
+        self.vnodes = vnodes
+        self._points = sorted(
+            (_hash(f'{node}#{n}'), node)
+            for node in self.nodes for n in range(vnodes)
+        )
+        self._hashes = [point for point, _ in self._points]
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'nodes={self.nodes!r}, '
+                f'vnodes={self.vnodes!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'HashRing of {len(self.nodes)} nodes'
+
+    def owner(self, key: str):
+        """
+        :return:
+            The node to which *key* is assigned or None if there are none.
+        """
+        if not self._points:
+            return None
+        i = bisect(self._hashes, _hash(key)) % len(self._points)
+        return self._points[i][1]
+
+
+class LeaseDirectory(object):
+    """
+    The leases held by the nodes, kept as files in a shared directory.
+
+    A lease is written to a temporary file and renamed into place, so that
+    it is never seen half written.  A tag's lease is only ever taken,
+    renewed or released while holding an exclusive POSIX lock upon a lock
+    file of its own, and only if it is unchanged since it was judged free,
+    expired or held by this node.  Thus, should two nodes vie for the same
+    lease at once, exactly one takes it.  The locks are released by the
+    system should their holder die, and are honored over NFS given a
+    working lock manager.
+    """
+
+    def __init__(self, path: str, node: str, ttl: float):
+        """
+        Initialize the LeaseDirectory object.
+
+        :param path:
+            The shared directory, which is created if absent.
+
+        :param node:
+            The name of this node, which must be unique among them.
+
+        :param ttl:
+            The seconds for which each lease taken or renewed is held.
+        """
+        self.path = path
+        self.node = node
+        self.ttl = ttl
+        for kind in ('locks', 'nodes', 'tags'):
+            os.makedirs(os.path.join(path, kind), exist_ok=True)
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'path={self.path!r}, '
+                f'node={self.node!r}, '
+                f'ttl={self.ttl!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'leases of node {self.node!r} at {self.path!r}'
+
+    def __file(self, kind: str, name: str) -> str:
+        # Tag names may hold no slash, but be safe.
+        return os.path.join(self.path, kind, name.replace('/', '%2F'))
+
+    @staticmethod
+    def __read(filename: str):
+        try:
+            with open(filename) as f:
+                lease = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            _log.warning(f'ignoring malformed lease {filename!r}')
+            return None
+        return lease if isinstance(lease, dict) else None
+
+    def __write(self, filename: str, lease: dict):
+        temp = f'{filename}.{self.node}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(lease, f)
+        os.replace(temp, filename)
+
+    def __take(self, tag: str, seen, mark, expires: float) -> bool:
+        """
+        Have this node hold the lease upon *tag* until *expires*, provided
+        that the lease is still as *seen*.
+
+        :param seen:
+            The dict of the lease as last read, or None if there was none.
+
+        :return:
+            True if the lease is now held by this node.
+        """
+        filename = self.__file('tags', tag)
+        with open(self.__file('locks', tag), 'a') as lock:
+            # Closing the file releases the lock.
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            if self.__read(filename) != seen:
+                return False
+            self.__write(
+                filename, {NODE: self.node, EXPIRES: expires, MARK: mark},
+            )
+        return True
+
+    def heartbeat(self):
+        """
+        Take or renew this node's lease upon its membership.
+        """
+        self.__write(self.__file('nodes', self.node),
+                     {NODE: self.node, EXPIRES: time() + self.ttl})
+
+    def live_nodes(self) -> list:
+        """
+        :return:
+            A list of str naming the nodes whose membership leases are
+            unexpired, including this one if it has a heartbeat.
+        """
+        now = time()
+        nodes = []
+        directory = os.path.join(self.path, 'nodes')
+        for name in os.listdir(directory):
+            if name.endswith('.tmp'):
+                continue
+            lease = self.__read(os.path.join(directory, name))
+            if lease is not None and lease.get(EXPIRES, 0) > now:
+                nodes.append(lease[NODE])
+        return nodes
+
+    def acquire(self, tag: str):
+        """
+        Take the lease upon *tag* if it is free, expired or already held.
+
+        :return:
+            None if another node holds the lease, or else a dict of the
+            lease taken, whose `MARK` is the last Koji event processed for
+            *tag* by its previous holder, if any.
+        """
+        seen = self.__read(self.__file('tags', tag))
+        lease = seen or {}
+        if lease.get(NODE, self.node) != self.node:
+            if lease.get(EXPIRES, 0) > time():
+                return None
+            _log.info(f'taking over expired lease upon tag {tag!r} '
+                      f'from node {lease[NODE]!r}')
+        mark = lease.get(MARK)
+        if not self.__take(tag, seen, mark, time() + self.ttl):
+            return None
+        return {NODE: self.node, MARK: mark}
+
+    def renew(self, tag: str, mark) -> bool:
+        """
+        Extend this node's lease upon *tag*, recording *mark* as the last
+        Koji event processed for it.
+
+        :return:
+            True if the lease was still held by this node and is renewed.
+        """
+        lease = self.__read(self.__file('tags', tag))
+        if lease is None or lease.get(NODE) != self.node:
+            return False
+        return self.__take(tag, lease, mark, time() + self.ttl)
+
+    def release(self, tag: str, mark):
+        """
+        Give up this node's lease upon *tag*, so that another may take it
+        at once, recording *mark* as the last Koji event processed for it.
+        """
+        lease = self.__read(self.__file('tags', tag))
+        if lease is not None and lease.get(NODE) == self.node:
+            self.__take(tag, lease, mark, 0)
+
+    def leave(self):
+        """
+        Give up this node's membership lease.
+        """
+        try:
+            os.unlink(self.__file('nodes', self.node))
+        except FileNotFoundError:
+            pass
+
+
+class Shard(object):
+    """
+    The tags owned by this smashd instance among several.
+
+    .. attribute:: owned
+
+        A set of str naming the tags whose leases this node holds.
+
+    The leases held are renewed in the background from the first
+    :meth:`update` until :meth:`close`.
+    """
+
+    def __init__(self, tags: iter, path: str, node: str, ttl: float):
+        """
+        Initialize the Shard object.
+
+        :param tags:
+            An iter of str naming all of the tags to be sharded.
+
+        The remaining parameters are passed on to :class:`LeaseDirectory`.
+        """
+        self.tags = sorted(tags)
+        self.leases = LeaseDirectory(path, node, ttl)
+        self.owned = set()
+        self._expires = {}
+        self._marks = {}
+        self._lock = Lock()
+        self._stopped = Event()
+        self._renewer = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'tags={self.tags!r}, '
+                f'path={self.leases.path!r}, '
+                f'node={self.leases.node!r}, '
+                f'ttl={self.leases.ttl!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'shard of node {self.leases.node!r} owning '
+                f'{len(self.owned)} of {len(self.tags)} tags')
+
+    def __drop(self, tag: str):
+        self.owned.discard(tag)
+        self._expires.pop(tag, None)
+
+    def __renew(self, tag: str) -> bool:
+        """
+        Renew the lease upon *tag*, or else give up the tag.
+
+        :return:
+            True if the lease is still held by this node.
+        """
+        # Reckon the expiry from before the lease is written, lest the
+        # lease be thought held for longer than it is.
+        expires = time() + self.leases.ttl
+        if self.leases.renew(tag, self._marks.get(tag)):
+            self._expires[tag] = expires
+            return True
+        _log.warning(f'lost the lease upon tag {tag!r}')
+        self.__drop(tag)
+        return False
+
+    def __renew_periodically(self):
+        while not self._stopped.wait(self.leases.ttl / 3):
+            with self._lock:
+                try:
+                    self.leases.heartbeat()
+                    for tag in sorted(self.owned):
+                        self.__renew(tag)
+                except OSError as e:
+                    _log.warning(f'cannot renew the leases: {e}')
+
+    def holds(self, tag: str) -> bool:
+        """
+        :return:
+            True if this node holds an unexpired lease upon *tag*, and so
+            may work upon it.
+        """
+        with self._lock:
+            return tag in self.owned and self._expires.get(tag, 0) > time()
+
+    def update(self, marks: dict, busy: iter = ()) -> dict:
+        """
+        Renew the leases held, hand off the tags now assigned to other
+        nodes and take those newly assigned to this one.
+
+        The leases held are also renewed in the background thereafter,
+        recording the *marks* given last.
+
+        :param marks:
+            A dict whose keys are the :attr:`owned` tags and whose values
+            are the last Koji event processed for each.
+
+        :param busy:
+            An iter of str naming the tags being processed, which are not
+            handed off until they are done.
+
+        :return:
+            A dict whose keys are the tags newly taken and whose values are
+            the last Koji event processed for each by its previous holder,
+            or None if unknown.
+        """
+        with self._lock:
+            self._marks = dict(marks)
+            self.leases.heartbeat()
+            ring = HashRing(self.leases.live_nodes())
+            busy = set(busy)
+            for tag in sorted(self.owned):
+                if not self.__renew(tag):
+                    continue
+                if ring.owner(tag) != self.leases.node and tag not in busy:
+                    _log.info(f'handing off tag {tag!r} to node '
+                              f'{ring.owner(tag)!r}')
+                    self.leases.release(tag, marks.get(tag))
+                    self.__drop(tag)
+            taken = {}
+            for tag in self.tags:
+                if tag in self.owned or ring.owner(tag) != self.leases.node:
+                    continue
+                expires = time() + self.leases.ttl
+                lease = self.leases.acquire(tag)
+                if lease is not None:
+                    _log.info(f'took tag {tag!r}')
+                    self.owned.add(tag)
+                    self._expires[tag] = expires
+                    taken[tag] = lease[MARK]
+        if self._renewer is None:
+            self._renewer = Thread(
+                target=self.__renew_periodically, name='Shard', daemon=True,
+            )
+            self._renewer.start()
+        return taken
+
+    def close(self, marks: dict):
+        """
+        Release every lease held, so that the other nodes may take over the
+        tags at once rather than once the leases expire.
+
+        :param marks:
+            As for :meth:`update`.
+        """
+        self._stopped.set()
+        with self._lock:
+            for tag in sorted(self.owned):
+                self.leases.release(tag, marks.get(tag))
+            self.owned.clear()
+            self._expires.clear()
+            self.leases.leave()
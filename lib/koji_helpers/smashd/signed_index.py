@@ -0,0 +1,238 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import sqlite3
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import time
+
+from koji_helpers.engine import default_engine
+from koji_helpers.koji import KojiCommandError, KojiListSigned
+
+SIGNED_INDEX = '/var/lib/koji-helpers/smashd/signed-index.sqlite'
+
+# The most RPMs named by any one SQL statement, which keeps well within
+# SQLite's limit on the number of host parameters.
+BATCH_SIZE = 500
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def _batches(items: list) -> iter:
+    for i in range(0, len(items), BATCH_SIZE):
+        yield items[i:i + BATCH_SIZE]
+
+
+class SignedIndex(object):
+    """
+    A persistent index of the RPMs within each tag that are signed with each
+    key.
+
+    A tag is listed in full by the Koji Hub only the first time its key is
+    needed.  From then on, the index is kept current by the tag events that
+    smashd processes and by the results of its own signing, so that finding
+    the unsigned RPMs of a work cycle costs time in proportion to the builds
+    that changed rather than to the size of the tag.  Any drift from what
+    the hub knows, e.g., RPMs signed by other means, is corrected by listing
+    each tag again in the background every *reconcile_interval* seconds.
+
+    A signature belongs to an RPM rather than to a tag, so an RPM signed
+    with a key for any one tag is regarded as signed with that key for all.
+    """
+
+    def __init__(
+            self,
+            filename: str = SIGNED_INDEX,
+            reconcile_interval: float = 3600,
+    ):
+        """
+        Initialize the SignedIndex object.
+
+        :param filename:
+            The name of the SQLite database file backing the index.
+
+        :param reconcile_interval:
+            The number of seconds after which each tag is listed anew.
+        """
+        self.filename = filename
+        self.reconcile_interval = reconcile_interval
+        self._lock = Lock()
+        self._stopped = Event()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS signed ('
+                ' tag TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' rpm TEXT NOT NULL,'
+                ' added REAL NOT NULL,'
+                ' PRIMARY KEY (tag, key, rpm)'
+                ')'
+            )
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS signed_rpm ON signed (key, rpm)'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS reconciled ('
+                ' tag TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' at REAL NOT NULL,'
+                ' PRIMARY KEY (tag, key)'
+                ')'
+            )
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'filename={self.filename!r}, '
+                f'reconcile_interval={self.reconcile_interval!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'SignedIndex with {len(self):,d} signed RPMs'
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM signed').fetchone()[0]
+
+    def is_known(self, tag: str, key: str) -> bool:
+        """
+        :return:
+            True if *tag* has been listed in full for *key* at least once.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT 1 FROM reconciled WHERE tag = ? AND key = ?',
+                (tag, key),
+            ).fetchone() is not None
+
+    def signed(self, key: str, rpms: iter) -> set:
+        """
+        :return:
+            A set of str, being those of *rpms* that are signed with *key*.
+        """
+        found = set()
+        with self._lock:
+            for batch in _batches(sorted(rpms)):
+                found.update(row[0] for row in self._db.execute(
+                    'SELECT DISTINCT rpm FROM signed WHERE key = ? AND rpm IN '
+                    f'({", ".join("?" * len(batch))})',
+                    [key] + batch,
+                ))
+        return found
+
+    def add(self, tag: str, key: str, rpms: iter):
+        """
+        Note that *rpms* within *tag* are signed with *key*.
+        """
+        now = time()
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO signed (tag, key, rpm, added) '
+                'VALUES (?, ?, ?, ?)',
+                [(tag, key, rpm, now) for rpm in rpms],
+            )
+
+    def discard(self, tag: str, rpms: iter):
+        """
+        Note that *rpms* are no longer within *tag*.
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                'DELETE FROM signed WHERE tag = ? AND rpm = ?',
+                [(tag, rpm) for rpm in rpms],
+            )
+
+    def replace(self, tag: str, key: str, rpms: iter, since: float):
+        """
+        Supersede what is known of *tag* and *key* with *rpms*, as listed
+        by the Koji Hub at *since*.  RPMs added after *since* are retained
+        since the listing may predate their signing.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                'DELETE FROM signed WHERE tag = ? AND key = ? AND added < ?',
+                (tag, key, since),
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO signed (tag, key, rpm, added) '
+                'VALUES (?, ?, ?, ?)',
+                [(tag, key, rpm, since) for rpm in rpms],
+            )
+            self._db.execute(
+                'INSERT OR REPLACE INTO reconciled (tag, key, at) '
+                'VALUES (?, ?, ?)',
+                (tag, key, since),
+            )
+
+    def reconcile(self, tag: str, key: str):
+        """
+        List *tag* in full and supersede what is known of it for *key*.
+
+        :raise KojiCommandError:
+            If *tag* could not be listed, in which case what is known of it
+            is left as is and it remains due for reconciliation.
+        """
+        since = time()
+        # A failed listing raises here, before anything is replaced, lest
+        # the index forget what is signed.
+        listing = default_engine().execute(KojiListSigned(tag, defer=True))
+        self.replace(tag, key, listing.rpms_by_key.get(key, set()), since)
+        _log.debug(f'reconciled tag {tag!r} for key {key!r}; {self}')
+
+    def due(self) -> list:
+        """
+        :return:
+            A list of (tag, key) for each that was last listed more than
+            `reconcile_interval` seconds ago.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT tag, key FROM reconciled WHERE at < ? ORDER BY at',
+                (time() - self.reconcile_interval,),
+            ).fetchall()
+
+    def __reconcile_periodically(self):
+        while not self._stopped.wait(self.reconcile_interval):
+            for tag, key in self.due():
+                if self._stopped.is_set():
+                    break
+                try:
+                    self.reconcile(tag, key)
+                except KojiCommandError as e:
+                    _log.warning(
+                        f'cannot reconcile tag {tag!r} for key {key!r}: {e}'
+                    )
+
+    def start(self):
+        """
+        Begin reconciling the index in the background.
+        """
+        Thread(
+            target=self.__reconcile_periodically, name='SignedIndex',
+            daemon=True,
+        ).start()
+
+    def shutdown(self):
+        """
+        Stop reconciling the index in the background.
+        """
+        self._stopped.set()
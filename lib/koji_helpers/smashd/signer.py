@@ -18,15 +18,40 @@
 # You should have received a copy of the GNU General Public License along with
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
 from logging import getLogger
 from subprocess import PIPE, Popen, STDOUT
+from threading import BoundedSemaphore, Lock
+from time import monotonic, time
 
 from koji_helpers import SIGUL
 from koji_helpers.config import (
     Configuration, GPG_KEY_ID, SIGUL_KEY_NAME, SIGUL_KEY_PASS,
 )
-from koji_helpers.koji import KojiBuildInfo, KojiListSigned, KojiWriteSignedRpm
-from koji_helpers.smashd.tag_history import BUILD, TAG_IN
+from koji_helpers.engine import default_engine
+from koji_helpers.koji import (
+    KojiCommandError, KojiListSigned, KojiWriteSignedRpm, query_build_rpms,
+)
+from koji_helpers.metrics import METRICS
+from koji_helpers.rpmhdr import (
+    RpmHeaderError, koji_rpm_paths, signature_key_ids,
+)
+from koji_helpers.smashd.build_cache import BuildCache
+from koji_helpers.smashd.signed_index import SignedIndex
+from koji_helpers.smashd.tag_history import BUILD, TAG_IN, TAG_OUT
+
+# The most bytes of RPM names given to any one Sigul process.  This is far
+# below the ARG_MAX of any Linux system, so even a mass rebuild cannot
+# exceed it.
+ARGV_LIMIT = 128 * 1024
+
+# The number of RPMs in a chunk before anything is known of how long Sigul
+# takes per RPM.
+INITIAL_CHUNK_SIZE = 50
+
+# The weight given to each new observation of Sigul's time per RPM.
+SMOOTHING = 0.3
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
@@ -34,23 +59,275 @@ __copyright__ = """2016-2019 John Florian"""
 _log = getLogger(__name__)
 
 
+class SigningError(KojiCommandError):
+    """
+    Raised when Sigul could not sign some RPMs despite retrying.
+
+    Like a failed Koji command, this abandons the work cycle so that it is
+    retried, since the tags wanting those RPMs mustn't be composed without
+    them.
+    """
+    pass
+
+
+class _KeyGroup(object):
+    """
+    The signing work of one cycle for all tags that share one Sigul key.
+    """
+
+    def __init__(self, sigul_key: str, sigul_passphrase: str, koji_key: str):
+        self.sigul_key = sigul_key
+        self.sigul_passphrase = sigul_passphrase
+        self.koji_key = koji_key
+        self.tags = []
+        self.rpms = set()
+        self.rpms_by_tag = {}
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'sigul_key={self.sigul_key!r}, '
+                f'koji_key={self.koji_key!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'key {self.sigul_key!r} for tags {self.tags!r}'
+
+    def slices(self, count: int) -> list:
+        """
+        :return:
+            A list of no more than *count* lists of str that together hold
+            each of the RPMs to be signed exactly once.
+        """
+        rpms = sorted(self.rpms)
+        return [rpms[i::count] for i in range(min(count, len(rpms)))]
+
+
+class ChunkSizer(object):
+    """
+    Sizes the chunks of RPMs given to each Sigul process so that each chunk
+    is signed in about *target* seconds, judging by a moving average of the
+    time Sigul has taken per RPM.  This lives as long as the daemon so that
+    what was learned in one work cycle benefits the next.
+    """
+
+    def __init__(self, target: float = 60, maximum: int = 1000):
+        """
+        Initialize the ChunkSizer object.
+
+        :param target:
+            The number of seconds that signing one chunk should take.
+
+        :param maximum:
+            The most RPMs that any chunk may hold.
+        """
+        self.target = target
+        self.maximum = maximum
+        self.seconds_per_rpm = None
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'target={self.target!r}, '
+                f'maximum={self.maximum!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'chunks of {self.size} RPMs'
+
+    @classmethod
+    def from_config(cls, config: Configuration):
+        """
+        :return:
+            A new ChunkSizer as directed by the `[smashd]` section of
+            *config*.
+        """
+        return cls(
+            target=config.smashd_signing_chunk_seconds,
+            maximum=config.smashd_signing_chunk_max,
+        )
+
+    @property
+    def size(self) -> int:
+        """
+        :return:
+            The number of RPMs that the next chunk should hold.
+        """
+        with self._lock:
+            seconds_per_rpm = self.seconds_per_rpm
+        if seconds_per_rpm is None:
+            size = INITIAL_CHUNK_SIZE
+        elif seconds_per_rpm > 0:
+            size = int(self.target / seconds_per_rpm)
+        else:
+            size = self.maximum
+        return max(1, min(size, self.maximum))
+
+    def observe(self, rpms: int, seconds: float):
+        """
+        Note that Sigul took *seconds* to sign a chunk of *rpms*.
+        """
+        seconds_per_rpm = seconds / rpms
+        with self._lock:
+            if self.seconds_per_rpm is None:
+                self.seconds_per_rpm = seconds_per_rpm
+            else:
+                self.seconds_per_rpm += SMOOTHING * (
+                    seconds_per_rpm - self.seconds_per_rpm
+                )
+
+    def chunks(self, rpms: list) -> iter:
+        """
+        :return:
+            A generator yielding consecutive lists of str that together
+            hold each of *rpms* exactly once.  Each is sized as of when it
+            is yielded, so latency observed while signing one chunk governs
+            the next, and holds no more than `ARGV_LIMIT` bytes of names.
+        """
+        i = 0
+        while i < len(rpms):
+            chunk, length = [], 0
+            for rpm in rpms[i:i + self.size]:
+                length += len(rpm) + 1
+                if chunk and length > ARGV_LIMIT:
+                    break
+                chunk.append(rpm)
+            i += len(chunk)
+            yield chunk
+
+
+class SigningSlots(object):
+    """
+    Bounds the Sigul processes that may sign at once, both overall and with
+    any one key.  This lives as long as the daemon so that the bounds hold
+    across all of the work cycles running at once.
+    """
+
+    def __init__(self, concurrency: int = 4, key_concurrency: int = 1):
+        """
+        Initialize the SigningSlots object.
+
+        :param concurrency:
+            The most Sigul processes that may sign at once.
+
+        :param key_concurrency:
+            The most Sigul processes that may sign with any one key at once.
+        """
+        self.concurrency = concurrency
+        self.key_concurrency = key_concurrency
+        self._overall = BoundedSemaphore(concurrency)
+        self._per_key = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'concurrency={self.concurrency!r}, '
+                f'key_concurrency={self.key_concurrency!r}, '
+                f')')
+
+    @classmethod
+    def from_config(cls, config: Configuration):
+        """
+        :return:
+            A new SigningSlots as directed by the `[smashd]` section of
+            *config*.
+        """
+        return cls(
+            concurrency=config.smashd_signing_concurrency,
+            key_concurrency=config.smashd_signing_key_concurrency,
+        )
+
+    def acquire(self, key: str):
+        """
+        Await a slot for signing with *key*.
+        """
+        with self._lock:
+            if key not in self._per_key:
+                self._per_key[key] = BoundedSemaphore(self.key_concurrency)
+            per_key = self._per_key[key]
+        # Always taken in this order, so that no two waiters deadlock.
+        per_key.acquire()
+        self._overall.acquire()
+
+    def release(self, key: str):
+        """
+        Give up a slot taken for signing with *key*.
+        """
+        self._overall.release()
+        self._per_key[key].release()
+
+
 class Signer(object):
     """
     A wrapper around the Sigul client to facilitate signing of unsigned rpms.
+
+    Tags are grouped by the Sigul key with which they are signed.  Each RPM
+    is signed only once per group even when several of its tags want it.
+    The groups are signed concurrently by a pool of no more than
+    `signing_concurrency` Sigul processes, with each group's RPMs divided
+    among up to `signing_key_concurrency` of those.  Signers given the same
+    :class:`SigningSlots` share these bounds.
+
+    Each Sigul process is given its RPMs a chunk at a time.  The signed
+    copies of one chunk are written to Koji while the next chunk is being
+    signed.
+
+    When given a :class:`SignedIndex`, the signed RPMs of a tag are sought
+    there rather than by listing the tag in full, and the index is updated
+    with the tag events and signing results of the work cycle.
+
+    When the Koji volume is mounted at `koji_dir` of the `[klean]` section,
+    the signatures of the changed builds' RPMs are read from it directly by
+    a pool of `signature_check_workers` threads.  The Koji Hub is consulted
+    only for the RPMs whose files are missing.
     """
 
     def __init__(
             self,
             changes: iter,
             config: Configuration,
+            build_cache: BuildCache = None,
+            chunk_sizer: ChunkSizer = None,
+            signed_index: SignedIndex = None,
+            on_signed=None,
+            signing_slots: SigningSlots = None,
     ):
         """
         Initialize the Signer object.
+
+        :param build_cache:
+            An optional cache of the RPMs that resulted from each build.
+
+        :param chunk_sizer:
+            An optional :class:`ChunkSizer` having experience from prior
+            work cycles.
+
+        :param signed_index:
+            An optional index of the RPMs signed within each tag.
+
+        :param on_signed:
+            An optional callable that is given a list of tags as soon as
+            all of those tags' RPMs are signed, which may be well before
+            the others' are.  It may be called from any thread.
+
+        :param signing_slots:
+            An optional :class:`SigningSlots` shared with other Signers
+            running at once.
         """
         self.changes = changes
         self.config = config
-        self._tag = None
-        self._builds = None
+        self.build_cache = build_cache
+        self.chunk_sizer = chunk_sizer or ChunkSizer.from_config(config)
+        self.signed_index = signed_index
+        self.on_signed = on_signed
+        self.signing_slots = signing_slots or SigningSlots.from_config(config)
+        self._koji_dir = config.klean_koji_dir
+        self._check_workers = config.smashd_signature_check_workers
+        if self._koji_dir is None or not os.path.isdir(
+                os.path.join(self._koji_dir, 'packages')):
+            self._check_workers = 0
+        self._rpm_builds = {}
+        self._build_rpms = {}
+        self._signed_rpms = {}
         self.run()
 
     def __repr__(self) -> str:
@@ -62,40 +339,36 @@ class Signer(object):
     def __str__(self) -> str:
         return f'Signer'
 
-    @property
-    def _koji_key(self) -> str:
+    def _koji_key(self, tag: str) -> str:
         """
         :return:
-            The GPG key ID of the Koji key associated with the tag currently
-            being processed.
+            The GPG key ID of the Koji key associated with *tag*.
         """
         # Koji has strict input requirement that the key ID is lowercase.
-        return self.config.get_repo(self._tag)[GPG_KEY_ID].lower()
+        return self.config.get_repo(tag)[GPG_KEY_ID].lower()
 
-    @property
-    def _sigul_key(self) -> str:
+    def _sigul_key(self, tag: str) -> str:
         """
         :return:
-            The name of the Sigul key associated with the tag currently being
-            processed.
+            The name of the Sigul key associated with *tag*.
         """
-        return self.config.get_repo(self._tag)[SIGUL_KEY_NAME]
+        return self.config.get_repo(tag)[SIGUL_KEY_NAME]
 
-    @property
-    def _sigul_passphrase(self) -> str:
+    def _sigul_passphrase(self, tag: str) -> str:
         """
         :return:
-            The passphrase for Sigul key associated with the tag currently
-            being processed.  This must be the passphrase that the user
-            "repomgr" would use to access this key.
+            The passphrase for Sigul key associated with *tag*.  This must be
+            the passphrase that the user "repomgr" would use to access this
+            key.
         """
-        return self.config.get_repo(self._tag)[SIGUL_KEY_PASS]
+        return self.config.get_repo(tag)[SIGUL_KEY_PASS]
 
-    def _get_unsigned_rpms(self) -> list:
+    def _get_unsigned_rpms(self, tag: str, builds: iter) -> set:
         """
         :return:
-            A list of str, each being one RPM that resulted from the Koji
-            build task(s) which is not yet signed.  Remember that:
+            A set of str, each being one RPM that resulted from the Koji
+            build task(s) of *builds* which is not yet signed for *tag*.
+            Remember that:
 
             - each Koji build for NEVR results in one NEVR.src.rpm and one or
             more NEVR.ARCH.rpm.
@@ -103,50 +376,390 @@ class Signer(object):
             - RPMs may already be signed (and excluded in the returned value)
             because the triggering event may be a move-tag rather than a build
             proper.
+
+            Such RPMs found in the signed index or on the Koji volume are
+            noted in the index as being within *tag* as well.
         """
         built_rpms = set()
-        for build in self._builds:
-            _log.debug(f'getting RPMs for build {build!r}')
-            built_rpms.update(KojiBuildInfo(build).rpms)
+        for build in builds:
+            built_rpms.update(self._build_rpms.get(build, set()))
         _log.debug(f'found built RPMs: {built_rpms!r}')
-        signed_rpms = KojiListSigned(tag=self._tag).rpms
+        if tag in self._signed_rpms:
+            signed_rpms = self._signed_rpms[tag]
+        else:
+            key = self._koji_key(tag)
+            signed_rpms = self.signed_index.signed(key, built_rpms)
+            # The index presumes the rest unsigned, but the volume may know
+            # better, e.g., of RPMs signed by other means.
+            signed_rpms |= self._check_locally(
+                key, built_rpms - signed_rpms
+            )[0]
+            self.signed_index.add(tag, key, signed_rpms)
         _log.debug(f'found signed RPMs: {signed_rpms!r}')
         unsigned_rpms = built_rpms - signed_rpms
         _log.debug(f'giving unsigned RPMs: {unsigned_rpms!r}')
-        return list(unsigned_rpms)
+        return unsigned_rpms
 
-    def _sign_builds(self):
-        unsigned_rpms = self._get_unsigned_rpms()
-        if not unsigned_rpms:
-            _log.info(f'no builds for tag {self._tag!r}s need signing')
-            return
-        _log.info(f'signing builds {unsigned_rpms!r} for tag {self._tag!r}')
+    def _signed_locally(self, key: str, rpm: str):
+        """
+        :return:
+            True if the Koji volume holds a copy of *rpm* signed with *key*,
+            False if it holds *rpm* but no such copy or None if it cannot
+            tell.
+        """
+        original, signed_copy, _ = koji_rpm_paths(
+            self._koji_dir, self._rpm_builds[rpm], rpm, key,
+        )
+        # Only the written signed copy counts.  A signature in the sigcache,
+        # or one carried by the original itself, doesn't yet put a signed
+        # copy where a dist-repo looks for it; that takes write-signed-rpm.
+        try:
+            if os.path.exists(signed_copy):
+                return key in signature_key_ids(signed_copy)
+            if not os.path.exists(original):
+                return None
+        except FileNotFoundError:
+            return None
+        except RpmHeaderError as e:
+            _log.warning(f'cannot read signatures of {rpm!r}: {e}')
+            return None
+        return False
+
+    def _check_locally(self, key: str, rpms: set) -> tuple:
+        """
+        :return:
+            A tuple of two sets of str:  those of *rpms* that the Koji volume
+            shows as signed with *key* and those whose signing it cannot
+            tell.  Without access to the volume, the latter holds all.
+        """
+        rpms = sorted(rpm for rpm in rpms if rpm in self._rpm_builds)
+        if not self._check_workers or not rpms:
+            return set(), set(rpms)
+        with ThreadPoolExecutor(
+                max_workers=min(self._check_workers, len(rpms)),
+                thread_name_prefix='SignatureCheck',
+        ) as pool:
+            verdicts = list(pool.map(
+                lambda rpm: self._signed_locally(key, rpm), rpms
+            ))
+        signed = {rpm for rpm, v in zip(rpms, verdicts) if v}
+        unknown = {rpm for rpm, v in zip(rpms, verdicts) if v is None}
+        _log.debug(
+            f'{len(signed):,d} of {len(rpms):,d} RPMs signed with key '
+            f'{key!r} per the Koji volume; {len(unknown):,d} undetermined'
+        )
+        return signed, unknown
+
+    def _group(self) -> list:
+        """
+        :return:
+            A list of :class:`_KeyGroup`, one for each key that is needed to
+            sign the unsigned RPMs of the changed tags.
+        """
+        groups = {}
+        for tag, change in self.changes.items():
+            builds = change[TAG_IN][BUILD]
+            if not builds:
+                continue
+            unsigned_rpms = self._get_unsigned_rpms(tag, builds)
+            if not unsigned_rpms:
+                _log.info(f'no builds for tag {tag!r} need signing')
+                continue
+            # The Koji key is part of the identity lest a Sigul key name be
+            # reused with differing key IDs.
+            identity = (self._sigul_key(tag), self._koji_key(tag))
+            if identity not in groups:
+                groups[identity] = _KeyGroup(
+                    self._sigul_key(tag),
+                    self._sigul_passphrase(tag),
+                    self._koji_key(tag),
+                )
+            group = groups[identity]
+            group.tags.append(tag)
+            group.rpms_by_tag[tag] = unsigned_rpms
+            group.rpms.update(unsigned_rpms)
+        return list(groups.values())
+
+    def _sign_chunk(self, group: _KeyGroup, rpms: list) -> bool:
+        """
+        :return:
+            True if Sigul succeeded in signing all of *rpms*.
+        """
+        _log.info(f'signing RPMs {rpms!r} with {group}')
         args = [SIGUL, '--batch', 'sign-rpms', '--store-in-koji', '--koji-only',
-                self._sigul_key] + unsigned_rpms
+                group.sigul_key] + rpms
         _log.debug(f'about to call {args!r}')
-        sigul = Popen(args, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
-        out, err = sigul.communicate(
-            input=f'{self._sigul_passphrase}\0'.encode()
+        self.signing_slots.acquire(group.sigul_key)
+        try:
+            start = monotonic()
+            sigul = Popen(args, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+            out, err = sigul.communicate(
+                input=f'{group.sigul_passphrase}\0'.encode()
+            )
+            returncode = sigul.wait()
+            seconds = monotonic() - start
+        finally:
+            self.signing_slots.release(group.sigul_key)
+        METRICS.observe_command(
+            'sigul', 'sign-rpms', seconds, str(returncode), len(out),
         )
-        returncode = sigul.wait()
         if returncode:
             _log.error(
                 f'sigul returned {returncode!r} and output:\n{out.decode()}'
             )
-        else:
-            for line in out.decode().splitlines():
-                _log.debug(f'sigul: {line}')
-        # It's probably harmless to continue even if Sigul failed.
+            return False
+        for line in out.decode().splitlines():
+            _log.debug(f'sigul: {line}')
+        self.chunk_sizer.observe(len(rpms), seconds)
+        return True
+
+    def _sign_with_retries(self, group: _KeyGroup, rpms: list,
+                           retries: int) -> list:
+        """
+        Sign *rpms*, retrying each half separately upon failure so that a
+        problem with any one RPM cannot spoil the signing of the others.
+
+        :return:
+            A (signed, unsigned) tuple where signed is a list of lists of
+            str, each being RPMs that were signed, and unsigned is a list of
+            str, each being an RPM that could not be.
+        """
+        if self._sign_chunk(group, rpms):
+            return [rpms], []
+        if not retries:
+            _log.error(f'gave up signing RPMs {rpms!r} with {group}')
+            return [], rpms
+        _log.warning(
+            f'retrying the signing of {len(rpms)} RPMs with {group}; '
+            f'{retries} retries remain'
+        )
+        half = (len(rpms) + 1) // 2
+        signed, unsigned = [], []
+        for part in (rpms[:half], rpms[half:]):
+            if part:
+                part_signed, part_unsigned = self._sign_with_retries(
+                    group, part, retries - 1
+                )
+                signed += part_signed
+                unsigned += part_unsigned
+        return signed, unsigned
+
+    @staticmethod
+    def _write_signed_rpms(group: _KeyGroup, rpms: list) -> KojiWriteSignedRpm:
         _log.info(
-            f'writing RPMs for builds {self._builds!r} '
-            f'signed with key {self._koji_key!r}'
+            f'writing {len(rpms)} RPMs signed with key {group.koji_key!r}'
+        )
+        return KojiWriteSignedRpm(
+            group.koji_key,
+            [rpm[:-len('.rpm')] if rpm.endswith('.rpm') else rpm
+             for rpm in rpms],
+            defer=True,
+        )
+
+    def _index_signed(self, group: _KeyGroup, rpms: list):
+        """
+        Note in the signed index that *rpms* are now signed with the key of
+        *group* within each of its tags that wanted them.
+        """
+        if self.signed_index is None:
+            return
+        rpms = set(rpms)
+        for tag, tag_rpms in group.rpms_by_tag.items():
+            self.signed_index.add(tag, group.koji_key, tag_rpms & rpms)
+
+    def _sign_slice(self, group: _KeyGroup, rpms: list):
+        """
+        Sign *rpms* chunk by chunk, writing the signed copies of each chunk
+        to Koji while the next is being signed.
+
+        :raise KojiCommandError:
+            If any signed copies could not be written despite retrying.
+
+        :raise SigningError:
+            If any RPMs could not be signed despite retrying, but only once
+            those that were signed have been written.
+        """
+        engine = default_engine()
+        retries = self.config.smashd_signing_retries
+        writes, unsigned = [], []
+        for chunk in self.chunk_sizer.chunks(rpms):
+            chunk_signed, chunk_unsigned = self._sign_with_retries(
+                group, chunk, retries
+            )
+            unsigned += chunk_unsigned
+            for signed in chunk_signed:
+                writes.append((
+                    signed,
+                    engine.submit(self._write_signed_rpms(group, signed)),
+                ))
+        # Only the writes that fail are repeated, not the signing.
+        failure = None
+        for signed, future in writes:
+            for attempt in range(retries + 1):
+                try:
+                    future.result()
+                except KojiCommandError as e:
+                    if attempt == retries:
+                        _log.error(
+                            f'gave up writing RPMs {signed!r} signed with '
+                            f'key {group.koji_key!r}: {e}'
+                        )
+                        failure = e
+                    else:
+                        _log.warning(f'retrying write of signed RPMs: {e}')
+                        future = engine.submit(
+                            self._write_signed_rpms(group, signed)
+                        )
+                else:
+                    # Only once written are they signed as far as a
+                    # dist-repo is concerned.
+                    self._index_signed(group, signed)
+                    break
+        if failure is not None:
+            # The tags wanting these RPMs mustn't be composed without them.
+            raise failure
+        if unsigned:
+            raise SigningError(
+                f'cannot sign {len(unsigned)} RPMs with {group}'
+            )
+
+    def _signed(self, tags: list):
+        if self.on_signed is not None and tags:
+            self.on_signed(tags)
+
+    def _sign(self, groups: list):
+        """
+        Sign the RPMs of every group concurrently.
+        """
+        per_key = self.config.smashd_signing_key_concurrency
+        slices = [
+            (group, rpms) for group in groups for rpms in group.slices(per_key)
+        ]
+        workers = min(self.config.smashd_signing_concurrency, len(slices))
+        if not workers:
+            return
+        remaining = {}
+        for group, rpms in slices:
+            remaining[id(group)] = remaining.get(id(group), 0) + 1
+        with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='Signer',
+        ) as pool:
+            futures = {
+                pool.submit(self._sign_slice, group, rpms): group
+                for group, rpms in slices
+            }
+            for future in as_completed(futures):
+                future.result()
+                group = futures[future]
+                remaining[id(group)] -= 1
+                if not remaining[id(group)]:
+                    self._signed(group.tags)
+        _log.debug(f'next signing in {self.chunk_sizer}')
+
+    def _query(self):
+        """
+        Fan out all of the queries needed to determine the unsigned RPMs
+        of every tag at once, as none depends on another.
+
+        Tags are listed in full only if there is no signed index or it has
+        yet to learn of them.
+        """
+        engine = default_engine()
+        builds, tags = set(), []
+        for tag, change in self.changes.items():
+            if change[TAG_IN][BUILD]:
+                builds.update(change[TAG_IN][BUILD])
+                tags.append(tag)
+            if self.signed_index is not None:
+                builds.update(change[TAG_OUT][BUILD])
+        listed = [
+            tag for tag in tags
+            if self.signed_index is None
+            or not self.signed_index.is_known(tag, self._koji_key(tag))
+        ]
+        # Lacking an index, a tag need only be listed if the Koji volume
+        # cannot tell about its RPMs, which can't be known until they are.
+        deferred = self.signed_index is None and self._check_workers
+        since = time()
+        listings = [
+            KojiListSigned(tag=tag, defer=True)
+            for tag in ([] if deferred else listed)
+        ]
+        futures = list(map(engine.submit, listings))
+        _log.debug(f'getting RPMs for builds {builds!r}')
+        self._build_rpms = query_build_rpms(
+            builds,
+            self.config.smashd_buildinfo_batch_size,
+            self.build_cache,
+            engine,
         )
-        KojiWriteSignedRpm(self._koji_key, self._builds)
+        self._rpm_builds = {
+            rpm: nvr for nvr, rpms in self._build_rpms.items() for rpm in rpms
+        }
+        if self.build_cache is not None:
+            _log.info(f'{self.build_cache}')
+        if deferred:
+            listed = self._list_locally(listed)
+            listings = [KojiListSigned(tag=tag, defer=True) for tag in listed]
+            futures = list(map(engine.submit, listings))
+        for tag, future in zip(listed, futures):
+            key = self._koji_key(tag)
+            try:
+                listing = future.result()
+            except KojiCommandError:
+                # Presuming everything unsigned would have it all signed
+                # anew, so the work cycle is abandoned to be retried and the
+                # index is left as is.
+                _log.error(f'cannot list the signed RPMs of tag {tag!r}')
+                raise
+            signed_rpms = listing.rpms_by_key.get(key, set())
+            self._signed_rpms[tag] = signed_rpms
+            if self.signed_index is not None:
+                self.signed_index.replace(tag, key, signed_rpms, since)
+
+    def _list_locally(self, tags: list) -> list:
+        """
+        Determine the signed RPMs of the builds tagged into each of *tags*
+        from the Koji volume.
+
+        :return:
+            A list of those *tags* for which the Koji volume could not tell
+            and which must therefore be listed by the Koji Hub.
+        """
+        unlisted = []
+        for tag in tags:
+            built_rpms = set()
+            for build in self.changes[tag][TAG_IN][BUILD]:
+                built_rpms.update(self._build_rpms.get(build, set()))
+            signed, unknown = self._check_locally(
+                self._koji_key(tag), built_rpms
+            )
+            if unknown:
+                unlisted.append(tag)
+            else:
+                self._signed_rpms[tag] = signed
+        return unlisted
+
+    def _discard_untagged(self):
+        """
+        Forget the RPMs of builds untagged from each tag, which are no
+        longer within it.
+        """
+        if self.signed_index is None:
+            return
+        for tag, change in self.changes.items():
+            for build in change[TAG_OUT][BUILD]:
+                self.signed_index.discard(
+                    tag, self._build_rpms.get(build, set())
+                )
 
     def run(self):
         _log.info(f'signing due to {self.changes}')
-        for self._tag, change in self.changes.items():
-            self._builds = list(change[TAG_IN][BUILD])
-            if self._builds:
-                self._sign_builds()
+        self._query()
+        self._discard_untagged()
+        groups = self._group()
+        # Tags with nothing to sign needn't wait upon those with something.
+        grouped = {tag for group in groups for tag in group.tags}
+        self._signed(sorted(set(self.changes) - grouped))
+        self._sign(groups)
         _log.info('signing completed')
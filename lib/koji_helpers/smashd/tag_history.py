@@ -18,81 +18,334 @@
 # You should have received a copy of the GNU General Public License along with
 # koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
 
-import re
-from logging import getLogger
+import sys
+from logging import DEBUG, getLogger
 
-from koji_helpers.koji import KojiListHistory
+from koji_helpers.engine import default_engine
+from koji_helpers.koji import KojiCommand, KojiListHistories, KojiListHistory
 
 __author__ = """John Florian <jflorian@doubledog.org>"""
 __copyright__ = """2016-2019 John Florian"""
 
 # keys
 BUILD = 'build'
-DIRECTION = 'direction'
 TAG_IN = 'in'
 TAG_OUT = 'out'
-TAG = 'tag'
-TIME = 'time'
 USER = 'user'
 
-# pre-compiled regex
-TAGGED_RE = re.compile(
-    fr'^(?P<{TIME}>.*\d{{4}}) (?P<{BUILD}>\S+) (?P<{DIRECTION}>'
-    fr'tagged into|untagged from) (?P<{TAG}>\S+) by (?P<{USER}>\S+).*$'
-)
+# Koji's phrasing of the only history events of interest, which take the form
+# "TIME BUILD tagged into TAG by USER ..." or likewise "untagged from".
+TAGGED_INTO = ' tagged into '
+UNTAGGED_FROM = ' untagged from '
 
 _log = getLogger(__name__)
 
 
+class TagEvent(object):
+    """
+    One tagging or untagging of a build as reported by the tag history.
+
+    Many events name the same tags, builds and users, so those strings are
+    interned to be shared rather than repeated.
+    """
+
+    __slots__ = ('time', 'build', 'tagged', 'tag', 'user')
+
+    def __init__(self, time: str, build: str, tagged: bool, tag: str,
+                 user: str):
+        """
+        Initialize the TagEvent object.
+
+        :param tagged:
+            True if *build* was tagged into *tag* or False if it was
+            untagged from it.
+        """
+        self.time = time
+        self.build = build
+        self.tagged = tagged
+        self.tag = tag
+        self.user = user
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'time={self.time!r}, '
+                f'build={self.build!r}, '
+                f'tagged={self.tagged!r}, '
+                f'tag={self.tag!r}, '
+                f'user={self.user!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'build {self.build!r} '
+                f'{"tagged into" if self.tagged else "untagged from"} '
+                f'{self.tag!r} by {self.user!r} at {self.time!r}')
+
+
+def _split(line: str, intern=sys.intern):
+    """
+    :return:
+        A (time, build, tagged, tag, user) tuple of the tagging or untagging
+        reported by *line* or None if it reports neither.
+    """
+    # Plain substring searches reject the many irrelevant lines cheaply and,
+    # unlike a regex anchored by a greedy prefix, never backtrack.
+    i = line.find(TAGGED_INTO)
+    if i >= 0:
+        tagged, j = True, i + len(TAGGED_INTO)
+    else:
+        i = line.find(UNTAGGED_FROM)
+        if i < 0:
+            return None
+        tagged, j = False, i + len(UNTAGGED_FROM)
+    k = line.rfind(' ', 0, i)
+    # The time must end with the year.
+    if k < 4 or not line[k - 4:k].isdigit():
+        return None
+    rest = line[j:].split(None, 3)
+    if len(rest) < 3 or rest[1] != 'by':
+        return None
+    return (line[:k], intern(line[k + 1:i]), tagged, intern(rest[0]),
+            intern(rest[2]))
+
+
+def parse_tag_event(line: str):
+    """
+    :param line:
+        One line of `koji list-history` output.
+
+    :return:
+        The :class:`TagEvent` reported by *line* or None if it reports no
+        tagging or untagging.
+    """
+    fields = _split(line)
+    return None if fields is None else TagEvent(*fields)
+
+
+def parse_history(lines: iter) -> iter:
+    """
+    :param lines:
+        An iter of str, each being one line of `koji list-history` output.
+
+    :return:
+        An iter of :class:`TagEvent`, one per tagging or untagging found.
+    """
+    for line in lines:
+        event = parse_tag_event(line)
+        if event is not None:
+            yield event
+
+
+def tally_changes(lines: iter, exclude_tags: iter = ()) -> dict:
+    """
+    Parse and summarize the tag history in a single pass.
+
+    The history is summarized by its net effect:  a build is reported as
+    tagged in or out according to the last event involving it and the tag,
+    so, e.g., a build tagged in and later tagged out is only reported as
+    tagged out.  *lines* must therefore be in chronological order, at least
+    per tag.
+
+    :param lines:
+        An iter of str, each being one line of `koji list-history` output.
+
+    :param exclude_tags:
+        An iter of str naming tags that should be excluded.
+
+    :return:
+        See :attr:`KojiTagHistory.changed_tags`.
+    """
+    exclude = set(exclude_tags)
+    debug = _log.isEnabledFor(DEBUG)
+    latest, users = {}, {}
+    for line in lines:
+        fields = _split(line)
+        if fields is None:
+            continue
+        time, build, tagged, tag, user = fields
+        if tag in exclude:
+            continue
+        if debug:
+            _log.debug(f'tag history reports {TagEvent(*fields)}')
+        builds = latest.get(tag)
+        if builds is None:
+            builds = latest[tag] = {}
+            users[tag] = {TAG_IN: set(), TAG_OUT: set()}
+        builds[build] = tagged
+        users[tag][TAG_IN if tagged else TAG_OUT].add(user)
+    triggers = {}
+    for tag, builds in latest.items():
+        triggers[tag] = {
+            TAG_IN: {
+                BUILD: {build for build, tagged in builds.items() if tagged},
+                USER: users[tag][TAG_IN],
+            },
+            TAG_OUT: {
+                BUILD: {build for build, tagged in builds.items()
+                        if not tagged},
+                USER: users[tag][TAG_OUT],
+            },
+        }
+    return triggers
+
+
 class KojiTagHistory(object):
     """
     A trivial wrapper around "koji list-history" for the purposes of monitoring
     events that involve tag operations.
     """
 
-    def __init__(self, after: str, before: str, exclude_tags: list):
+    def __init__(
+            self,
+            after: str,
+            before: str,
+            exclude_tags: list,
+            after_event: int = None,
+            before_event: int = None,
+            tags: iter = None,
+            chunk_size: int = 0,
+            tag_after_events: dict = None,
+    ):
         """
         Initialize the KojiTagHistory object.
 
         :param after:
             Include only tag history events occurring after this timestamp,
-            expressed per RFC 3339 format.
+            expressed per RFC 3339 format, or None if unbounded.
 
         :param before:
             Include only tag history events occurring before this timestamp,
-            expressed per RFC 3339 format.
+            expressed per RFC 3339 format, or None if unbounded.
 
         :param exclude_tags:
             A list of str naming tags that should be excluded from the history.
+
+        :param after_event:
+            Include only tag history events after this Koji event ID.
+
+        :param before_event:
+            Include only tag history events before this Koji event ID.
+
+        :param tags:
+            An iter of str naming the only tags whose history is of
+            interest.  Each tag's history is queried separately so that the
+            activity of other tags costs nothing, but only from where it
+            isn't already known.  The queries are made concurrently, or in
+            a single round trip when the Koji backend allows.  If None, the
+            history of every tag is queried at once.
+
+        :param chunk_size:
+            When non-zero and both *after_event* and *before_event* are
+            given, a span of more than this many events (e.g., a backlog
+            accrued during downtime) is split into chunks of this many
+            events that are queried concurrently.
+
+        :param tag_after_events:
+            A dict whose keys are tags and whose values supersede *after*
+            and *after_event* for each, so that every tag's history may
+            begin at a different point.  Each value is taken as an *after*
+            timestamp if a str or otherwise as an *after_event*.  Only
+            effective with *tags*.
         """
         self.after = after
         self.before = before
         self.exclude_tags = exclude_tags
+        self.after_event = after_event
+        self.before_event = before_event
+        self.tags = None if tags is None else sorted(
+            set(tags) - set(exclude_tags)
+        )
+        self.chunk_size = chunk_size
+        self.tag_after_events = tag_after_events or {}
 
     def __repr__(self) -> str:
         return (f'{self.__module__}.{self.__class__.__name__}('
                 f'after={self.after!r}, '
                 f'before={self.before!r}, '
                 f'exclude_tags={self.exclude_tags!r}, '
+                f'after_event={self.after_event!r}, '
+                f'before_event={self.before_event!r}, '
+                f'tags={self.tags!r}, '
+                f'chunk_size={self.chunk_size!r}, '
+                f'tag_after_events={self.tag_after_events!r}, '
                 f')')
 
+    def __chunks(self, after_event: int) -> list:
+        """
+        :return:
+            A list of (after_event, before_event) tuples spanning the
+            history after *after_event* in chronological order.
+        """
+        if after_event is None or self.before_event is None:
+            return [(after_event, self.before_event)]
+        # Both bounds are exclusive.
+        span = self.before_event - after_event - 1
+        if not self.chunk_size or span <= self.chunk_size:
+            return [(after_event, self.before_event)]
+        chunks = [
+            (after, min(after + self.chunk_size + 1, self.before_event))
+            for after in range(after_event, self.before_event - 1,
+                               self.chunk_size)
+        ]
+        _log.info(f'catching up on {span:,d} events in {len(chunks):,d} chunks')
+        return chunks
+
     @property
-    def __koji_history(self):
-        return KojiListHistory(self.after, self.before).output.splitlines()
+    def __koji_history(self) -> iter:
+        if self.tags is None:
+            chunks = self.__chunks(self.after_event)
+            if len(chunks) == 1:
+                # Streamed so that a long history is never held in memory at
+                # once.
+                return KojiListHistory(
+                    self.after, self.before, self.after_event,
+                    self.before_event, stream=True,
+                ).lines()
+            return self.__fanned_out_history([(None, self.after, chunks)])
+        spans = []
+        for tag in self.tags:
+            if tag in self.tag_after_events:
+                after, after_event = None, self.tag_after_events[tag]
+                if isinstance(after_event, str):
+                    after, after_event = after_event, None
+            else:
+                after, after_event = self.after, self.after_event
+            known = (
+                after_event is not None and self.before_event is not None
+                and after_event + 1 >= self.before_event
+            )
+            if known:
+                # Nothing lies between the bounds, which are exclusive.
+                continue
+            spans.append((tag, after, self.__chunks(after_event)))
+        return self.__fanned_out_history(spans)
+
+    def __fanned_out_history(self, spans: list) -> iter:
+        # The queries are gathered in tag-then-chronological order, which
+        # keeps each tag's history in order as tally_changes() requires.
+        queries = [
+            KojiListHistory(
+                after, self.before, after_event, before_event,
+                tag=tag, defer=True,
+            )
+            for tag, after, chunks in spans
+            for after_event, before_event in chunks
+        ]
+        if KojiCommand.backend.multicall and 1 < len(queries) == len(spans):
+            # Each tag's recent history costs nothing more than a round
+            # trip, so one suffices for all.  Only a backlog split into
+            # chunks is better fetched concurrently.
+            queries = [KojiListHistories(queries, defer=True)]
+        for query in default_engine().gather(queries):
+            yield from query.lines()
 
     @property
-    def __parsed_history(self) -> list:
-        changes = []
-        for line in self.__koji_history:
-            m = TAGGED_RE.match(line)
-            if m:
-                m = m.groupdict()
-                _log.debug(
-                    f'tag {m[TAG]!r} affected by build {m[BUILD]!r} '
-                    f'by {m[DIRECTION]!r} request of {m[USER]!r} at {m[TIME]!r}'
-                )
-                changes.append(m)
-        return changes
+    def events(self) -> iter:
+        """
+        :return:
+            An iter of :class:`TagEvent`, one per tagging or untagging found
+            in the history, including those of excluded tags.
+        """
+        return parse_history(self.__koji_history)
 
     @property
     def changed_tags(self) -> dict:
@@ -110,18 +363,4 @@ class KojiTagHistory(object):
                         BUILD: set
                         USER: set
         """
-        triggers = {}
-        for change in self.__parsed_history:
-            assert isinstance(change, dict)
-            tag = change[TAG]
-            if tag in self.exclude_tags:
-                continue
-            if tag not in triggers:
-                triggers[tag] = {
-                    TAG_IN: {BUILD: set(), USER: set()},
-                    TAG_OUT: {BUILD: set(), USER: set()},
-                }
-            direction = TAG_IN if 'into' in change[DIRECTION] else TAG_OUT
-            triggers[tag][direction][BUILD].add(change[BUILD])
-            triggers[tag][direction][USER].add(change[USER])
-        return triggers
+        return tally_changes(self.__koji_history, self.exclude_tags)
@@ -0,0 +1,149 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+
+from logging import getLogger
+from time import monotonic, sleep
+
+from koji_helpers.engine import KojiEngine, default_engine
+from koji_helpers.koji import KojiCommandError, KojiTaskInfo, POLL_INTERVAL
+
+# The states, as given by KojiTaskInfo.state, of a task that has finished.
+CLOSED = 'closed'
+FINISHED_STATES = (CLOSED, 'canceled', 'failed')
+
+# Seconds between the first polls of a task.  This doubles after each poll
+# until reaching POLL_INTERVAL, so that quick tasks are noticed promptly
+# without pestering the Koji Hub about slow ones.
+FIRST_POLL_INTERVAL = 0.5
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+class TaskTracker(object):
+    """
+    Follows Koji tasks by ID until each has finished.
+
+    Unlike `koji watch-tasks`, which awaits every task of a channel or user,
+    only the tasks given to :meth:`track` are followed and each is reported
+    individually as soon as it finishes.  Nothing blocks but :meth:`wait`;
+    :meth:`poll` merely checks once upon every task still pending.
+
+    .. attribute:: states
+
+        A dict whose keys are the ID of each task tracked and whose values
+        are its state as last known.
+    """
+
+    def __init__(self, engine: KojiEngine = None):
+        """
+        Initialize the TaskTracker object.
+
+        :param engine:
+            The :class:`koji_helpers.engine.KojiEngine` by which the tasks
+            are queried.  Defaults to the shared one.
+        """
+        self.engine = engine or default_engine()
+        self.states = {}
+        self._labels = {}
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'engine={self.engine!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'TaskTracker with {len(self.pending)} of '
+                f'{len(self.states)} tasks pending')
+
+    def track(self, task_id: str, label=None):
+        """
+        Begin following the task *task_id*.
+
+        :param label:
+            Anything by which the caller would know the task, e.g., the tag
+            it was created for.  Defaults to *task_id*.
+        """
+        self.states[task_id] = 'unknown'
+        self._labels[task_id] = task_id if label is None else label
+
+    @property
+    def pending(self) -> list:
+        """
+        :return:
+            A list of the IDs of the tasks not yet known to have finished.
+        """
+        return [
+            task_id for task_id, state in self.states.items()
+            if state not in FINISHED_STATES
+        ]
+
+    def poll(self) -> list:
+        """
+        Query the state of every pending task at once.
+
+        :return:
+            A list of (label, task ID, state) for each task that was found
+            to have finished.
+        """
+        pending = self.pending
+        futures = [
+            self.engine.submit(KojiTaskInfo(task_id, defer=True))
+            for task_id in pending
+        ]
+        finished = []
+        for task_id, future in zip(pending, futures):
+            try:
+                state = future.result().state
+            except KojiCommandError as e:
+                _log.warning(f'cannot query task {task_id}: {e}')
+                continue
+            self.states[task_id] = state
+            if state in FINISHED_STATES:
+                finished.append((self._labels[task_id], task_id, state))
+        return finished
+
+    def wait(self, timeout: float = None) -> iter:
+        """
+        Poll until every task has finished.
+
+        :param timeout:
+            The maximum number of seconds to wait or None if unbounded.
+
+        :return:
+            A generator yielding (label, task ID, state) for each task as
+            soon as it is found to have finished.  Tasks still pending once
+            *timeout* passes are yielded with their last known state.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        interval = FIRST_POLL_INTERVAL
+        while self.pending:
+            yield from self.poll()
+            if not self.pending:
+                break
+            if deadline is not None and monotonic() + interval > deadline:
+                for task_id in self.pending:
+                    _log.warning(f'gave up awaiting task {task_id}')
+                    yield self._labels[task_id], task_id, self.states[task_id]
+                break
+            sleep(interval)
+            interval = min(interval * 2, POLL_INTERVAL)
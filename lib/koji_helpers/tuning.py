@@ -0,0 +1,302 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Strategies for tuning the quiescent-period and check-interval of smashd and
+gojira.
+
+Each is a :class:`Tuner` that is told of the changes seen, the work cycles
+run and the time taken by each poll, and from these suggests how long the
+activity must quiesce before a work cycle begins.  The check-interval is
+always one quarter of the quiescent-period and both are bounded by the
+*min_interval* and *max_interval* given.  All times are in seconds and any
+clock may be used, so long as it is used consistently; this allows the
+tuners to be compared offline by `bench/tuning_simulator.py`.
+"""
+from bisect import bisect_left, insort
+from collections import deque
+from logging import getLogger
+
+from koji_helpers.config import ConfigurationError
+
+# The weight given to each new observation by the exponentially weighted
+# moving averages.
+SMOOTHING = 0.3
+
+# The number of typical gaps between changes that must pass without one for
+# a burst of them to be presumed over.
+GAP_MULTIPLE = 2
+
+# The number of gaps between changes remembered by BurstEndTuner.
+GAP_HISTORY = 200
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+def _ewma(average, value: float) -> float:
+    return value if average is None else average + SMOOTHING * (value - average)
+
+
+class Tuner(object):
+    """
+    The base of all tuning strategies, which are distinguished by how
+    :meth:`_suggest` sets the quiescent-period.
+
+    With a non-zero *hub_load_target*, any strategy also stretches the
+    check-interval in proportion to how much the moving average of the
+    poll latency exceeds that many seconds, so that a struggling Koji Hub
+    is polled less often.
+
+    .. attribute:: period
+
+        The quiescent-period, in seconds.
+
+
+    .. attribute:: check_interval
+
+        The check-interval, in seconds.
+    """
+
+    # The name by which the strategy is configured.
+    name = None
+
+    def __init__(
+            self,
+            min_interval: float,
+            max_interval: float = None,
+            hub_load_target: float = 0,
+    ):
+        """
+        Initialize the Tuner object.
+
+        :param min_interval:
+            The least that either the period or interval may be.
+
+        :param max_interval:
+            The most that either the period or interval may be or None if
+            unbounded.
+
+        :param hub_load_target:
+            The poll latency beyond which the check-interval is stretched
+            or 0 to disregard the poll latency.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hub_load_target = hub_load_target
+        self.period = min_interval
+        self.check_interval = min_interval
+        self.last_change = None
+        self.change_gap = None
+        self.cycle_seconds = None
+        self.last_cycle_seconds = None
+        self.poll_seconds = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'min_interval={self.min_interval!r}, '
+                f'max_interval={self.max_interval!r}, '
+                f'hub_load_target={self.hub_load_target!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return (f'{self.name} check-interval/quiescent-period of '
+                f'{self.check_interval:0,.1f}/{self.period:0,.1f} seconds')
+
+    def observe_change(self, when: float):
+        """
+        Note that new changes were seen by a poll at *when*.
+        """
+        if self.last_change is not None:
+            self._observe_gap(when - self.last_change)
+        self.last_change = when
+
+    def _observe_gap(self, seconds: float):
+        self.change_gap = _ewma(self.change_gap, seconds)
+
+    def observe_cycle(self, seconds: float):
+        """
+        Note that a work cycle took *seconds*.
+        """
+        self.last_cycle_seconds = seconds
+        self.cycle_seconds = _ewma(self.cycle_seconds, seconds)
+
+    def observe_poll(self, seconds: float):
+        """
+        Note that querying for changes took *seconds*.
+        """
+        self.poll_seconds = _ewma(self.poll_seconds, seconds)
+
+    def _suggest(self):
+        """
+        :return:
+            The quiescent-period suggested by what has been observed, before
+            being bounded, or None to keep the present one.
+        """
+        raise NotImplementedError
+
+    def _bound(self, seconds: float) -> float:
+        seconds = max(seconds, self.min_interval)
+        if self.max_interval is not None:
+            seconds = min(seconds, self.max_interval)
+        return seconds
+
+    def adjust(self) -> bool:
+        """
+        Adjust the quiescent-period and check-interval per all that has
+        been observed.
+
+        :return:
+            True if either was changed.
+        """
+        suggestion = self._suggest()
+        period = self.period if suggestion is None else self._bound(suggestion)
+        interval = period / 4
+        if self.hub_load_target > 0 and self.poll_seconds is not None:
+            interval *= max(1, self.poll_seconds / self.hub_load_target)
+        interval = self._bound(interval)
+        changed = (period, interval) != (self.period, self.check_interval)
+        self.period, self.check_interval = period, interval
+        return changed
+
+
+class HalfCycleTuner(Tuner):
+    """
+    Sets the quiescent-period to half the length of the last work cycle.
+
+    Statistically, that leaves the probability of delaying this or the
+    next cycle equal.  Without any quiescence period, a straggling event
+    would have to wait unduly long for present events to be processed.
+    A quiescence period that is the full length of the last work cycle
+    could mean that present events wait unduly long for a straggler that
+    may not be coming.
+    """
+
+    name = 'half-cycle'
+
+    def _suggest(self):
+        if self.last_cycle_seconds is None:
+            return None
+        return self.last_cycle_seconds / 2
+
+
+class EwmaTuner(Tuner):
+    """
+    Sets the quiescent-period to `GAP_MULTIPLE` times the moving average of
+    the gaps between changes, so that a burst is presumed over once it has
+    been silent for longer than its usual cadence.  As with
+    :class:`HalfCycleTuner`, the period never exceeds half of the moving
+    average of the work cycles, beyond which waiting for stragglers costs
+    more than it saves.
+    """
+
+    name = 'ewma'
+
+    def _suggest(self):
+        suggestions = []
+        if self.change_gap is not None:
+            suggestions.append(GAP_MULTIPLE * self.change_gap)
+        if self.cycle_seconds is not None:
+            suggestions.append(self.cycle_seconds / 2)
+        return min(suggestions) if suggestions else None
+
+
+class BurstEndTuner(Tuner):
+    """
+    Sets the quiescent-period to the silence after which a burst of changes
+    has ended with probability *confidence*.
+
+    The probability is estimated from the last `GAP_HISTORY` gaps between
+    changes.  Gaps longer than *max_interval* are regarded as falling
+    between bursts rather than within one and are disregarded, so the
+    period is the *confidence* quantile of the gaps within bursts.
+    """
+
+    name = 'burst-end'
+
+    def __init__(self, *args, confidence: float = 0.9, **kwargs):
+        """
+        Initialize the BurstEndTuner object.
+
+        :param confidence:
+            The probability that a burst has ended that must be reached
+            before a work cycle begins.
+
+        The remaining parameters are as for :class:`Tuner`.
+        """
+        super().__init__(*args, **kwargs)
+        self.confidence = confidence
+        self._gaps = deque()
+        self._sorted = []
+
+    def _observe_gap(self, seconds: float):
+        super()._observe_gap(seconds)
+        if self.max_interval is not None and seconds > self.max_interval:
+            return
+        self._gaps.append(seconds)
+        insort(self._sorted, seconds)
+        if len(self._gaps) > GAP_HISTORY:
+            del self._sorted[bisect_left(self._sorted, self._gaps.popleft())]
+
+    def burst_ended(self, silence: float) -> float:
+        """
+        :return:
+            The estimated probability that a burst has ended once no change
+            has been seen for *silence* seconds.
+        """
+        if not self._sorted:
+            return 1.0
+        return bisect_left(self._sorted, silence) / len(self._sorted)
+
+    def _suggest(self):
+        if not self._sorted:
+            return None
+        i = min(int(self.confidence * len(self._sorted)),
+                len(self._sorted) - 1)
+        return self._sorted[i]
+
+
+STRATEGIES = {
+    tuner.name: tuner for tuner in (HalfCycleTuner, EwmaTuner, BurstEndTuner)
+}
+
+
+def make_tuner(strategy: str, *args, **kwargs) -> Tuner:
+    """
+    :param strategy:
+        The name of a tuning strategy in `STRATEGIES`.
+
+    The remaining parameters are as for :class:`Tuner`.
+
+    :return:
+        A new :class:`Tuner` of that strategy.
+
+    :raise ConfigurationError:
+        If *strategy* is unknown.
+    """
+    try:
+        cls = STRATEGIES[strategy]
+    except KeyError:
+        raise ConfigurationError(
+            'bad configuration: unsupported tuning strategy {!r}; '
+            'choose from {}'.format(strategy, ', '.join(sorted(STRATEGIES)))
+        ) from None
+    return cls(*args, **kwargs)
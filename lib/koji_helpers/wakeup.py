@@ -0,0 +1,307 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Sources of wakeups for the daemons, so that they needn't poll frequently to
+notice work promptly.
+
+A wakeup source is named by a spec of the form `KIND:PATH`:
+
+    unix:PATH
+        A Unix datagram socket bound at PATH.  Any datagram sent to it,
+        e.g., by `socat - UNIX-SENDTO:PATH` or by :func:`trigger`, is a
+        wakeup.
+
+    fifo:PATH
+        A named pipe at PATH, created if absent.  Anything written to it,
+        e.g., by `echo > PATH`, is a wakeup.
+
+Whatever is sent, e.g., the name of the tag that changed, is merely logged.
+An empty spec gives a :class:`Waker` that is woken only from within the
+daemon itself, e.g., by the completion of its work.
+"""
+import os
+import socket
+import stat
+from logging import getLogger
+from threading import Condition, Event, Thread
+
+from koji_helpers.config import ConfigurationError
+
+# Seconds added to a quiescence deadline before resting until it, lest the
+# quiescence be checked a moment too soon.
+DEADLINE_SLACK = 0.1
+
+# The most bytes of any one wakeup message that are read.
+MESSAGE_SIZE = 4096
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+_log = getLogger(__name__)
+
+
+class Waker(object):
+    """
+    Something to rest upon until woken or until a timeout passes.
+
+    Every wakeup increments the :attr:`generation`, which the resting
+    caller passes to :meth:`wait` so that a wakeup arriving while it was
+    busy is not lost.  All callers resting at once are woken together.
+
+    .. attribute:: event_driven
+
+        True if the waker is woken by events from outside the daemon, such
+        that frequent polling is unnecessary.
+    """
+
+    event_driven = False
+
+    def __init__(self):
+        """
+        Initialize the Waker object.
+        """
+        self.generation = 0
+        self._condition = Condition()
+        self._stopped = Event()
+
+    def __repr__(self) -> str:
+        return f'{self.__module__}.{self.__class__.__name__}()'
+
+    def __str__(self) -> str:
+        return 'Waker'
+
+    def wake(self, message: str = None):
+        """
+        Wake all that rest upon this waker.
+
+        :param message:
+            What woke it, which is logged.
+        """
+        if message:
+            _log.debug(f'{self} woken by {message!r}')
+        with self._condition:
+            self.generation += 1
+            self._condition.notify_all()
+
+    def wait(self, since: int, timeout: float = None) -> int:
+        """
+        Rest until woken or for *timeout* seconds, whichever is sooner.
+
+        :param since:
+            The :attr:`generation` as of when the caller last rested.  If
+            it has since changed, there is no rest at all.
+
+        :return:
+            The :attr:`generation` upon waking.  It differs from *since* if
+            and only if the rest was cut short by a wakeup.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.generation != since, timeout,
+            )
+            return self.generation
+
+    def start(self):
+        """
+        Begin listening for wakeups from outside the daemon, if any.
+        """
+        pass
+
+    def close(self):
+        """
+        Stop listening for wakeups from outside the daemon, if any.
+        """
+        self._stopped.set()
+
+    def _listen(self, receive):
+        Thread(
+            target=self.__listen, args=(receive,), name=str(self),
+            daemon=True,
+        ).start()
+
+    def __listen(self, receive):
+        while not self._stopped.is_set():
+            try:
+                message = receive()
+            except OSError as e:
+                if not self._stopped.is_set():
+                    _log.error(f'{self} cannot receive wakeups: {e}')
+                return
+            if not self._stopped.is_set():
+                self.wake(message.decode(errors='replace').strip())
+
+
+class UnixSocketWaker(Waker):
+    """
+    A :class:`Waker` that is woken by any datagram sent to a Unix socket.
+    """
+
+    event_driven = True
+
+    def __init__(self, path: str):
+        """
+        Initialize the UnixSocketWaker object.
+
+        :param path:
+            The file system path at which the socket is bound.  A stale
+            socket left there is replaced.
+        """
+        super().__init__()
+        self.path = path
+        self._socket = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'path={self.path!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'Waker at unix:{self.path}'
+
+    def start(self):
+        try:
+            if stat.S_ISSOCK(os.stat(self.path).st_mode):
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        _log.info(f'listening for wakeups at unix:{self.path}')
+        self._listen(lambda: self._socket.recv(MESSAGE_SIZE))
+
+    def close(self):
+        super().close()
+        if self._socket is not None:
+            # Unblock the listener, which then sees that it is stopped.
+            trigger(f'unix:{self.path}')
+            self._socket.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class FifoWaker(Waker):
+    """
+    A :class:`Waker` that is woken by anything written to a named pipe.
+    """
+
+    event_driven = True
+
+    def __init__(self, path: str):
+        """
+        Initialize the FifoWaker object.
+
+        :param path:
+            The file system path of the named pipe, which is created if
+            absent.
+        """
+        super().__init__()
+        self.path = path
+        self._fd = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__module__}.{self.__class__.__name__}('
+                f'path={self.path!r}, '
+                f')')
+
+    def __str__(self) -> str:
+        return f'Waker at fifo:{self.path}'
+
+    def start(self):
+        try:
+            os.mkfifo(self.path)
+        except FileExistsError:
+            if not stat.S_ISFIFO(os.stat(self.path).st_mode):
+                raise ConfigurationError(
+                    f'bad configuration: {self.path!r} is not a named pipe'
+                ) from None
+        # Opened for writing too, so that reads block rather than reaching
+        # end-of-file whenever the last writer closes.
+        self._fd = os.open(self.path, os.O_RDWR)
+        _log.info(f'listening for wakeups at fifo:{self.path}')
+        self._listen(lambda: os.read(self._fd, MESSAGE_SIZE))
+
+    def close(self):
+        super().close()
+        if self._fd is not None:
+            # Unblock the listener, which then sees that it is stopped.
+            os.write(self._fd, b'\n')
+            os.close(self._fd)
+            self._fd = None
+
+
+WAKERS = {
+    'fifo': FifoWaker,
+    'unix': UnixSocketWaker,
+}
+
+
+def _parse(spec: str) -> tuple:
+    kind, _, path = spec.partition(':')
+    if kind not in WAKERS or not path:
+        raise ConfigurationError(
+            'bad configuration: wakeup {!r} is not one of {}'.format(
+                spec, ', '.join(f'{kind}:PATH' for kind in sorted(WAKERS)),
+            )
+        )
+    return kind, path
+
+
+def make_waker(spec: str) -> Waker:
+    """
+    :param spec:
+        A wakeup source as described by this module or an empty str or
+        None if there is none.
+
+    :return:
+        A new :class:`Waker`, not yet started.
+
+    :raise ConfigurationError:
+        If *spec* is malformed.
+    """
+    if not spec:
+        return Waker()
+    kind, path = _parse(spec)
+    return WAKERS[kind](path)
+
+
+def trigger(spec: str, message: str = ''):
+    """
+    Wake whatever listens at the wakeup source *spec*.
+
+    :param message:
+        What to tell it, e.g., the name of the tag that changed.
+
+    :raise OSError:
+        If nothing listens there.
+    """
+    kind, path = _parse(spec)
+    data = (message + '\n').encode()
+    if kind == 'unix':
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.sendto(data, path)
+    else:
+        # Non-blocking, so that this fails rather than hangs if no reader.
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
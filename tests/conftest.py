@@ -0,0 +1,171 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Fixtures shared by the unit tests, chiefly a stand-in Koji Hub that speaks
+just enough of its XML-RPC interface to exercise the hub backend.
+"""
+import os
+import sys
+import xmlrpc.client
+from socketserver import ThreadingMixIn
+from threading import Thread
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    'lib'),
+)
+
+from koji_helpers.hub import STARSTAR, KojiHubSession  # noqa: E402
+from koji_helpers.koji import KojiCommand, KojiHubBackend  # noqa: E402
+from koji_helpers.policy import CommandPolicy, SingleFlight  # noqa: E402
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    # Koji's session credentials ride along in the query string, so any
+    # path is accepted and each is noted.
+    rpc_paths = ()
+
+    def decode_request_content(self, data):
+        self.server.paths.append(self.path)
+        return super().decode_request_content(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    # Like the real hub, serve the requests of many connections at once.
+    daemon_threads = True
+
+
+class FakeHub(object):
+    """
+    A stand-in Koji Hub.
+
+    .. attribute:: calls
+
+        A list of (method, args, kwargs) tuples, one per call received,
+        with those within a multiCall taken individually.
+
+
+    .. attribute:: paths
+
+        A list of str, the request path of each HTTP request received.
+
+
+    .. attribute:: responses
+
+        A dict whose keys are the names of methods and whose values are
+        their results.  A value that is callable is called with the
+        arguments of each call and its return value is the result.  A value
+        that is an exception is raised as an XML-RPC fault.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.responses = {}
+        self._server = _Server(
+            ('127.0.0.1', 0), requestHandler=_RequestHandler,
+            allow_none=True, logRequests=False, use_builtin_types=True,
+        )
+        self._server.paths = self.paths = []
+        self._server.register_instance(self)
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def __repr__(self) -> str:
+        return f'{self.__module__}.{self.__class__.__name__}()'
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/kojihub'
+
+    def methods(self) -> list:
+        """
+        :return:
+            A list of the names of the methods called, in order.
+        """
+        return [method for method, _, _ in self.calls]
+
+    def _call(self, method: str, params: list):
+        args, kwargs = list(params), {}
+        if args and isinstance(args[-1], dict) and args[-1].get(STARSTAR):
+            kwargs = dict(args.pop())
+            del kwargs[STARSTAR]
+        self.calls.append((method, args, kwargs))
+        if method not in self.responses:
+            raise xmlrpc.client.Fault(1000, f'unknown method {method!r}')
+        response = self.responses[method]
+        if isinstance(response, Exception):
+            raise xmlrpc.client.Fault(1000, str(response))
+        if callable(response):
+            return response(*args, **kwargs)
+        return response
+
+    def _dispatch(self, method: str, params: tuple):
+        if method != 'multiCall':
+            return self._call(method, params)
+        results = []
+        for call in params[0]:
+            try:
+                results.append([self._call(call['methodName'],
+                                           call['params'])])
+            except xmlrpc.client.Fault as e:
+                results.append({'faultCode': e.faultCode,
+                                'faultString': e.faultString})
+        return results
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+@pytest.fixture
+def hub():
+    """
+    A running :class:`FakeHub`.
+    """
+    fake = FakeHub()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def hub_backend(hub):
+    """
+    Have every :class:`KojiCommand` run against the stand-in hub, without
+    retries, for the duration of a test.
+    """
+    saved = KojiCommand.backend, KojiCommand.policy, KojiCommand.flights
+    session = KojiHubSession(hub.url, timeout=10, connections=4)
+    KojiCommand.backend = KojiHubBackend(session)
+    KojiCommand.policy = CommandPolicy(retries=0)
+    KojiCommand.flights = SingleFlight()
+    yield hub
+    KojiCommand.backend, KojiCommand.policy, KojiCommand.flights = saved
+    session.logout()
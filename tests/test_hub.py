@@ -0,0 +1,196 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, Event
+from time import monotonic
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from koji_helpers.hub import STARSTAR, KojiHubError, KojiHubSession
+from koji_helpers.policy import Attempt
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def _query(path: str) -> dict:
+    return {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+
+
+def _unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_encode_args():
+    assert KojiHubSession.encode_args(('a', 1), {}) == ('a', 1)
+    assert KojiHubSession.encode_args(('a',), {'b': 2}) == (
+        'a', {'b': 2, STARSTAR: True},
+    )
+
+
+def test_call(hub):
+    hub.responses['getTag'] = lambda name, **kw: {'name': name, **kw}
+    session = KojiHubSession(hub.url)
+    assert session.call('getTag', 'f35', strict=True) == {
+        'name': 'f35', 'strict': True,
+    }
+    assert hub.calls == [('getTag', ['f35'], {'strict': True})]
+
+
+def test_call_keeps_none(hub):
+    hub.responses['getRepo'] = None
+    assert KojiHubSession(hub.url).call('getRepo', 'f35') is None
+
+
+def test_fault(hub):
+    hub.responses['getTag'] = ValueError('no such tag')
+    with pytest.raises(KojiHubError, match='getTag faulted: .*no such tag'):
+        KojiHubSession(hub.url).call('getTag', 'nope')
+
+
+def test_unreachable():
+    session = KojiHubSession(f'http://127.0.0.1:{_unused_port()}/kojihub',
+                             timeout=5)
+    with pytest.raises(KojiHubError, match='getLastEvent failed'):
+        session.call('getLastEvent')
+
+
+def test_multicall(hub):
+    hub.responses['getTag'] = lambda name: {'name': name}
+    hub.responses['getBuild'] = ValueError('no such build')
+    results = KojiHubSession(hub.url).multicall([
+        ('getTag', ('f35',), {}),
+        ('getBuild', ('foo-1-1',), {}),
+        ('getTag', ('f36',), {}),
+    ])
+    assert results[0] == {'name': 'f35'}
+    assert isinstance(results[1], KojiHubError)
+    assert 'no such build' in str(results[1])
+    assert results[2] == {'name': 'f36'}
+    assert hub.methods() == ['getTag', 'getBuild', 'getTag']
+    assert len(hub.paths) == 1
+
+
+def test_multicall_of_nothing(hub):
+    assert KojiHubSession(hub.url).multicall([]) == []
+    assert hub.calls == []
+
+
+def test_anonymous_session_never_logs_in(hub):
+    hub.responses['getLastEvent'] = {'id': 1}
+    session = KojiHubSession(hub.url)
+    session.call('getLastEvent')
+    session.logout()
+    assert hub.methods() == ['getLastEvent']
+    assert _query(hub.paths[0]) == {}
+
+
+def test_login_and_call_numbering(hub):
+    hub.responses['sslLogin'] = {'session-id': 7, 'session-key': 'k'}
+    hub.responses['getLastEvent'] = {'id': 1}
+    hub.responses['logout'] = None
+    # The certificate is only loaded for https, which the stand-in lacks.
+    session = KojiHubSession(hub.url, cert='client.pem')
+    session.call('getLastEvent')
+    session.call('getLastEvent')
+    session.logout()
+    assert hub.methods() == [
+        'sslLogin', 'getLastEvent', 'getLastEvent', 'logout',
+    ]
+    assert _query(hub.paths[0]) == {}
+    assert [_query(path) for path in hub.paths[1:]] == [
+        {'session-id': '7', 'session-key': 'k', 'callnum': str(n)}
+        for n in (1, 2, 3)
+    ]
+
+
+def test_relogin_once_auth_expired(hub):
+    logins = iter([{'session-id': 1, 'session-key': 'a'},
+                   {'session-id': 2, 'session-key': 'b'}])
+    hub.responses['sslLogin'] = lambda: next(logins)
+    answers = iter([ValueError('AuthExpired: session expired'), {'id': 9}])
+
+    def last_event():
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    hub.responses['getLastEvent'] = last_event
+    session = KojiHubSession(hub.url, cert='client.pem')
+    assert session.call('getLastEvent') == {'id': 9}
+    assert hub.methods() == [
+        'sslLogin', 'getLastEvent', 'sslLogin', 'getLastEvent',
+    ]
+    assert _query(hub.paths[-1])['session-id'] == '2'
+    assert _query(hub.paths[-1])['callnum'] == '1'
+
+
+def test_connections_serve_calls_at_once(hub):
+    hub.responses['sslLogin'] = lambda: {'session-id': 1, 'session-key': 'k'}
+    # Neither call can finish unless both are made at once.
+    barrier = Barrier(2, timeout=10)
+
+    def get_tag(name):
+        barrier.wait()
+        return name
+
+    hub.responses['getTag'] = get_tag
+    session = KojiHubSession(hub.url, cert='client.pem', connections=2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        names = list(pool.map(lambda name: session.call('getTag', name),
+                              ['f35', 'f36']))
+    assert names == ['f35', 'f36']
+    assert hub.methods().count('sslLogin') == 2
+    # Each connection numbers the calls of its own session.
+    assert sorted(_query(path)['callnum'] for path in hub.paths
+                  if 'callnum' in path) == ['1', '1']
+    session.logout()
+
+
+def test_connections_are_reused(hub):
+    hub.responses['getTag'] = lambda name: name
+    session = KojiHubSession(hub.url, connections=4)
+    for name in ('f35', 'f36', 'f37'):
+        session.call('getTag', name)
+    assert session._opened == 1
+
+
+def test_bounded_call_honors_deadline(hub):
+    released = Event()
+    hub.responses['getRepo'] = lambda tag: released.wait(10)
+    session = KojiHubSession(hub.url, timeout=60)
+    started = monotonic()
+    with pytest.raises(KojiHubError, match='getRepo failed'):
+        session.bounded(Attempt(0.2)).call('getRepo', 'f35-build')
+    assert monotonic() - started < 5
+    released.set()
+
+
+def test_bounded_call_of_inactive_attempt(hub):
+    attempt = Attempt()
+    attempt.cancel()
+    with pytest.raises(KojiHubError, match='abandoned'):
+        KojiHubSession(hub.url).bounded(attempt).call('getRepo', 'f35')
+    assert hub.calls == []
@@ -0,0 +1,85 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import pytest
+
+from koji_helpers.smashd.journal import (
+    COMPOSED, NOTIFIED, SIGNED, WorkJournal,
+)
+from koji_helpers.smashd.tag_history import BUILD, TAG_IN, TAG_OUT, USER
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def _changes(*tags: str) -> dict:
+    return {
+        tag: {
+            TAG_IN: {BUILD: {f'{tag}-pkg-1-1'}, USER: {'alice'}},
+            TAG_OUT: {BUILD: set(), USER: set()},
+        }
+        for tag in tags
+    }
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / 'journal.sqlite')
+
+
+def test_nothing_unfinished(filename):
+    assert WorkJournal(filename).unfinished() == []
+
+
+def test_resume_after_restart(filename):
+    journal = WorkJournal(filename)
+    first = journal.begin(100, _changes('f35', 'f36'))
+    second = journal.begin(104, _changes('f37'))
+    assert first != second
+    journal.record(first, 'f35', SIGNED)
+    journal.record(first, 'f35', COMPOSED, 'fp35')
+    journal.record(first, 'f36', SIGNED, 'fp36')
+    # As though the daemon had been restarted.
+    assert WorkJournal(filename).unfinished() == [
+        (first, 100, _changes('f35', 'f36'),
+         {'f35': (COMPOSED, 'fp35'), 'f36': (SIGNED, 'fp36')}),
+        (second, 104, _changes('f37'), {}),
+    ]
+
+
+def test_finish_concludes_only_its_cycle(filename):
+    journal = WorkJournal(filename)
+    first = journal.begin(100, _changes('f35'))
+    second = journal.begin(104, _changes('f36'))
+    journal.record(first, 'f35', NOTIFIED)
+    journal.record(second, 'f36', SIGNED)
+    journal.finish(first)
+    assert WorkJournal(filename).unfinished() == [
+        (second, 104, _changes('f36'), {'f36': (SIGNED, None)}),
+    ]
+    journal.finish(second)
+    assert journal.unfinished() == []
+
+
+def test_cycle_ids_are_never_reused(filename):
+    journal = WorkJournal(filename)
+    first = journal.begin(100, _changes('f35'))
+    journal.finish(first)
+    second = WorkJournal(filename).begin(101, _changes('f35'))
+    assert second > first
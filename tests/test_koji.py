@@ -0,0 +1,167 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Tests of the Koji commands as executed by the hub backend.
+"""
+from itertools import count
+from threading import Event
+from time import monotonic
+
+import pytest
+
+from koji_helpers.koji import (
+    KojiCommand, KojiCommandError, KojiCommandTimeout, KojiDistRepo,
+    KojiLastEvent, KojiListTagged, KojiRegenRepo, KojiTaskInfo,
+)
+from koji_helpers.policy import MIN_HEDGE_SAMPLES, CommandPolicy
+from koji_helpers.smashd.distrepo import signed_content_fingerprint
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def _rpm(name: str, arch: str, sigkey: str) -> dict:
+    return {'id': hash((name, arch)) & 0xffff, 'name': name,
+            'version': '1', 'release': '1.fc35', 'arch': arch,
+            'sigkey': sigkey}
+
+
+def test_dist_repo_matches_cli_defaults(hub_backend):
+    hub_backend.responses['getBuildConfig'] = {'arches': 'x86_64 aarch64'}
+    hub_backend.responses['distRepo'] = 1234
+    command = KojiDistRepo('f35-updates', 'abcd1234')
+    assert command.task_id == '1234'
+    assert 'Created task: 1234' in command.output
+    method, args, kwargs = hub_backend.calls[-1]
+    assert method == 'distRepo'
+    assert args == ['f35-updates', ['abcd1234']]
+    assert kwargs['arch'] == ['aarch64', 'src', 'x86_64']
+    # Those of `koji dist-repo` lacking --noinherit and --non-latest.
+    assert kwargs['inherit'] is True
+    assert kwargs['latest'] is True
+    assert kwargs['multilib'] is False
+
+
+def test_dist_repo_of_tag_without_arches(hub_backend):
+    hub_backend.responses['getBuildConfig'] = {'arches': None}
+    hub_backend.responses['distRepo'] = 1
+    KojiDistRepo('f35-updates', 'abcd1234')
+    assert hub_backend.calls[-1][2]['arch'] == ['src']
+
+
+def test_fault_raises_command_error(hub_backend):
+    hub_backend.responses['getBuildConfig'] = ValueError('no such tag')
+    with pytest.raises(KojiCommandError, match='no such tag'):
+        KojiDistRepo('nope', 'abcd1234')
+
+
+def test_task_info(hub_backend):
+    hub_backend.responses['getTaskInfo'] = lambda task_id: {
+        'id': task_id, 'method': 'distRepo', 'state': 2,
+    }
+    command = KojiTaskInfo('42')
+    assert command.state == 'closed'
+    assert hub_backend.calls == [('getTaskInfo', [42], {})]
+
+
+def test_task_info_of_no_task(hub_backend):
+    hub_backend.responses['getTaskInfo'] = None
+    with pytest.raises(KojiCommandError, match='No such task: 42'):
+        KojiTaskInfo('42')
+
+
+def test_failed_stream_stays_failed(hub_backend):
+    hub_backend.responses['getTaskInfo'] = None
+    command = KojiTaskInfo('42', stream=True)
+    for _ in range(2):
+        with pytest.raises(KojiCommandError, match='No such task: 42'):
+            list(command.lines())
+    assert hub_backend.methods() == ['getTaskInfo']
+
+
+def test_last_event(hub_backend):
+    hub_backend.responses['getLastEvent'] = {'id': 31337, 'ts': 0.0}
+    assert KojiLastEvent().event_id == 31337
+
+
+def test_deadline_bounds_hub_call(hub_backend):
+    released = Event()
+    hub_backend.responses['getLastEvent'] = lambda: released.wait(10)
+    KojiCommand.policy = CommandPolicy(timeout=0.2, retries=0)
+    started = monotonic()
+    with pytest.raises(KojiCommandTimeout):
+        KojiLastEvent()
+    assert monotonic() - started < 5
+    released.set()
+
+
+def test_hedge_runs_alongside_original(hub_backend):
+    KojiCommand.policy = CommandPolicy(retries=0, hedge_percentile=50)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        KojiCommand.policy.record('call', 0.01)
+    calls, released = count(), Event()
+
+    def last_event():
+        # The original is stuck until the hedge has won.
+        if next(calls) == 0:
+            released.wait(10)
+            return {'id': 1}
+        return {'id': 2}
+
+    hub_backend.responses['getLastEvent'] = last_event
+    try:
+        assert KojiLastEvent().event_id == 2
+    finally:
+        released.set()
+
+
+def test_list_tagged(hub_backend):
+    hub_backend.responses['listTaggedRPMS'] = [
+        [_rpm('foo', 'x86_64', 'ABCD1234'), _rpm('foo', 'src', 'abcd1234'),
+         _rpm('bar', 'noarch', '')],
+        [],
+    ]
+    command = KojiListTagged('f35-updates')
+    assert command.signed_rpms_by_key == {
+        'abcd1234': {'foo-1-1.fc35.x86_64', 'foo-1-1.fc35.src'},
+    }
+    assert hub_backend.calls == [
+        ('listTaggedRPMS', ['f35-updates'],
+         {'inherit': True, 'latest': True, 'rpmsigs': True}),
+    ]
+
+
+def test_fingerprint_follows_inherited_builds(hub_backend):
+    parent = [_rpm('base', 'noarch', 'abcd1234')]
+    own = [_rpm('foo', 'noarch', 'abcd1234')]
+    hub_backend.responses['listTaggedRPMS'] = (
+        lambda tag, inherit=False, **kwargs: [own + parent * inherit, []]
+    )
+    before = signed_content_fingerprint('f35-updates', 'ABCD1234')
+    # Only a build of the parent tag changes, but the dist-repo would too.
+    parent[0] = dict(parent[0], release='2.fc35')
+    after = signed_content_fingerprint('f35-updates', 'ABCD1234')
+    assert before != after
+
+
+def test_regen_repo(hub_backend):
+    hub_backend.responses['newRepo'] = 77
+    command = KojiRegenRepo('f35-build')
+    assert command.task_id == '77'
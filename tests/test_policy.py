@@ -0,0 +1,138 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from threading import Timer
+from time import monotonic, sleep
+
+from koji_helpers.koji import KojiLastEvent, KojiWaitRepo
+from koji_helpers.policy import Attempt, SingleFlight
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+
+def test_window_shares_finished_outcome():
+    flights, calls = SingleFlight(window=60), count(1)
+    assert flights.do('k', lambda: next(calls)) == (1, False)
+    assert flights.do('k', lambda: next(calls)) == (1, True)
+    assert flights.shared == 1
+
+
+def test_no_lingering_despite_window():
+    flights, calls = SingleFlight(window=60), count(1)
+    assert flights.do('k', lambda: next(calls), linger=False) == (1, False)
+    assert flights.do('k', lambda: next(calls), linger=False) == (2, False)
+    assert flights.shared == 0
+
+
+def test_wait_repo_never_lingers():
+    assert KojiWaitRepo.coalescible and not KojiWaitRepo.lingering
+    assert KojiLastEvent.lingering
+
+
+def test_attempt_unbounded():
+    attempt = Attempt()
+    assert attempt.remaining is None
+    assert attempt.active
+    assert attempt.wait(0)
+
+
+def test_attempt_times_out():
+    attempt = Attempt(0.05)
+    assert attempt.remaining <= 0.05
+    assert not attempt.wait(10)
+    assert attempt.timed_out
+    assert not attempt.active
+
+
+def test_attempt_cancelled_wakes_waiter():
+    attempt = Attempt()
+    Timer(0.05, attempt.cancel).start()
+    started = monotonic()
+    assert not attempt.wait(10)
+    assert monotonic() - started < 5
+    assert attempt.cancelled and not attempt.timed_out
+
+
+def test_attempt_finished_wakes_waiter():
+    attempt = Attempt()
+    Timer(0.05, attempt.finish).start()
+    started = monotonic()
+    assert attempt.wait(10)
+    assert monotonic() - started < 5
+
+
+def _concurrently(flights: SingleFlight, key, work, callers: int) -> list:
+    """
+    :return:
+        A list of what each of *callers* threads got of
+        :meth:`SingleFlight.do` for *key*, with *work* held in flight until
+        all but the first have joined it.
+    """
+    def held():
+        deadline = monotonic() + 5
+        while flights.shared < callers - 1 and monotonic() < deadline:
+            sleep(0.01)
+        return work()
+
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(flights.do, key, held) for _ in range(callers)]
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+    return outcomes
+
+
+def test_concurrent_requests_share_one_execution():
+    flights, calls = SingleFlight(), count(1)
+    outcomes = _concurrently(flights, 'k', lambda: next(calls), 4)
+    assert sorted(outcomes) == [(1, False), (1, True), (1, True), (1, True)]
+    assert flights.shared == 3
+    # Without a window, nothing finished is shared.
+    assert flights.do('k', lambda: next(calls)) == (2, False)
+
+
+def test_distinct_keys_do_not_share():
+    flights = SingleFlight()
+    assert flights.do('a', lambda: 'a') == ('a', False)
+    assert flights.do('b', lambda: 'b') == ('b', False)
+    assert flights.shared == 0
+
+
+def test_error_is_shared_in_flight_but_never_after():
+    flights = SingleFlight(window=60)
+
+    def work():
+        raise ValueError('boom')
+
+    outcomes = _concurrently(flights, 'k', work, 3)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flights.do('k', lambda: 'fine') == ('fine', False)
+
+
+def test_window_expires():
+    flights, calls = SingleFlight(window=0.05), count(1)
+    assert flights.do('k', lambda: next(calls)) == (1, False)
+    sleep(0.1)
+    assert flights.do('k', lambda: next(calls)) == (2, False)
@@ -0,0 +1,183 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import multiprocessing
+import os
+from time import sleep, time
+
+import pytest
+
+from koji_helpers.smashd.sharding import (
+    EXPIRES, MARK, NODE, HashRing, LeaseDirectory, Shard,
+)
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+TAGS = [f'tag-{n}' for n in range(200)]
+
+
+def _expire(path: str, tag: str, node: str, mark=None):
+    with open(os.path.join(path, 'tags', tag), 'w') as f:
+        json.dump({NODE: node, EXPIRES: time() - 1, MARK: mark}, f)
+
+
+def _contend(path: str, node: str, tag: str, barrier, results):
+    leases = LeaseDirectory(path, node, 60)
+    barrier.wait()
+    results.put((node, leases.acquire(tag) is not None))
+
+
+def test_ring_of_no_nodes():
+    assert HashRing([]).owner('tag') is None
+
+
+def test_ring_is_deterministic():
+    one, two = HashRing(['a', 'b', 'c']), HashRing(['c', 'a', 'b'])
+    assert [one.owner(tag) for tag in TAGS] == [two.owner(tag) for tag in TAGS]
+
+
+def test_ring_shares_evenly_enough():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    shares = [sum(ring.owner(tag) == node for tag in TAGS)
+              for node in ring.nodes]
+    assert min(shares) > len(TAGS) / 4 / 2
+
+
+def test_joining_node_moves_only_its_share():
+    before, after = HashRing(['a', 'b', 'c']), HashRing(['a', 'b', 'c', 'd'])
+    for tag in TAGS:
+        assert after.owner(tag) in (before.owner(tag), 'd')
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path)
+
+
+def test_acquire_free_lease(path):
+    assert LeaseDirectory(path, 'a', 60).acquire('f35') == {
+        NODE: 'a', MARK: None,
+    }
+
+
+def test_held_lease_is_not_taken(path):
+    a, b = LeaseDirectory(path, 'a', 60), LeaseDirectory(path, 'b', 60)
+    assert a.acquire('f35') is not None
+    assert b.acquire('f35') is None
+    assert a.acquire('f35') is not None
+    assert a.renew('f35', 7)
+    assert not b.renew('f35', 8)
+
+
+def test_released_lease_carries_its_mark(path):
+    a, b = LeaseDirectory(path, 'a', 60), LeaseDirectory(path, 'b', 60)
+    a.acquire('f35')
+    a.release('f35', 42)
+    assert b.acquire('f35') == {NODE: 'b', MARK: 42}
+    assert not a.renew('f35', 43)
+
+
+def test_expired_lease_is_taken_over(path):
+    a, b = LeaseDirectory(path, 'a', 60), LeaseDirectory(path, 'b', 60)
+    a.acquire('f35')
+    _expire(path, 'f35', 'a', 9)
+    assert b.acquire('f35') == {NODE: 'b', MARK: 9}
+    assert not a.renew('f35', 10)
+
+
+def test_live_nodes(path):
+    a, b = LeaseDirectory(path, 'a', 60), LeaseDirectory(path, 'b', -1)
+    a.heartbeat()
+    b.heartbeat()
+    assert a.live_nodes() == ['a']
+    a.leave()
+    assert a.live_nodes() == []
+
+
+@pytest.mark.parametrize('expired', [False, True])
+def test_only_one_contender_takes_a_lease(path, expired):
+    if expired:
+        LeaseDirectory(path, 'gone', 60)
+        _expire(path, 'f35', 'gone', 5)
+    # The lease locks are held per process, as the nodes are.
+    context = multiprocessing.get_context('fork')
+    barrier, results = context.Barrier(8), context.Queue()
+    contenders = [
+        context.Process(target=_contend,
+                        args=(path, f'n{n}', 'f35', barrier, results))
+        for n in range(8)
+    ]
+    for contender in contenders:
+        contender.start()
+    outcomes = [results.get(timeout=30) for _ in contenders]
+    for contender in contenders:
+        contender.join()
+    winners = [node for node, won in outcomes if won]
+    assert len(winners) == 1
+    with open(os.path.join(path, 'tags', 'f35')) as f:
+        assert json.load(f)[NODE] == winners[0]
+
+
+def test_shards_split_the_tags(path):
+    a, b = Shard(TAGS, path, 'a', 60), Shard(TAGS, path, 'b', 60)
+    assert a.update({}) and a.owned == set(TAGS)
+    # The tags now assigned to b are held by a until it hands them off.
+    assert b.update({}) == {}
+    a.update({tag: 3 for tag in a.owned}, busy=['tag-0'])
+    taken = b.update({})
+    ring = HashRing(['a', 'b'])
+    assert a.owned | b.owned == set(TAGS)
+    assert not a.owned & b.owned
+    assert b.owned == {
+        tag for tag in TAGS if ring.owner(tag) == 'b' and tag != 'tag-0'
+    }
+    assert set(taken.values()) == {3}
+
+
+def test_closed_shard_hands_over_at_once(path):
+    a, b = Shard(TAGS, path, 'a', 60), Shard(TAGS, path, 'b', 60)
+    a.update({})
+    a.close({tag: 5 for tag in a.owned})
+    assert set(b.update({}).values()) == {5}
+    assert b.owned == set(TAGS)
+
+
+def test_leases_are_renewed_in_the_background(path):
+    a, b = Shard(['f35'], path, 'a', 0.6), Shard(['f35'], path, 'b', 0.6)
+    a.update({'f35': 3})
+    # No update is needed meanwhile, e.g., while a is blocked upon Koji.
+    sleep(1.5)
+    assert a.holds('f35')
+    assert b.update({}) == {}
+    a.close({'f35': 4})
+    assert b.update({}) == {'f35': 4}
+
+
+def test_lost_lease_is_no_longer_held(path):
+    a, b = Shard(['f35'], path, 'a', 60), LeaseDirectory(path, 'b', 60)
+    a.update({})
+    assert a.holds('f35')
+    _expire(path, 'f35', 'a', 9)
+    assert b.acquire('f35') is not None
+    # The tag is fenced off even while busy, for it is b's now.
+    a.update({}, busy=['f35'])
+    assert not a.holds('f35')
+    assert a.owned == set()
@@ -0,0 +1,143 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+import os
+from time import time
+
+import pytest
+
+from koji_helpers.koji import KojiCommand, KojiCommandError
+from koji_helpers.rpmhdr import koji_rpm_paths
+from koji_helpers.smashd.signed_index import SignedIndex
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+KEY = 'abcd1234'
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SignedIndex(str(tmp_path / 'signed-index.sqlite'), 30)
+
+
+def _listing(koji_dir: str, *signed: tuple, unwritten: tuple = ()) -> tuple:
+    """
+    :return:
+        The listTaggedRPMS and queryRPMSigs responses of a tag holding
+        *signed* (name, sigkey) pairs, the sigkey being None if unsigned.
+        The signed copies are written within *koji_dir*, except for those
+        of the names in *unwritten*.
+    """
+    rpms = [
+        {'id': n, 'build_id': n, 'name': name, 'version': '1',
+         'release': '1', 'arch': 'noarch'}
+        for n, (name, _) in enumerate(signed)
+    ]
+    builds = [{'build_id': n, 'nvr': f'{name}-1-1'}
+              for n, (name, _) in enumerate(signed)]
+    sigs = {n: sigkey for n, (_, sigkey) in enumerate(signed)}
+    for name, sigkey in signed:
+        if sigkey and name not in unwritten:
+            _, signed_copy, _ = koji_rpm_paths(
+                koji_dir, f'{name}-1-1', f'{name}-1-1.noarch.rpm', sigkey,
+            )
+            os.makedirs(os.path.dirname(signed_copy))
+            open(signed_copy, 'w').close()
+    return [rpms, builds], lambda rpm_id: (
+        [{'sigkey': sigs[rpm_id]}] if sigs[rpm_id] else []
+    )
+
+
+def test_add_and_discard(index):
+    index.add('f35', KEY, ['a.rpm', 'b.rpm'])
+    assert index.signed(KEY, ['a.rpm', 'b.rpm', 'c.rpm']) == {
+        'a.rpm', 'b.rpm',
+    }
+    assert index.signed('other', ['a.rpm']) == set()
+    index.discard('f35', ['a.rpm'])
+    assert index.signed(KEY, ['a.rpm', 'b.rpm']) == {'b.rpm'}
+    assert len(index) == 1
+
+
+def test_signature_spans_tags(index):
+    index.add('f35', KEY, ['a.rpm'])
+    index.add('f36', KEY, ['a.rpm'])
+    index.discard('f35', ['a.rpm'])
+    assert index.signed(KEY, ['a.rpm']) == {'a.rpm'}
+
+
+def test_replace_supersedes_older_entries(index):
+    assert not index.is_known('f35', KEY)
+    index.add('f35', KEY, ['old.rpm'])
+    index.replace('f35', KEY, ['listed.rpm'], time() + 1)
+    assert index.is_known('f35', KEY)
+    assert index.signed(KEY, ['old.rpm', 'listed.rpm']) == {'listed.rpm'}
+
+
+def test_replace_retains_entries_newer_than_listing(index):
+    since = time() - 60
+    # Signed after the listing was made, so it couldn't have been listed.
+    index.add('f35', KEY, ['fresh.rpm'])
+    index.replace('f35', KEY, ['listed.rpm'], since)
+    assert index.signed(KEY, ['fresh.rpm', 'listed.rpm']) == {
+        'fresh.rpm', 'listed.rpm',
+    }
+
+
+def test_replace_leaves_other_keys_and_tags(index):
+    index.add('f35', 'other', ['a.rpm'])
+    index.add('f36', KEY, ['b.rpm'])
+    index.replace('f35', KEY, [], time() + 1)
+    assert index.signed('other', ['a.rpm']) == {'a.rpm'}
+    assert index.signed(KEY, ['b.rpm']) == {'b.rpm'}
+
+
+@pytest.fixture
+def koji_dir(tmp_path, hub_backend):
+    KojiCommand.backend.koji_dir = str(tmp_path / 'koji')
+    return KojiCommand.backend.koji_dir
+
+
+def test_reconcile(index, hub_backend, koji_dir):
+    rpms, sigs = _listing(
+        koji_dir, ('a', KEY.upper()), ('b', None), ('c', 'other'),
+        ('d', KEY), unwritten=('d',),
+    )
+    hub_backend.responses['listTaggedRPMS'] = rpms
+    hub_backend.responses['queryRPMSigs'] = sigs
+    index.replace('f35', KEY, ['gone-1-1.noarch.rpm'], time() - 60)
+    assert index.due() == [('f35', KEY)]
+    index.reconcile('f35', KEY)
+    assert index.due() == []
+    assert index.signed(KEY, [
+        'a-1-1.noarch.rpm', 'b-1-1.noarch.rpm', 'c-1-1.noarch.rpm',
+        'd-1-1.noarch.rpm', 'gone-1-1.noarch.rpm',
+    ]) == {'a-1-1.noarch.rpm'}
+
+
+def test_failed_reconcile_changes_nothing(index, hub_backend, koji_dir):
+    index.replace('f35', KEY, ['a.rpm'], time() - 60)
+    assert index.due() == [('f35', KEY)]
+    hub_backend.responses['listTaggedRPMS'] = ValueError('hub is down')
+    with pytest.raises(KojiCommandError):
+        index.reconcile('f35', KEY)
+    assert index.signed(KEY, ['a.rpm']) == {'a.rpm'}
+    # Nor is it deemed reconciled.
+    assert index.due() == [('f35', KEY)]
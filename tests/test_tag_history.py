@@ -0,0 +1,154 @@
+# coding=utf-8
+
+# Copyright 2026 John Florian <jflorian@doubledog.org>
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of koji-helpers.
+#
+# koji-helpers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option)
+# any later version so long as this copyright notice remains intact.
+#
+# koji-helpers is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# koji-helpers.  If not, see <http://www.gnu.org/licenses/>.
+from koji_helpers.smashd.tag_history import (
+    BUILD, TAG_IN, TAG_OUT, USER, KojiTagHistory, parse_history,
+    parse_tag_event, tally_changes,
+)
+
+__author__ = """John Florian <jflorian@doubledog.org>"""
+__copyright__ = """2026 John Florian"""
+
+TIME = 'Mon Oct 12 10:00:00 2026'
+
+
+def _tagged(build: str, tag: str, user: str = 'alice') -> str:
+    return f'{TIME} {build} tagged into {tag} by {user} [still active]\n'
+
+
+def _untagged(build: str, tag: str, user: str = 'alice') -> str:
+    return f'{TIME} {build} untagged from {tag} by {user}\n'
+
+
+def _tally(tag_in: set = (), tag_out: set = (), users_in: set = (),
+           users_out: set = ()) -> dict:
+    return {
+        TAG_IN: {BUILD: set(tag_in), USER: set(users_in)},
+        TAG_OUT: {BUILD: set(tag_out), USER: set(users_out)},
+    }
+
+
+def test_parse_tagging():
+    event = parse_tag_event(_tagged('foo-1-1', 'f35', 'bob'))
+    assert (event.time, event.build, event.tagged, event.tag, event.user) == (
+        TIME, 'foo-1-1', True, 'f35', 'bob',
+    )
+
+
+def test_parse_untagging():
+    event = parse_tag_event(_untagged('foo-1-1', 'f35'))
+    assert not event.tagged and event.tag == 'f35'
+
+
+def test_parse_rejects_other_history():
+    assert parse_tag_event(
+        f'{TIME} package foo in tag f35: owner changed by bob\n'
+    ) is None
+    assert parse_tag_event('foo-1-1 tagged into f35 by bob\n') is None
+    assert parse_tag_event(f'{TIME} foo-1-1 tagged into f35\n') is None
+
+
+def test_parse_history_skips_noise():
+    events = list(parse_history([
+        _tagged('foo-1-1', 'f35'),
+        f'{TIME} package foo in tag f35: owner changed by bob\n',
+        _untagged('bar-1-1', 'f35'),
+    ]))
+    assert [event.build for event in events] == ['foo-1-1', 'bar-1-1']
+
+
+def test_tally_separates_tags_and_directions():
+    assert tally_changes([
+        _tagged('foo-1-1', 'f35', 'alice'),
+        _untagged('bar-1-1', 'f35', 'bob'),
+        _tagged('foo-1-1', 'f36', 'carol'),
+    ]) == {
+        'f35': _tally({'foo-1-1'}, {'bar-1-1'}, {'alice'}, {'bob'}),
+        'f36': _tally({'foo-1-1'}, (), {'carol'}),
+    }
+
+
+def test_tally_tagged_in_then_out_is_only_out():
+    assert tally_changes([
+        _tagged('foo-1-1', 'f35', 'alice'),
+        _untagged('foo-1-1', 'f35', 'bob'),
+    ]) == {'f35': _tally((), {'foo-1-1'}, {'alice'}, {'bob'})}
+
+
+def test_tally_tagged_out_then_in_is_only_in():
+    assert tally_changes([
+        _untagged('foo-1-1', 'f35'),
+        _tagged('foo-1-1', 'f35'),
+    ]) == {'f35': _tally({'foo-1-1'}, (), {'alice'}, {'alice'})}
+
+
+def test_tally_net_effect_is_per_tag():
+    assert tally_changes([
+        _tagged('foo-1-1', 'f35'),
+        _tagged('foo-1-1', 'f36'),
+        _untagged('foo-1-1', 'f35'),
+    ]) == {
+        'f35': _tally((), {'foo-1-1'}, {'alice'}, {'alice'}),
+        'f36': _tally({'foo-1-1'}, (), {'alice'}),
+    }
+
+
+def test_tally_excludes_tags():
+    assert tally_changes([
+        _tagged('foo-1-1', 'f35'),
+        _tagged('foo-1-1', 'trashcan'),
+    ], exclude_tags=['trashcan']) == {
+        'f35': _tally({'foo-1-1'}, (), {'alice'}),
+    }
+
+
+def test_tally_of_nothing():
+    assert tally_changes([]) == {}
+
+
+def _listing(tag: str, build: str, event: int) -> dict:
+    name, version, release = build.rsplit('-', 2)
+    return {'tag.name': tag, 'name': name, 'version': version,
+            'release': release, 'create_event': event, 'create_ts': 0.0,
+            'creator_name': 'alice', 'revoke_event': None, 'revoke_ts': None,
+            'revoker_name': None}
+
+
+def test_history_of_tags_behind_in_one_round_trip(hub_backend):
+    listings = {'f35': _listing('f35', 'foo-1-1', 101),
+                'f36': _listing('f36', 'bar-1-1', 103)}
+    hub_backend.responses['queryHistory'] = lambda tables, tag, **bounds: {
+        'tag_listing': [listings[tag]],
+    }
+    history = KojiTagHistory(
+        None, None, [], before_event=105, tags=['f35', 'f36', 'f37'],
+        tag_after_events={'f35': 100, 'f36': 102, 'f37': 104},
+    )
+    assert history.changed_tags == {
+        'f35': _tally({'foo-1-1'}, (), {'alice'}),
+        'f36': _tally({'bar-1-1'}, (), {'alice'}),
+    }
+    # Nothing was asked of f37, which was known through the last event.
+    assert hub_backend.calls == [
+        ('queryHistory', [], {'tables': ['tag_listing'], 'tag': 'f35',
+                              'afterEvent': 100, 'beforeEvent': 105}),
+        ('queryHistory', [], {'tables': ['tag_listing'], 'tag': 'f36',
+                              'afterEvent': 102, 'beforeEvent': 105}),
+    ]
+    assert len(hub_backend.paths) == 1